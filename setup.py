@@ -40,6 +40,10 @@ setup(
     package_data={"": ["config_files/*", "test_scripts/*"]},
     entry_points={
         "tox": ["lsr = tox_lsr.hooks"],
+        "console_scripts": [
+            "tox-lsr-paths = tox_lsr.paths:main",
+            "tox-lsr-wheelhouse = tox_lsr.wheelhouse:main",
+        ],
     },
     python_requires=">=2.6, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*",
     install_requires=["tox", "configparser"],
@@ -0,0 +1,98 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Persistent cache of the merged tox-lsr ini."""
+
+import errno
+import hashlib
+import os
+
+from .version import __version__
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import Optional
+
+CACHE_SUBDIR = ".lsr-cache"  # relative to toxworkdir
+CONFIG_CACHE_PREFIX = "config-"
+CONFIG_CACHE_SUFFIX = ".ini"
+
+
+def get_cache_dir(toxworkdir):
+    # type: (str) -> str
+    """Return the directory holding the tox-lsr cache files."""
+
+    return os.path.join(str(toxworkdir), CACHE_SUBDIR)
+
+
+def config_cache_key(toxinipath, default_ini, lsr_scriptdir, lsr_configdir):
+    # type: (str, str, str, str) -> Optional[str]
+    """
+    Compute the cache key for the merged configuration.
+
+    The merged ini depends on the contents of the user tox.ini, the
+    packaged default ini, the plugin version and the script and config
+    dirs substituted into the result (LSR_SCRIPTDIR and LSR_CONFIGDIR).
+    Return None if the user tox.ini cannot be read.
+    """
+
+    hsh = hashlib.sha256()
+    try:
+        with open(str(toxinipath), "rb") as ini_f:
+            hsh.update(ini_f.read())
+    except (IOError, OSError):
+        return None
+    for item in (default_ini, __version__, lsr_scriptdir, lsr_configdir):
+        hsh.update(b"\0")
+        hsh.update(item.encode("utf-8"))
+    return hsh.hexdigest()
+
+
+def _config_cache_path(cache_dir, toxinipath):
+    # type: (str, str) -> str
+    # one cache slot per tox.ini, so that nested tox runs using the
+    # same workdir with a different ini do not evict each other
+    slot = hashlib.sha256(str(toxinipath).encode("utf-8")).hexdigest()
+    return os.path.join(
+        cache_dir, CONFIG_CACHE_PREFIX + slot[:16] + CONFIG_CACHE_SUFFIX
+    )
+
+
+def read_cached_config(cache_dir, toxinipath, key):
+    # type: (str, str, str) -> Optional[str]
+    """Return the cached merged ini for key, or None if not cached."""
+
+    try:
+        with open(_config_cache_path(cache_dir, toxinipath), "rb") as cache_f:
+            data = cache_f.read().decode("utf-8")
+    except (IOError, OSError):
+        return None
+    cached_key, _, merged_ini = data.partition("\n")
+    if cached_key != key:
+        return None
+    return merged_ini
+
+
+def write_cached_config(cache_dir, toxinipath, key, merged_ini):
+    # type: (str, str, str, str) -> None
+    """
+    Store the merged ini for key, replacing the stale entry if any.
+
+    The file is written under a temporary name and renamed into place
+    so that concurrent tox runs never see a partial file.  Errors are
+    ignored - the cache is only an optimization.
+    """
+
+    try:
+        try:
+            os.makedirs(cache_dir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                raise
+        cache_path = _config_cache_path(cache_dir, toxinipath)
+        tmp_path = "{path}.{pid}".format(path=cache_path, pid=os.getpid())
+        with open(tmp_path, "wb") as cache_f:
+            cache_f.write((key + "\n" + merged_ini).encode("utf-8"))
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        pass
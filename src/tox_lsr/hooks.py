@@ -3,162 +3,299 @@
 #
 """Install tox-lsr hooks to tox."""
 
-import os
-import traceback
+# tox loads the plugin for every invocation, even when the plugin is not
+# enabled - so keep the imports here to the minimum.  Everything else is
+# imported when it is needed.
 
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from io import StringIO
+import os
+import sys
 
 try:
-    from ConfigParser import ConfigParser
-except ImportError:
-    from configparser import ConfigParser
-
-from tempfile import NamedTemporaryFile
-
-import pkg_resources
+    from collections import OrderedDict
+except ImportError:  # python 2.6
+    OrderedDict = dict
 
 # pylint: disable=no-member,no-name-in-module,import-error
 import py.iniconfig
 import py.path
 from tox import hookimpl
-from tox.config import Config, Parser, TestenvConfig, testenvprefix
+from tox.config import Config, Parser, TestenvConfig
 
 try:
     from tox.config import ParseIni  # tox 3.4.0+
 except ImportError:
     from tox.config import parseini as ParseIni
 
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import Dict, Iterator, List, Optional, Set
+
+    from . import merge
+
 TEST_SCRIPTS_SUBDIR = "test_scripts"
 CONFIG_FILES_SUBDIR = "config_files"
 LSR_ENABLE = "lsr_enable"
 LSR_ENABLE_ENV = "LSR_ENABLE"
+LSR_NO_CACHE = "lsr_no_cache"
+LSR_NO_CACHE_ENV = "LSR_NO_CACHE"
+LSR_PROFILE = "lsr_profile"
+LSR_PROFILE_ENV = "LSR_PROFILE"
+LSR_WHEELHOUSE_ENV = "LSR_WHEELHOUSE"
+LSR_PLAN = "lsr_plan"
+LSR_SHARE_ENVDIRS = "lsr_share_envdirs"
+LSR_SHARE_ENVDIRS_ENV = "LSR_SHARE_ENVDIRS"
+LSR_SHARE_ENVDIR = "lsr_share_envdir"  # per testenv opt-out
+SHARED_ENVDIR_PREFIX = "lsr-env-"
+# testenv properties which determine what is installed in the env dir
+ENVDIR_FINGERPRINT_PROPS = (
+    "basepython",
+    "deps",
+    "install_command",
+    "sitepackages",
+    "alwayscopy",
+    "usedevelop",
+    "pip_pre",
+)
 LSR_CONFIGDIR_KW = "{lsr_configdir}"
 LSR_SCRIPTDIR_KW = "{lsr_scriptdir}"
+LSR_MOLECULE_ENVKEY_KW = "{lsr_molecule_envkey}"
 LSR_CONFIGDIR_ENV = "LSR_CONFIGDIR"
 LSR_SCRIPTDIR_ENV = "LSR_SCRIPTDIR"
 LSR_CONFIG_SECTION = "lsr_config"
 SCRIPT_NAME = "utils.sh"  # script that must always exist
 CONFIG_NAME = "black.toml"  # config file that must always exist
 TOX_DEFAULT_INI = "tox-default.ini"  # name of default tox ini
+# env vars which select the molecule deps, with their tox-default.ini defaults
+MOLECULE_DEPS_ENV = (
+    ("LSR_ANSIBLE_DEP", "ansible"),
+    ("LSR_MOLECULE_DRIVER", "docker"),
+    ("LSR_MOLECULE_DRIVER_VERSION", ""),
+)
 
 
 # code uses some protected members such as _cfg, _parser, _reader
 # pylint: disable=protected-access
 
 
-class _LSRPath(py.path.local):
+class _InMemoryIniConfig(object):
+    # pylint: disable=too-few-public-methods
+    """
+    Make IniConfig return the merged ini data for the tox.ini path.
+
+    This is primarily for support of tox 2.x and tox 3.x before
+    3.4.0.  ParseIni in these versions takes only the ini file,
+    which it uses for all of the substitutions like toxinipath, and
+    which it reads with IniConfig.  So that file name must be the
+    real, actual, local rolerepo/tox.ini filename, but IniConfig must
+    see the merged ini data.  While the adapter is active, IniConfig
+    is replaced with a factory that hands the merged data to IniConfig
+    when asked to read the tox.ini path.  Nothing is written to disk.
+    """
+
+    def __init__(self, toxinipath, ini_data):
+        # type: (py.path.local, str) -> None
+        self.toxinipath = str(toxinipath)
+        self.ini_data = ini_data
+        self.orig_iniconfig = py.iniconfig.IniConfig
+
+    def __call__(self, path, data=None):
+        # type: (str, str) -> py.iniconfig.IniConfig
+        if data is None and str(path) == self.toxinipath:
+            data = self.ini_data
+        return self.orig_iniconfig(path, data)
+
+    def __enter__(self):
+        # type: () -> _InMemoryIniConfig
+        py.iniconfig.IniConfig = self
+        return self
+
+    def __exit__(self, *args):
+        # type: (object) -> None
+        py.iniconfig.IniConfig = self.orig_iniconfig
+
+
+class _LazyEnvconfig(object):
     # pylint: disable=too-few-public-methods
     """
-    Hack to make IniConfig read the merged tmp ini file.
+    Placeholder for a default testenv which was not selected to run.
 
-    This is primarily for support of tox 2.x.  ParseIni in
-    tox 2.x takes only the ini file, which it uses for all of
-    the substitutions like toxinipath.  So that file name must
-    be the real, actual, local rolerepo/tox.ini filename.  The
-    problem is that we need to pass in a temp file which contains
-    the merged ini data, which is read in by IniConfig.  This is
-    the only place that uses the actual contents of the file.  We
-    use this class so that when IniConfig asks for the filename,
-    it returns the temp file which contains the real contents.
-    Everywhere else, the rolerepo/tox.ini filename is returned.
+    Building a TestenvConfig means reading and substituting every
+    testenv attribute, and looking up the basepython interpreter.
+    For the testenvs which were not selected with -e or TOXENV, the
+    default config only records how to build it, and the merge with
+    the user envconfig, if any, is done when it is first accessed.
     """
 
-    tmppath = ""
+    __slots__ = ("parse_ini", "args", "kwargs", "envconf", "merger")
+
+    def __init__(self, parse_ini, args, kwargs):
+        # type: (ParseIni, tuple, dict) -> None
+        self.parse_ini = parse_ini
+        self.args = args
+        self.kwargs = kwargs
+        self.envconf = None  # the user envconfig to merge into
+        self.merger = None  # the EnvconfMerger to merge with
+
+    def materialize(self):
+        # type: () -> TestenvConfig
+        """Build the default envconfig and merge it into the user one."""
+
+        def_envconf = ParseIni.make_envconfig(
+            self.parse_ini, *self.args, **self.kwargs
+        )
+        if self.envconf is None:
+            return def_envconf
+        merge_envconf(self.envconf, def_envconf, self.merger)
+        return self.envconf
+
+
+class _LazyEnvconfigs(OrderedDict):
+    """Envconfigs dict which materializes _LazyEnvconfig on access."""
+
+    def __getitem__(self, name):
+        # type: (str) -> TestenvConfig
+        envconf = OrderedDict.__getitem__(self, name)
+        if isinstance(envconf, _LazyEnvconfig):
+            envconf = envconf.materialize()
+            OrderedDict.__setitem__(self, name, envconf)
+        return envconf
+
+    def get(self, name, default=None):
+        # type: (str, TestenvConfig) -> TestenvConfig
+        if name in self:
+            return self[name]
+        return default
+
+    def values(self):
+        # type: () -> list
+        return [self[name] for name in self]
+
+    def items(self):
+        # type: () -> list
+        return [(name, self[name]) for name in self]
+
+    def itervalues(self):
+        # type: () -> Iterator
+        """Python 2 dict.itervalues."""
+        return iter(self.values())
+
+    def iteritems(self):
+        # type: () -> Iterator
+        """Python 2 dict.iteritems."""
+        return iter(self.items())
 
-    def __init__(self, path, tmppath=""):
-        # pylint: disable=super-with-arguments
-        super(_LSRPath, self).__init__(path)
-        self.tmppath = tmppath
 
-    def __str__(self):
-        if self.tmppath:
-            call_stack = traceback.extract_stack()
-            for filename, _, func, _ in call_stack:
-                if (
-                    filename.endswith("iniconfig.py")
-                    or filename.endswith("iniconfig/__init__.py")
-                ) and func == "__init__":
-                    return self.tmppath
-        # pylint: disable=super-with-arguments
-        return super(_LSRPath, self).__str__()
+def _selective_parse_ini(selected):
+    # type: (Set[str]) -> type
+    """Return a ParseIni which defers the testenvs not in selected."""
 
+    class _SelectiveParseIni(ParseIni):
+        # pylint: disable=too-few-public-methods
+        def make_envconfig(self, name, *args, **kwargs):
+            # type: (str, object, object) -> TestenvConfig
+            """Build the envconfig name, or defer it if not selected."""
 
-def prop_is_set(envconf, propname):
-    # type: (TestenvConfig, str) -> bool
+            # internal envs like .package and .tox are always built
+            if name in selected or name.startswith("."):
+                return ParseIni.make_envconfig(self, name, *args, **kwargs)
+            # the lazy envconfig stands in for the TestenvConfig
+            return _LazyEnvconfig(self, (name,) + args, kwargs)  # type: ignore
+
+    return _SelectiveParseIni
+
+
+def parse_ini_data(config, toxinipath, ini_data, selected=None):
+    # type: (Config, py.path.local, str, Optional[Set[str]]) -> None
     """
-    Determine if property propname was explicitly set in envconf.
+    Parse ini_data into config as if it were read from toxinipath.
 
-    If the value was set in the underlying config object, either
-    in the testenv:section or in the "testenv" section, then assume
-    the value was explicitly set and return True, otherwise False.
+    config.toxinipath is set to toxinipath for the substitutions, but
+    the data is parsed from memory.  If selected is given, only the
+    testenvs named in selected are built, the others are deferred.
     """
 
-    section_name = testenvprefix + envconf.envname
-    cfg = envconf._reader._cfg.sections.get(section_name, {})
-    tecfg = envconf._reader._cfg.sections.get("testenv", {})
-    return propname in cfg or propname in tecfg
+    parse_ini = ParseIni
+    if selected is not None:
+        parse_ini = _selective_parse_ini(selected)
+    try:
+        _ = parse_ini(config, toxinipath, ini_data)
+    except TypeError:  # old version of tox
+        with _InMemoryIniConfig(toxinipath, ini_data):
+            _ = parse_ini(config, toxinipath)
+
 
+def get_selected_envs(config):
+    # type: (Config) -> Optional[Set[str]]
+    """
+    Return the names of the testenvs selected to run.
 
-def merge_prop_values(propname, envconf, def_envconf):
-    # type: (str, TestenvConfig, TestenvConfig) -> None
-    """If propname is one of the values we can merge, do the merge."""
+    The testenvs are selected with -e or TOXENV (or by tox parallel
+    mode).  Return None if all testenvs from the envlist will run.
+    """
 
-    if propname == "setenv":  # merge env vars
-        for envvar in def_envconf.setenv.keys():
-            if envvar not in envconf.setenv:
-                envconf.setenv[envvar] = def_envconf.setenv[envvar]
-    elif propname == "deps":
-        envconf.deps = list(set(envconf.deps + def_envconf.deps))
-    elif propname == "passenv":
-        envconf.passenv = envconf.passenv.union(def_envconf.passenv)
-    elif propname == "whitelist_externals":
-        envconf.whitelist_externals = list(
-            set(envconf.whitelist_externals + def_envconf.whitelist_externals)
+    explicit = getattr(config, "envlist_explicit", None)
+    if explicit is None:  # tox 2.x
+        explicit = bool(
+            getattr(config.option, "env", None) or os.environ.get("TOXENV")
         )
+    envlist = getattr(config, "envlist", None) or []
+    if not explicit or "ALL" in envlist:
+        return None
+    return set(envlist)
 
 
 def set_prop_values_ini(propname, def_conf, conf):
     # type: (str, dict, dict) -> None
     """If propname is one of the values we can merge, do the merge."""
 
-    can_be_merged = set(["setenv", "deps", "passenv", "whitelist_externals"])
+    # pylint: disable=import-outside-toplevel
+    from .merge import merge_ini_values
+
     conf_val = conf[propname]
     if propname not in def_conf:
         def_conf[propname] = conf_val
-    elif propname in can_be_merged:
-        # merge the merge-able values
-        def_conf[propname] += "\n" + conf_val
     else:
-        # replace default value with value from user
-        def_conf[propname] = conf_val
+        def_conf[propname] = merge_ini_values(
+            propname, def_conf[propname], conf_val
+        )
 
 
-def merge_envconf(envconf, def_envconf):
-    # type: (TestenvConfig, TestenvConfig) -> None
-    """Merge the default envconfig from def_envconf into the given envconf."""
+def merge_envconf(
+    envconf,  # type: TestenvConfig
+    def_envconf,  # type: TestenvConfig
+    merger=None,  # type: Optional[merge.EnvconfMerger]
+):
+    # type: (...) -> None
+    """
+    Merge the default envconfig from def_envconf into the given envconf.
 
-    # access what was actually set in the customized tox.ini so that
-    # we can override the properties which were not set
-    for propname in dir(def_envconf):
-        if propname.startswith("_"):
-            continue
-        if prop_is_set(def_envconf, propname):
-            if not prop_is_set(envconf, propname):
-                try:
-                    setattr(envconf, propname, getattr(def_envconf, propname))
-                except AttributeError:  # some props cannot be set
-                    pass
-            else:
-                merge_prop_values(propname, envconf, def_envconf)
+    merger is the EnvconfMerger to use - pass it when merging many
+    envconfigs, otherwise one is created from the config schema.
+    """
+
+    if merger is None:
+        # pylint: disable=import-outside-toplevel
+        from .merge import EnvconfMerger
+
+        merger = EnvconfMerger(def_envconf.config._testenv_attr)
+    merger.merge_envconf(envconf, def_envconf)
 
 
 def merge_ini(config, default_config):
     # type: (Config, str) -> str
     """Merge the default config into the user provided config."""
 
+    # pylint: disable=import-outside-toplevel
+    try:
+        from cStringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    try:
+        from ConfigParser import ConfigParser
+    except ImportError:
+        from configparser import ConfigParser
+
     default_ini = py.iniconfig.IniConfig("", default_config)
     for section_name, section in config._cfg.sections.items():
         def_section = default_ini.sections.setdefault(section_name, section)
@@ -176,9 +313,21 @@ def merge_ini(config, default_config):
     return strio.getvalue()
 
 
-def merge_config(config, default_config):
-    # type: (Config, Config) -> None
-    """Merge default_config into config."""
+def merge_config(
+    config,  # type: Config
+    default_config,  # type: Config
+    merger=None,  # type: Optional[merge.EnvconfMerger]
+):
+    # type: (...) -> None
+    """
+    Merge default_config into config.
+
+    The testenvs are merged with merger, if given, otherwise with an
+    EnvconfMerger created from the default_config schema.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from .merge import EnvconfMerger, unique
 
     # merge the top level config properties
     def_tox_sec = default_config._cfg.sections["tox"]
@@ -203,17 +352,200 @@ def merge_config(config, default_config):
         )
     # merge the top level config properties that are set implicitly
     if hasattr(config, "envlist_explicit") and not config.envlist_explicit:
-        config.envlist_default = list(
-            set(config.envlist_default + default_config.envlist_default)
+        config.envlist_default = unique(
+            config.envlist_default + default_config.envlist_default
         )
-        config.envlist = list(set(config.envlist + default_config.envlist))
+        config.envlist = unique(config.envlist + default_config.envlist)
 
-    # merge the testenvs
+    # merge the testenvs - the deferred ones are merged on first access
+    if merger is None:
+        merger = EnvconfMerger(default_config._testenv_attr)
+    has_lazy = False
     for def_envname, def_envconf in default_config.envconfigs.items():
-        if def_envname not in config.envconfigs:
+        if isinstance(def_envconf, _LazyEnvconfig):
+            has_lazy = True
+            def_envconf.envconf = config.envconfigs.get(def_envname)
+            def_envconf.merger = merger
+            config.envconfigs[def_envname] = def_envconf
+        elif def_envname not in config.envconfigs:
             config.envconfigs[def_envname] = def_envconf
         else:
-            merge_envconf(config.envconfigs[def_envname], def_envconf)
+            merge_envconf(config.envconfigs[def_envname], def_envconf, merger)
+    if has_lazy:
+        config.envconfigs = _LazyEnvconfigs(config.envconfigs)
+
+
+def get_merged_ini(config, default_config, lsr_scriptdir, lsr_configdir):
+    # type: (Config, str, str, str) -> str
+    """
+    Return the default config merged with the user provided config.
+
+    The result, with the lsr_scriptdir and lsr_configdir keywords
+    replaced, is cached under toxworkdir unless the cache is disabled.
+    Only the merged ini text is cached - it is still parsed every time.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from .cache import (
+        config_cache_key,
+        get_cache_dir,
+        read_cached_config,
+        write_cached_config,
+    )
+
+    cache_dir = get_cache_dir(config.toxworkdir)
+    cache_key = None  # type: Optional[str]
+    if is_lsr_cache_enabled(config):
+        cache_key = config_cache_key(
+            config.toxinipath, default_config, lsr_scriptdir, lsr_configdir
+        )
+    if cache_key:
+        merged_ini = read_cached_config(
+            cache_dir, config.toxinipath, cache_key
+        )
+        if merged_ini is not None:
+            return merged_ini
+    merged_ini = (
+        merge_ini(config, default_config)
+        .replace(LSR_SCRIPTDIR_KW, lsr_scriptdir)
+        .replace(LSR_CONFIGDIR_KW, lsr_configdir)
+    )
+    if cache_key:
+        write_cached_config(
+            cache_dir, config.toxinipath, cache_key, merged_ini
+        )
+    return merged_ini
+
+
+def get_molecule_envkey():
+    # type: () -> str
+    """
+    Return the key of the molecule env dir for the selected molecule deps.
+
+    The molecule deps depend on the ansible version and the driver
+    selected with env vars.  With an env dir for each combination,
+    switching the ansible version does not recreate the env dir of the
+    previous version, and the runs of all the scenarios with the same
+    ansible version use the same env dir.
+    """
+
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    hsh = hashlib.sha256()
+    for name, default in MOLECULE_DEPS_ENV:
+        hsh.update(os.environ.get(name, default).encode("utf-8"))
+        hsh.update(b"\0")
+    return hsh.hexdigest()[:12]
+
+
+def get_envconf_fingerprint(envconf):
+    # type: (TestenvConfig) -> str
+    """
+    Return the fingerprint of what is installed in the env dir of envconf.
+
+    The deps are kept in their order, as pip installs them in that
+    order.
+    """
+
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    hsh = hashlib.sha256()
+    for propname in ENVDIR_FINGERPRINT_PROPS:
+        value = getattr(envconf, propname, None)
+        if isinstance(value, (list, tuple)):
+            value = "\n".join(str(item) for item in value)
+        hsh.update("{0}={1}\0".format(propname, value).encode("utf-8"))
+    return hsh.hexdigest()[:12]
+
+
+def share_envdirs(config, selected=None):
+    # type: (Config, Set[str]) -> Dict[str, List[str]]
+    """
+    Use a shared env dir for the testenvs which install the same things.
+
+    The env dir of each testenv is set to a dir named after the
+    fingerprint of the testenv, so the testenvs with the same
+    fingerprint share it, in this run and in the next runs.  Only the
+    testenvs in selected, or all of them if selected is None, which
+    use the default env dir are changed, and not the ones which set
+    lsr_share_envdir = false in their testenv section.  Return the
+    names of the testenvs which use each shared env dir.
+    """
+
+    shared = {}  # type: Dict[str, List[str]]
+    names = list(config.envconfigs) if selected is None else selected
+    for name in sorted(names):
+        if name not in config.envconfigs:
+            continue
+        envconf = config.envconfigs[name]
+        olddir = envconf.envdir
+        if str(olddir) != str(config.toxworkdir.join(name)):
+            continue  # env dir set explicitly
+        reader = getattr(envconf, "_reader", None)
+        if reader is not None and (
+            reader._cfg.get("testenv:" + name, LSR_SHARE_ENVDIR, "true")
+            == "false"
+        ):
+            continue
+        newdir = config.toxworkdir.join(
+            SHARED_ENVDIR_PREFIX + get_envconf_fingerprint(envconf)
+        )
+        envconf.envdir = newdir
+        # as if envdir was set in the ini, where the default logdir and
+        # tmpdir are in the envdir
+        for propname in ("envlogdir", "envtmpdir"):
+            value = getattr(envconf, propname, None)
+            if value is not None and value.dirpath() == olddir:
+                setattr(envconf, propname, newdir.join(value.basename))
+        if reader is not None:
+            # setenv e.g. LSR_TOX_ENV_DIR = {envdir} is substituted
+            # when it is used
+            reader.addsubstitutions(envdir=newdir)
+        shared.setdefault(str(newdir), []).append(name)
+    return shared
+
+
+def run_plan(config):
+    # type: (Config) -> None
+    """
+    Order the testenvs to run for tox --parallel.
+
+    The testenvs which share an env dir are made to depend on each
+    other.  With --lsr-plan, print the dependencies and exit.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from .plan import add_envdir_depends, format_plan, get_graph
+
+    envnames = [
+        name
+        for name in getattr(config, "envlist", None) or []
+        if name in config.envconfigs
+    ]
+    add_envdir_depends(config, envnames)
+    if not getattr(config.option, LSR_PLAN, None):
+        return
+    try:
+        sys.stdout.write(format_plan(get_graph(config, envnames)))
+        status = 0
+    except ValueError as exc:
+        sys.stderr.write("tox-lsr plan: {0}\n".format(exc))
+        status = 1
+    raise SystemExit(status)
+
+
+def get_package_file(subdir, name):
+    # type: (str, str) -> str
+    """
+    Return the path of a file installed with the tox_lsr package.
+
+    The package is not zip safe, so its data files are always
+    installed as regular files next to this module.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), subdir, name
+    )
 
 
 def is_lsr_enabled(config):
@@ -233,6 +565,56 @@ def is_lsr_enabled(config):
     return config._cfg.get(LSR_CONFIG_SECTION, LSR_ENABLE, "false") == "true"
 
 
+def is_lsr_profile_enabled(config):
+    # type: (Config) -> bool
+    """
+    See if tox_configure should be profiled.
+
+    First look for the cmdline option, then the env var.
+    """
+    if getattr(config.option, LSR_PROFILE, None):
+        return True
+    return os.environ.get(LSR_PROFILE_ENV, "false") == "true"
+
+
+def is_lsr_share_envdirs_enabled(config):
+    # type: (Config) -> bool
+    """
+    See if the testenvs which install the same things share an env dir.
+
+    First look for the cmdline option, then the env var, then finally
+    see if there is a setting in the [lsr_config] section.
+    """
+    if getattr(config.option, LSR_SHARE_ENVDIRS, None):
+        return True
+    if LSR_SHARE_ENVDIRS_ENV in os.environ:
+        return os.environ[LSR_SHARE_ENVDIRS_ENV] == "true"
+    return (
+        config._cfg.get(LSR_CONFIG_SECTION, LSR_SHARE_ENVDIRS, "false")
+        == "true"
+    )
+
+
+def is_lsr_wheelhouse_enabled():
+    # type: () -> bool
+    """See if the testenvs should install from the wheelhouse."""
+
+    return os.environ.get(LSR_WHEELHOUSE_ENV, "false") == "true"
+
+
+def is_lsr_cache_enabled(config):
+    # type: (Config) -> bool
+    """
+    See if the merged ini cache should be used.
+
+    The cache is used unless disabled with the cmdline option or
+    with the env var.
+    """
+    if getattr(config.option, LSR_NO_CACHE, None):
+        return False
+    return os.environ.get(LSR_NO_CACHE_ENV, "false") != "true"
+
+
 @hookimpl
 def tox_addoption(parser):
     # type: (Parser) -> None
@@ -247,6 +629,40 @@ def tox_addoption(parser):
         ),
         default=None,
     )
+    parser.add_argument(
+        "--lsr-profile",
+        dest=LSR_PROFILE,
+        action="store_true",
+        help="Profile the tox-lsr configuration (env: {envvar})".format(
+            envvar=LSR_PROFILE_ENV
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--lsr-no-cache",
+        dest=LSR_NO_CACHE,
+        action="store_true",
+        help="Do not use the tox-lsr merged ini cache (env: {envvar})".format(
+            envvar=LSR_NO_CACHE_ENV
+        ),
+        default=None,
+    )
+    parser.add_argument(
+        "--lsr-share-envdirs",
+        dest=LSR_SHARE_ENVDIRS,
+        action="store_true",
+        help="Share the env dirs of the testenvs with the same deps "
+        "(env: {envvar})".format(envvar=LSR_SHARE_ENVDIRS_ENV),
+        default=None,
+    )
+    parser.add_argument(
+        "--lsr-plan",
+        dest=LSR_PLAN,
+        action="store_true",
+        help="Print the order in which tox --parallel runs the testenvs, "
+        "and exit",
+        default=None,
+    )
 
 
 # Run this hook *before* any other tox_configure hook,
@@ -260,65 +676,86 @@ def tox_configure(config):
     if not is_lsr_enabled(config):
         return
 
-    lsr_scriptdir = os.environ.get(LSR_SCRIPTDIR_ENV)
-    if not lsr_scriptdir:
-        lsr_script_filename = pkg_resources.resource_filename(
-            __name__,
-            "{tsdir}/{tsname}".format(
-                tsdir=TEST_SCRIPTS_SUBDIR,
-                tsname=SCRIPT_NAME,
-            ),
+    # pylint: disable=import-outside-toplevel
+    from .merge import EnvconfMerger
+    from .profiling import ConfigureProfile
+
+    profile = ConfigureProfile(is_lsr_profile_enabled(config))
+    with profile.phase("resources"):
+        lsr_scriptdir = os.environ.get(LSR_SCRIPTDIR_ENV)
+        if not lsr_scriptdir:
+            lsr_scriptdir = os.path.dirname(
+                get_package_file(TEST_SCRIPTS_SUBDIR, SCRIPT_NAME)
+            )
+        lsr_configdir = os.environ.get(LSR_CONFIGDIR_ENV)
+        if not lsr_configdir:
+            lsr_configdir = os.path.dirname(
+                get_package_file(CONFIG_FILES_SUBDIR, CONFIG_NAME)
+            )
+        with open(
+            get_package_file(CONFIG_FILES_SUBDIR, TOX_DEFAULT_INI), "rb"
+        ) as ini_f:
+            lsr_default_raw = ini_f.read().decode("utf-8")
+    with profile.phase("merge_ini"):
+        lsr_default = get_merged_ini(
+            config, lsr_default_raw, lsr_scriptdir, lsr_configdir
         )
-        lsr_scriptdir = os.path.dirname(lsr_script_filename)
-    lsr_configdir = os.environ.get(LSR_CONFIGDIR_ENV)
-    if not lsr_configdir:
-        lsr_config_filename = pkg_resources.resource_filename(
-            __name__,
-            "{cfdir}/{cfname}".format(
-                cfdir=CONFIG_FILES_SUBDIR,
-                cfname=CONFIG_NAME,
-            ),
+        # not in the cached merged ini, as it depends on the env vars
+        lsr_default = lsr_default.replace(
+            LSR_MOLECULE_ENVKEY_KW, get_molecule_envkey()
         )
-        lsr_configdir = os.path.dirname(lsr_config_filename)
-    lsr_default = pkg_resources.resource_string(
-        __name__,
-        "{cfdir}/{deftox}".format(
-            cfdir=CONFIG_FILES_SUBDIR,
-            deftox=TOX_DEFAULT_INI,
-        ),
-    ).decode()
-    lsr_default = (
-        merge_ini(config, lsr_default)
-        .replace(LSR_SCRIPTDIR_KW, lsr_scriptdir)
-        .replace(LSR_CONFIGDIR_KW, lsr_configdir)
-    )
-    config.option.workdir = config.toxworkdir
-    try:
-        default_config = Config(
-            config.pluginmanager,
-            config.option,
-            config.interpreters,
-            config._parser,
-            [],
-        )
-    except TypeError:  # old version of tox
-        # pylint: disable=no-value-for-parameter
-        default_config = Config(
-            config.pluginmanager,
-            config.option,
-            config.interpreters,
-        )
-        default_config._parser = config._parser
-        default_config._testenv_attr = config._testenv_attr
-    tox_ini_tmp = NamedTemporaryFile(delete=False)
-    try:
-        with open(tox_ini_tmp.name, "w") as tox_ini_tmp_f:
-            tox_ini_tmp_f.write(lsr_default)
-        lsr_path = _LSRPath(config.toxinipath, tox_ini_tmp.name)
+    with profile.phase("parse_ini"):
+        config.option.workdir = config.toxworkdir
         try:
-            _ = ParseIni(default_config, lsr_path, None)
+            default_config = Config(
+                config.pluginmanager,
+                config.option,
+                config.interpreters,
+                config._parser,
+                [],
+            )
         except TypeError:  # old version of tox
-            _ = ParseIni(default_config, lsr_path)
-        merge_config(config, default_config)
-    finally:
-        os.unlink(tox_ini_tmp.name)
+            # pylint: disable=no-value-for-parameter
+            default_config = Config(
+                config.pluginmanager,
+                config.option,
+                config.interpreters,
+            )
+            default_config._parser = config._parser
+            default_config._testenv_attr = config._testenv_attr
+        parse_ini_data(
+            default_config,
+            config.toxinipath,
+            lsr_default,
+            get_selected_envs(config),
+        )
+    with profile.phase("merge_config"):
+        merger = EnvconfMerger(default_config._testenv_attr)
+        merge_config(config, default_config, merger)
+    if is_lsr_share_envdirs_enabled(config):
+        with profile.phase("share_envdirs"):
+            share_envdirs(config, get_selected_envs(config))
+    if is_lsr_wheelhouse_enabled():
+        from .wheelhouse import set_install_commands
+
+        with profile.phase("wheelhouse"):
+            set_install_commands(
+                config, get_selected_envs(config), lsr_scriptdir
+            )
+    if profile.enabled:
+        profile.counts.update(
+            {
+                "envs": len(config.envconfigs),
+                "envs_merged": merger.envs_merged,
+                "envs_deferred": len(
+                    [
+                        envconf
+                        for envconf in dict.values(default_config.envconfigs)
+                        if isinstance(envconf, _LazyEnvconfig)
+                    ]
+                ),
+                "props_merged": merger.props_merged,
+            }
+        )
+        profile.report(config.toxworkdir)
+    run_plan(config)
@@ -0,0 +1,194 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Rules for merging the default tox-lsr config into the user config."""
+
+from tox.config import testenvprefix
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import Any, Callable, Iterable, List, Set
+
+    from tox.config import TestenvConfig, VenvAttribute
+
+# merge strategies - how a testenv property set in both the user
+# config and the default config is merged
+REPLACE = "replace"  # the user value replaces the default value
+UNION = "union"  # union of the default and user values
+APPEND = "append"  # the user values are appended to the default values
+DICT_MERGE = "dict-merge"  # default keys are added if not set by the user
+
+# The list values of UNION and APPEND are in the same order whether the
+# ini values (merge_ini_values) or the envconfig values (merge_values)
+# are merged: the default values first, then the user values which are
+# not already in the default values.
+
+MERGE_STRATEGIES = {
+    "setenv": DICT_MERGE,
+    "deps": APPEND,
+    "passenv": UNION,
+    "whitelist_externals": APPEND,
+    "allowlist_externals": APPEND,
+}
+
+# code uses some protected members such as _cfg, _reader
+# pylint: disable=protected-access
+
+
+def get_strategy(propname):
+    # type: (str) -> str
+    """Return the merge strategy for testenv property propname."""
+
+    return MERGE_STRATEGIES.get(propname, REPLACE)
+
+
+def unique(items, key=str):
+    # type: (Iterable[Any], Callable[[Any], Any]) -> List[Any]
+    """
+    Return the items without duplicates, in their original order.
+
+    Two items are duplicates if key returns the same value for both.
+    The default key is str, so that e.g. deps, which tox represents as
+    DepConfig objects without equality, are compared by their name.
+    """
+
+    seen = set()
+    result = []
+    for item in items:
+        item_key = key(item)
+        if item_key not in seen:
+            seen.add(item_key)
+            result.append(item)
+    return result
+
+
+def get_set_props(envconf):
+    # type: (TestenvConfig) -> Set[str]
+    """
+    Return the names of the properties explicitly set in envconf.
+
+    A property is explicitly set if it is in the underlying config
+    object, either in the testenv:section or in the "testenv" section.
+    """
+
+    sections = envconf._reader._cfg.sections
+    props = set(sections.get("testenv", {}))
+    props.update(sections.get(testenvprefix + envconf.envname, {}))
+    return props
+
+
+def prop_is_set(envconf, propname):
+    # type: (TestenvConfig, str) -> bool
+    """Determine if property propname was explicitly set in envconf."""
+
+    return propname in get_set_props(envconf)
+
+
+def merge_values(strategy, value, def_value):
+    # type: (str, Any, Any) -> Any
+    """Return the default value def_value merged into value."""
+
+    if strategy == DICT_MERGE and hasattr(def_value, "definitions"):
+        # tox SetenvDict - copy the definitions, which are substituted
+        # when they are used - substituting e.g. {envsitepackagesdir}
+        # runs the interpreter of the testenv
+        for key, definition in def_value.definitions.items():
+            if key not in value:
+                value.definitions[key] = definition
+    elif strategy == DICT_MERGE:
+        for key in def_value.keys():
+            if key not in value:
+                value[key] = def_value[key]
+    elif strategy == UNION and isinstance(value, (set, frozenset)):
+        value = value.union(def_value)
+    elif strategy in (UNION, APPEND):
+        value = unique(list(def_value) + list(value))
+    return value
+
+
+def merge_prop_values(propname, envconf, def_envconf):
+    # type: (str, TestenvConfig, TestenvConfig) -> None
+    """If propname is one of the values we can merge, do the merge."""
+
+    strategy = get_strategy(propname)
+    if strategy != REPLACE:
+        setattr(
+            envconf,
+            propname,
+            merge_values(
+                strategy,
+                getattr(envconf, propname),
+                getattr(def_envconf, propname),
+            ),
+        )
+
+
+def merge_ini_values(propname, def_value, value):
+    # type: (str, str, str) -> str
+    """
+    Return the ini value for propname with value merged into def_value.
+
+    This is the ini level equivalent of merge_values - the values are
+    the raw strings from the ini files, one item per line.
+    """
+
+    strategy = get_strategy(propname)
+    if strategy == REPLACE:
+        return value
+    if strategy == DICT_MERGE:
+        # later definitions win, so the user values are put last
+        return def_value + "\n" + value
+    lines = def_value.splitlines() + value.splitlines()
+    return "\n".join(unique(lines, key=lambda line: line.strip()))
+
+
+class EnvconfMerger(object):
+    # pylint: disable=too-few-public-methods
+    """
+    Merge default testenv configs into user testenv configs.
+
+    The merger is built once from the testenv attribute schema of the
+    tox config (config._testenv_attr), so only the known testenv
+    properties are looked at for each testenv.
+    """
+
+    def __init__(self, testenv_attr):
+        # type: (List[VenvAttribute]) -> None
+        """Build the merger from the testenv attributes of the config."""
+
+        # plugins may add attributes, but a name is only used once
+        self.strategies = [
+            (name, get_strategy(name))
+            for name in unique(attr.name for attr in testenv_attr)
+        ]
+        self.envs_merged = 0
+        self.props_merged = 0  # props set from or merged with the default
+
+    def merge_envconf(self, envconf, def_envconf):
+        # type: (TestenvConfig, TestenvConfig) -> None
+        """Merge the default envconfig def_envconf into envconf."""
+
+        # merge only what was actually set in the default ini, and
+        # override what was not set in the customized tox.ini
+        self.envs_merged += 1
+        def_set_props = get_set_props(def_envconf)
+        set_props = get_set_props(envconf)
+        for propname, strategy in self.strategies:
+            if propname not in def_set_props or not hasattr(
+                def_envconf, propname
+            ):
+                continue
+            def_value = getattr(def_envconf, propname)
+            if propname not in set_props:
+                value = def_value
+            elif strategy == REPLACE:
+                continue
+            else:
+                value = merge_values(
+                    strategy, getattr(envconf, propname), def_value
+                )
+            try:
+                setattr(envconf, propname, value)
+            except AttributeError:  # some props cannot be set
+                continue
+            self.props_merged += 1
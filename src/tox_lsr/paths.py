@@ -0,0 +1,104 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""
+Locate the tox-lsr scripts and config files.
+
+This module is also the tox-lsr-paths command, which prints the dirs
+for the shell scripts e.g. lsr_ci_runtox - much faster than pip show,
+as nothing but this module is imported.
+"""
+
+import os
+import sys
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import List, Optional
+
+# the same as in hooks.py, which does not import this module, so that
+# loading the plugin imports as little as possible
+TEST_SCRIPTS_SUBDIR = "test_scripts"
+CONFIG_FILES_SUBDIR = "config_files"
+LSR_CONFIGDIR_ENV = "LSR_CONFIGDIR"
+LSR_SCRIPTDIR_ENV = "LSR_SCRIPTDIR"
+SCRIPT_NAME = "utils.sh"  # script that must always exist
+CONFIG_NAME = "black.toml"  # config file that must always exist
+
+USAGE = """Usage: tox-lsr-paths [--scriptdir | --configdir]
+
+Print the directory of the tox-lsr test scripts with --scriptdir, or of
+the tox-lsr config files with --configdir.  Otherwise print both as
+shell variable assignments, LSR_SCRIPTDIR=DIR and LSR_CONFIGDIR=DIR.
+The LSR_SCRIPTDIR and LSR_CONFIGDIR env vars override the installed
+dirs, as in the tox-lsr plugin.
+"""
+
+
+def get_package_file(subdir, name):
+    # type: (str, str) -> str
+    """
+    Return the path of a file installed with the tox_lsr package.
+
+    The package is not zip safe, so its data files are always
+    installed as regular files next to this module.
+    """
+
+    return os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), subdir, name
+    )
+
+
+def get_lsr_scriptdir():
+    # type: () -> str
+    """Return the dir of the test scripts."""
+
+    return os.environ.get(LSR_SCRIPTDIR_ENV) or os.path.dirname(
+        get_package_file(TEST_SCRIPTS_SUBDIR, SCRIPT_NAME)
+    )
+
+
+def get_lsr_configdir():
+    # type: () -> str
+    """Return the dir of the config files."""
+
+    return os.environ.get(LSR_CONFIGDIR_ENV) or os.path.dirname(
+        get_package_file(CONFIG_FILES_SUBDIR, CONFIG_NAME)
+    )
+
+
+def shell_quote(value):
+    # type: (str) -> str
+    """Return value quoted for the shell."""
+
+    return "'" + value.replace("'", "'\"'\"'") + "'"
+
+
+def main(argv=None):
+    # type: (Optional[List[str]]) -> int
+    """Entry point of tox-lsr-paths. Return exit code."""
+
+    args = sys.argv[1:] if argv is None else argv
+    if args == ["--scriptdir"]:
+        sys.stdout.write(get_lsr_scriptdir() + "\n")
+    elif args == ["--configdir"]:
+        sys.stdout.write(get_lsr_configdir() + "\n")
+    elif not args:
+        sys.stdout.write(
+            "{script_env}={scriptdir}\n{config_env}={configdir}\n".format(
+                script_env=LSR_SCRIPTDIR_ENV,
+                scriptdir=shell_quote(get_lsr_scriptdir()),
+                config_env=LSR_CONFIGDIR_ENV,
+                configdir=shell_quote(get_lsr_configdir()),
+            )
+        )
+    elif args[0] in ("-h", "--help"):
+        sys.stdout.write(USAGE)
+    else:
+        sys.stderr.write(USAGE)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
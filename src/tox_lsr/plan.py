@@ -0,0 +1,180 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""
+Order the testenvs for tox --parallel.
+
+The ordering dependencies between the default testenvs e.g. that
+ansible-test uses the collection converted by the collection testenv
+are the depends in tox-default.ini.  The testenvs which share an env
+dir, which tox would create or update concurrently, are made to depend
+on each other here, so that tox -p auto runs one of them at a time.
+"""
+
+try:
+    from collections import OrderedDict
+except ImportError:  # python 2.6
+    OrderedDict = dict
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import Dict, List, Set
+
+    from tox.config import Config, TestenvConfig
+
+
+def get_depends(envconf):
+    # type: (TestenvConfig) -> List[str]
+    """Return the depends of envconf - none if tox has no depends."""
+
+    return list(getattr(envconf, "depends", None) or [])
+
+
+def get_graph(config, envnames):
+    # type: (Config, List[str]) -> OrderedDict
+    """
+    Return the dependency graph of the testenvs in envnames.
+
+    The graph maps each testenv name, in the order of envnames, to the
+    names of the testenvs it depends on, leaving out the testenvs which
+    are not in envnames, which tox does not wait for.
+    """
+
+    graph = OrderedDict()  # type: OrderedDict
+    for name in envnames:
+        graph[name] = []
+    for name in envnames:
+        for depend in get_depends(config.envconfigs[name]):
+            if depend in graph and depend not in graph[name]:
+                graph[name].append(depend)
+    return graph
+
+
+def get_order(graph):
+    # type: (OrderedDict) -> List[str]
+    """
+    Return the testenv names of graph in dependency order.
+
+    As in tox, the testenvs are kept in their original order where
+    the dependencies allow it.  Raise ValueError if there is a cycle.
+    """
+
+    order = []  # type: List[str]
+    done = set()  # type: Set[str]
+    while len(order) < len(graph):
+        for name, depends in graph.items():
+            if name not in done and all(dep in done for dep in depends):
+                order.append(name)
+                done.add(name)
+                break
+        else:
+            raise ValueError(
+                "circular dependency between {0}".format(
+                    ", ".join(name for name in graph if name not in done)
+                )
+            )
+    return order
+
+
+def add_envdir_depends(config, envnames):
+    # type: (Config, List[str]) -> Dict[str, List[str]]
+    """
+    Make the testenvs which share an env dir depend on each other.
+
+    Each testenv of a shared env dir depends on the previous one in the
+    dependency order, so adding these depends does not make a cycle.
+    Nothing is done if tox has no depends.  Return the names of the
+    testenvs of each shared env dir.
+    """
+
+    envconfs = [config.envconfigs[name] for name in envnames]
+    if not all(hasattr(envconf, "depends") for envconf in envconfs):
+        return {}
+    try:
+        order = get_order(get_graph(config, envnames))
+    except ValueError:  # tox reports the cycle
+        return {}
+    envdirs = OrderedDict()  # type: OrderedDict
+    for name in order:
+        envdirs.setdefault(str(config.envconfigs[name].envdir), []).append(
+            name
+        )
+    shared = {}
+    for envdir, names in envdirs.items():
+        if len(names) < 2:
+            continue
+        shared[envdir] = names
+        for prev, name in zip(names, names[1:]):
+            envconf = config.envconfigs[name]
+            if prev not in envconf.depends:
+                envconf.depends = tuple(envconf.depends) + (prev,)
+    return shared
+
+
+def get_stages(graph):
+    # type: (OrderedDict) -> List[List[str]]
+    """
+    Return the testenvs of graph grouped by stage.
+
+    The testenvs of a stage depend only on the testenvs of the earlier
+    stages, so with enough parallel jobs, each stage runs at once.
+    """
+
+    stage_of = {}  # type: Dict[str, int]
+    for name in get_order(graph):
+        stage_of[name] = 1 + max(
+            [stage_of[dep] for dep in graph[name]] or [-1]
+        )
+    stages = [[] for _ in range(1 + max(stage_of.values() or [-1]))]
+    for name in graph:
+        stages[stage_of[name]].append(name)
+    return stages
+
+
+def get_critical_path(graph):
+    # type: (OrderedDict) -> List[str]
+    """
+    Return the longest chain of dependent testenvs in graph.
+
+    The testenvs are counted as taking the same time, as there is no
+    record of how long they take, so this is the chain of testenvs which
+    cannot run in parallel with each other.
+    """
+
+    longest = {}  # type: Dict[str, List[str]]
+    for name in get_order(graph):
+        chain = []  # type: List[str]
+        for dep in graph[name]:
+            if len(longest[dep]) > len(chain):
+                chain = longest[dep]
+        longest[name] = chain + [name]
+    path = []  # type: List[str]
+    for name in graph:
+        if len(longest[name]) > len(path):
+            path = longest[name]
+    return path
+
+
+def format_plan(graph):
+    # type: (OrderedDict) -> str
+    """Return the execution plan for graph as text."""
+
+    stages = get_stages(graph)
+    lines = [
+        "tox-lsr plan: {0} testenvs in {1} stages".format(
+            len(graph), len(stages)
+        )
+    ]
+    for idx, names in enumerate(stages):
+        lines.append("stage {0}: {1}".format(idx + 1, " ".join(names)))
+    lines.append("dependencies:")
+    depends = [
+        "  {0} <- {1}".format(name, " ".join(deps))
+        for name, deps in graph.items()
+        if deps
+    ]
+    lines.extend(depends or ["  none"])
+    lines.append(
+        "critical path: {0}".format(" -> ".join(get_critical_path(graph)))
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,199 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Per-phase profiling of the tox-lsr tox_configure hook."""
+
+import os
+import sys
+import time
+import timeit
+
+from .version import __version__
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import Any, Dict, List, Optional, Tuple, Union
+
+PROFILE_FILE = "lsr-profile.json"  # relative to toxworkdir
+# in tox parallel mode, each testenv is configured by its own tox process
+PARALLEL_PROFILE_FILE = "lsr-profile-{envname}.json"
+TOX_PARALLEL_ENV = "TOX_PARALLEL_ENV"
+
+try:
+    _cpu_time = time.process_time
+except AttributeError:  # python 2
+    _cpu_time = time.clock  # type: ignore # pylint: disable=no-member
+
+
+def _allocated_blocks():
+    # type: () -> Optional[int]
+    # number of memory blocks currently allocated by the interpreter -
+    # not available in python 2, and cheap compared to tracemalloc
+    getallocatedblocks = getattr(sys, "getallocatedblocks", None)
+    if getallocatedblocks is None:
+        return None
+    return int(getallocatedblocks())
+
+
+class _Phase(object):
+    # pylint: disable=too-few-public-methods
+    """Context manager recording the resources used by a phase."""
+
+    def __init__(self, phases, name):
+        # type: (List[Dict[str, Any]], str) -> None
+        self.phases = phases
+        self.name = name
+        self.start = (
+            0.0,
+            0.0,
+            None,
+        )  # type: Tuple[float, float, Optional[int]]
+
+    def __enter__(self):
+        # type: () -> _Phase
+        self.start = (timeit.default_timer(), _cpu_time(), _allocated_blocks())
+        return self
+
+    def __exit__(self, *args):
+        # type: (object) -> None
+        wall, cpu, blocks = self.start
+        end_blocks = _allocated_blocks()
+        self.phases.append(
+            {
+                "name": self.name,
+                "wall_ms": (timeit.default_timer() - wall) * 1000,
+                "cpu_ms": (_cpu_time() - cpu) * 1000,
+                "alloc_blocks": (
+                    None
+                    if blocks is None or end_blocks is None
+                    else end_blocks - blocks
+                ),
+            }
+        )
+
+
+class _NullPhase(object):
+    # pylint: disable=too-few-public-methods
+    """Context manager used for the phases when not profiling."""
+
+    def __enter__(self):
+        # type: () -> _NullPhase
+        return self
+
+    def __exit__(self, *args):
+        # type: (object) -> None
+        pass
+
+
+class ConfigureProfile(object):
+    """
+    Profile of one run of tox_configure.
+
+    Each phase records its wall and CPU time, and the net number of
+    memory blocks it allocated.  The counts are e.g. the number of
+    merged envs and properties.  If not enabled, nothing is recorded.
+    """
+
+    def __init__(self, enabled=True):
+        # type: (bool) -> None
+        """Create the profile, recording nothing unless enabled."""
+
+        self.enabled = enabled
+        self.phases = []  # type: List[Dict[str, Any]]
+        self.counts = {}  # type: Dict[str, int]
+
+    def phase(self, name):
+        # type: (str) -> Union[_Phase, _NullPhase]
+        """Return a context manager recording the phase name."""
+
+        if not self.enabled:
+            return _NullPhase()
+        return _Phase(self.phases, name)
+
+    def results(self):
+        # type: () -> Dict[str, Any]
+        """Return the profile as a JSON serializable dict."""
+
+        total = {
+            "wall_ms": 0.0,
+            "cpu_ms": 0.0,
+            "alloc_blocks": 0,
+        }  # type: Dict[str, Optional[float]]
+        for phase in self.phases:
+            for key in total:
+                if total[key] is None or phase[key] is None:
+                    total[key] = None
+                else:
+                    total[key] += phase[key]
+        return {
+            "tox_lsr_version": __version__,
+            "python_version": "{major}.{minor}.{micro}".format(
+                major=sys.version_info[0],
+                minor=sys.version_info[1],
+                micro=sys.version_info[2],
+            ),
+            "pid": os.getpid(),
+            "time": time.time(),
+            "phases": self.phases,
+            "total": total,
+            "counts": self.counts,
+        }
+
+    def summary(self):
+        # type: () -> str
+        """Return a one-line summary of the profile."""
+
+        results = self.results()
+        phases = ", ".join(
+            "{name} {wall_ms:.1f}".format(**phase) for phase in self.phases
+        )
+        counts = " ".join(
+            "{key}={val}".format(key=key, val=val)
+            for key, val in sorted(self.counts.items())
+        )
+        return (
+            "tox-lsr profile: tox_configure {wall:.1f} ms wall"
+            " {cpu:.1f} ms cpu ({phases}) {counts}".format(
+                wall=results["total"]["wall_ms"],
+                cpu=results["total"]["cpu_ms"],
+                phases=phases,
+                counts=counts,
+            )
+        )
+
+    def write(self, toxworkdir):
+        # type: (str) -> Optional[str]
+        """
+        Write the profile as JSON under toxworkdir, return the path.
+
+        Return None if the file could not be written - the profile is
+        only diagnostic, so that must not break the tox run.
+        """
+
+        import json  # pylint: disable=import-outside-toplevel
+
+        envname = os.environ.get(TOX_PARALLEL_ENV)
+        if envname:
+            name = PARALLEL_PROFILE_FILE.format(envname=envname)
+        else:
+            name = PROFILE_FILE
+        path = os.path.join(str(toxworkdir), name)
+        try:
+            if not os.path.isdir(str(toxworkdir)):
+                os.makedirs(str(toxworkdir))
+            with open(path, "w") as prof_f:
+                json.dump(self.results(), prof_f, indent=2, sort_keys=True)
+        except (IOError, OSError):
+            return None
+        return path
+
+    def report(self, toxworkdir):
+        # type: (str) -> None
+        """Write the profile under toxworkdir and the summary to stderr."""
+
+        path = self.write(toxworkdir)
+        sys.stderr.write(
+            "{summary} -> {path}\n".format(
+                summary=self.summary(), path=path or "(not written)"
+            )
+        )
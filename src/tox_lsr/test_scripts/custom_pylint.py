@@ -42,7 +42,13 @@ but it is handled by run_pylint.py instead:
      or not;
   3. if --exclude followed by a PATTERN is contained in ARGUMENTS, the PATTERN
      is used instead of EXPAT to recognize whether the file or directory should
-     be skipped.
+     be skipped;
+  4. if --jobs followed by a number N is contained in ARGUMENTS, the files are
+     split into N shards of about the same total size, and each shard is
+     checked by its own pylint process.  If N is 0, the number of CPUs is
+     used.  The messages of the shards are merged into one report, sorted by
+     module, and the exit code is the bitwise OR of the exit codes of the
+     shards.
 
 Exclusion takes a priority over inclusion, i.e. if a file or directory can be
 both included and excluded, it is excluded.
@@ -59,15 +65,38 @@ Environment variables:
 
   RUN_PYLINT_DISABLED
     if set to an arbitrary non-empty value, pylint will be not executed
+
+  RUN_PYLINT_JOBS
+    overrides default value of N, which is 1 - pylint is run in this process
+
+  RUN_PYLINT_USE_GIT
+    if set to an arbitrary non-empty value and the working directory is in a
+    git checkout, take the candidate files from git ls-files instead of
+    walking the directory tree - the same files are selected, but in sorted
+    order; if git cannot be used, the directory tree is walked
+
+  LSR_LINT_CACHE
+    if set to true, the result of pylint is cached, see lint_cache.py - as
+    pylint infers e.g. the members of imported modules from other files, the
+    result is cached for all the files checked together, and is used only if
+    none of them, the pylint arguments, the rcfile and the installed python
+    packages have changed
 """
 
+import heapq
 import os
 import re
+import stat
+import subprocess  # nosec B404 # runs git and pylint
 import sys
+import tempfile
 
+import lint_cache
 from colorama import Fore
 from pylint.lint import Run
 
+MODULE_HEADER = "************* Module "
+
 
 def blue(s):
     """Return string `s` colorized to blue."""
@@ -86,17 +115,20 @@ def probe_args():
     Analyze the command line arguments for pylint arguments.
 
     Analyze the command line arguments and return a tuple containing a list of
-    pylint arguments, pattern string to recognize files to be included, and
-    pattern string to recognize files and directories to be skipped.
+    pylint arguments, pattern string to recognize files to be included,
+    pattern string to recognize files and directories to be skipped, and the
+    number of pylint processes to run.
 
     Default values of pattern strings are taken from RUN_PYLINT_INCLUDE and
     RUN_PYLINT_EXCLUDE environment variables. In the case they are not defined,
-    .*\\.py[iw]?$ and ^\\..* are used, respectively.
+    .*\\.py[iw]?$ and ^\\..* are used, respectively.  Default number of
+    processes is taken from RUN_PYLINT_JOBS, or is 1.
     """
 
     args = []
     include_pattern = os.getenv("RUN_PYLINT_INCLUDE", r".*\.py[iw]?$")
     exclude_pattern = os.getenv("RUN_PYLINT_EXCLUDE", r"^\..*")
+    jobs = os.getenv("RUN_PYLINT_JOBS", "") or "1"
     i, nargs = 1, len(sys.argv)
     while i < nargs:
         arg = sys.argv[i]
@@ -110,31 +142,207 @@ def probe_args():
             if i >= nargs:
                 raise ValueError("--exclude: missing PATTERN")
             exclude_pattern = sys.argv[i]
+        elif arg == "--jobs":
+            i += 1
+            if i >= nargs:
+                raise ValueError("--jobs: missing N")
+            jobs = sys.argv[i]
         else:
             args.append(arg)
         i += 1
-    return args, include_pattern, exclude_pattern
+    if not re.match(r"^[0-9]+$", jobs):
+        raise ValueError("--jobs: N is not a number: %s" % jobs)
+    jobs = int(jobs)
+    if jobs == 0:
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+
+        jobs = multiprocessing.cpu_count()
+    return args, include_pattern, exclude_pattern, jobs
+
+
+class _DirEntry(object):
+    """
+    Minimal os.DirEntry for python 2, which has no os.scandir.
+
+    The entry is stat-ed once, and only when its type is needed.
+    """
+
+    __slots__ = ("name", "path", "_mode")
+
+    def __init__(self, dirpath, name):
+        self.name = name
+        self.path = os.path.join(dirpath, name)
+        self._mode = None
+
+    def _get_mode(self):
+        if self._mode is None:
+            try:
+                self._mode = os.lstat(self.path).st_mode
+            except OSError:
+                self._mode = 0
+        return self._mode
+
+    def is_symlink(self):
+        """Return True if the entry is a symbolic link."""
+
+        return stat.S_ISLNK(self._get_mode())
+
+    def is_dir(self):
+        """Return True if the entry is a directory."""
+
+        return stat.S_ISDIR(self._get_mode())
+
+    def is_file(self):
+        """Return True if the entry is a regular file."""
+
+        return stat.S_ISREG(self._get_mode())
+
+
+def scandir(path):
+    """Return the list of os.DirEntry like entries of directory `path`."""
+
+    if hasattr(os, "scandir"):
+        return list(os.scandir(path))
+    return [_DirEntry(path, name) for name in os.listdir(path)]
 
 
 def probe_dir(path, include_re, exclude_re):
     """
     Look for files to include or exclude based on pattern.
 
-    Recursively go through directory structure starting at `path`, collect
-    files that match `include_re`, skip files and directories that are either
-    symbolic links or match `exclude_re`. Return the list of collected files.
+    Go through directory structure starting at `path`, collect files that
+    match `include_re`, skip files and directories that are either symbolic
+    links or match `exclude_re`. Return the list of collected files, in the
+    order of a depth-first walk.
+    """
+
+    files = []
+    # stack of the iterators over the entries of the directories being
+    # walked - the entries of a subdirectory are processed before the
+    # remaining entries of its parent
+    stack = [iter(scandir(path))]
+    while stack:
+        for entry in stack[-1]:
+            if exclude_re.match(entry.name) or entry.is_symlink():
+                continue
+            if entry.is_dir():
+                stack.append(iter(scandir(entry.path)))
+                break
+            if entry.is_file() and include_re.match(entry.name):
+                files.append(entry.path)
+        else:
+            stack.pop()
+    return files
+
+
+def git_ls_files(path, args):
+    """
+    Return the NUL separated output of git ls-files `args` run in `path`.
+
+    Return None if `path` is not in a git checkout or git fails.
+    """
+
+    try:
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            ["git", "ls-files", "-z"] + args,
+            cwd=path,  # nosec B603 # git ls-files, no shell
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    except OSError:  # no git
+        return None
+    out, _ = proc.communicate()
+    if proc.returncode != 0:
+        return None
+    if not isinstance(out, str):
+        out = out.decode(sys.getfilesystemencoding(), "surrogateescape")
+    return [item for item in out.split("\0") if item]
+
+
+def git_entries(path):
+    """
+    Return the entries under `path` known to git, relative to `path`.
+
+    Return a sorted list of (name, is_dir) tuples.  The entries are the
+    tracked files, the submodules, the untracked files including the ignored
+    ones, and the untracked directories, which git does not list the contents
+    of, e.g. nested git checkouts.  Return None if git cannot be used.
+    """
+
+    tracked = git_ls_files(path, ["--stage"])
+    others = git_ls_files(path, ["--others", "--directory"])
+    if tracked is None or others is None:
+        return None
+    entries = set()
+    for item in tracked:
+        meta, _, name = item.partition("\t")
+        entries.add((name, meta.startswith("160000 ")))  # 160000 - submodule
+    for name in others:
+        entries.add((name.rstrip("/"), name.endswith("/")))
+    return sorted(entries)
+
+
+def probe_git(path, include_re, exclude_re):
+    """
+    Look for files to include or exclude based on pattern using git.
+
+    Select the same files as probe_dir, but take the candidate files from
+    git ls-files, so that only the matching files have to be stat-ed, and
+    only the directories git does not know the contents of have to be
+    walked.  Return the sorted list of collected files, or None if git cannot
+    be used, or if the .git directory is not excluded.
     """
 
+    # git does not list its own .git directory
+    if not exclude_re.match(".git") and os.path.lexists(
+        os.path.join(path, ".git")
+    ):
+        return None
+    entries = git_entries(path)
+    if entries is None:
+        return None
     files = []
-    for direntry in os.listdir(path):
-        fullpath = os.path.join(path, direntry)
-        if os.path.islink(fullpath) or exclude_re.match(direntry):
+    pruned = set()  # directories which are excluded or symbolic links
+    for name, is_dir in entries:
+        parts = name.split("/")
+        if exclude_re.match(parts[-1]):
             continue
-        elif os.path.isdir(fullpath):
+        if not is_dir and not include_re.match(parts[-1]):
+            continue
+        skip = False
+        for idx in range(1, len(parts)):
+            dirname = "/".join(parts[:idx])
+            if dirname in pruned:
+                skip = True
+                break
+            if exclude_re.match(parts[idx - 1]) or os.path.islink(
+                os.path.join(path, dirname)
+            ):
+                pruned.add(dirname)
+                skip = True
+                break
+        if skip:
+            continue
+        fullpath = os.path.join(path, *parts)
+        try:
+            mode = os.lstat(fullpath).st_mode
+        except OSError:  # tracked, but deleted
+            continue
+        if stat.S_ISDIR(mode):
             files.extend(probe_dir(fullpath, include_re, exclude_re))
-        elif os.path.isfile(fullpath) and include_re.match(direntry):
+        elif stat.S_ISREG(mode) and include_re.match(parts[-1]):
             files.append(fullpath)
-    return files
+    return sorted(files)
+
+
+def find_files(path, include_re, exclude_re):
+    """Return the files to check under `path`, using git if enabled."""
+
+    if os.getenv("RUN_PYLINT_USE_GIT", "") != "":
+        files = probe_git(path, include_re, exclude_re)
+        if files is not None:
+            return files
+    return probe_dir(path, include_re, exclude_re)
 
 
 def show_files(files):
@@ -150,24 +358,183 @@ def show_files(files):
         print_line(blue("    %s" % f))
 
 
+def make_shards(files, nshards):
+    """
+    Split `files` into `nshards` shards of about the same total size.
+
+    Each file goes, largest first, to the shard with the smallest total size
+    so far.  The files keep their order in `files` within a shard.
+    """
+
+    sizes = {}
+    for f in files:
+        try:
+            sizes[f] = os.path.getsize(f)
+        except OSError:
+            sizes[f] = 0
+    position = dict((f, idx) for idx, f in enumerate(files))
+    shards = [[] for _ in range(nshards)]
+    # (total size, shard index) - the index makes the split deterministic
+    totals = [(0, idx) for idx in range(nshards)]
+    for f in sorted(files, key=lambda f: (-sizes[f], position[f])):
+        total, idx = heapq.heappop(totals)
+        shards[idx].append(f)
+        # count every file, so that empty files are spread too
+        heapq.heappush(totals, (total + sizes[f] + 1, idx))
+    return [sorted(shard, key=position.get) for shard in shards if shard]
+
+
+def merge_reports(outputs):
+    """
+    Merge the pylint `outputs` of the shards into one report.
+
+    The messages of each module, which start with a ``*** Module`` header
+    line and end with an empty line, are sorted by the module name.  They are
+    followed by the rest of each output e.g. the score, in the shard order.
+    """
+
+    modules = {}
+    rest = []
+    for output in outputs:
+        block = None
+        for line in output.splitlines(True):
+            if line.startswith(MODULE_HEADER):
+                block = modules.setdefault(line, [line])
+            elif block is not None and line.strip():
+                block.append(line)
+            else:
+                block = None
+                rest.append(line)
+    report = []
+    for header in sorted(modules):
+        report.extend(modules[header])
+    report.extend(rest)
+    return "".join(report)
+
+
+def run_shards(args, shards):
+    """
+    Run pylint with `args` on each of the `shards` in parallel.
+
+    Write the merged report to the standard output, and return the bitwise OR
+    of the exit codes, which are the pylint message status.
+    """
+
+    procs = []
+    for shard in shards:
+        # a file and not a pipe, so that no process blocks on its output
+        out_f = tempfile.TemporaryFile()
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "pylint"] + args + shard,
+            stdout=out_f,  # nosec B603 # pylint, no shell
+        )
+        procs.append((proc, out_f))
+    status = 0
+    outputs = []
+    for proc, out_f in procs:
+        returncode = proc.wait()
+        # killed by a signal - report as fatal
+        status |= returncode if returncode >= 0 else 1
+        out_f.seek(0)
+        outputs.append(out_f.read().decode("utf-8", "replace"))
+        out_f.close()
+    sys.stdout.write(merge_reports(outputs))
+    return status
+
+
+class _Tee(object):
+    """Write to `stream`, and keep a copy of what was written."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.data = []
+
+    def write(self, data):
+        """Write `data` to the stream, and keep it."""
+
+        self.stream.write(data)
+        self.data.append(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def getvalue(self):
+        """Return what was written, as bytes."""
+
+        return b"".join(
+            data if isinstance(data, bytes) else data.encode("utf-8")
+            for data in self.data
+        )
+
+
+def run_pylint(args, files, jobs):
+    """Run pylint with `args` on `files`, return the exit code."""
+
+    if jobs > 1 and len(files) > 1:
+        shards = make_shards(files, jobs)
+        print_line(blue("running %d pylint processes" % len(shards)))
+        return run_shards(args, shards)
+    sys.argv[0] = "pylint"
+    return Run(args + files, None, False).linter.msg_status
+
+
+def run_cached(args, files, jobs):
+    """
+    Run pylint with `args` on `files`, using the lint cache if enabled.
+
+    Return the exit code.  Only the results with no fatal (1) or usage
+    error (32) are cached.
+    """
+
+    cache = lint_cache.LintCache.from_env()
+    version = None
+    if cache is not None:
+        version = lint_cache.tool_version([sys.executable, "-m", "pylint"])
+    if version is None:
+        return run_pylint(args, files, jobs)
+    configs = lint_cache.get_option(args, ["--rcfile"])
+    key = lint_cache.tree_key(
+        lint_cache.digest(
+            "pylint",
+            version,
+            *([lint_cache.file_digest(path) for path in configs] + args)
+        ),
+        files,
+    )
+    entry = cache.get(key)
+    if entry is not None:
+        print_line(blue("%s: result from the lint cache" % sys.argv[0]))
+        sys.stdout.flush()
+        lint_cache.get_output_stream().write(entry[1])
+        return entry[0]
+    tee = _Tee(sys.stdout)
+    sys.stdout = tee
+    try:
+        status = run_pylint(args, files, jobs)
+    finally:
+        sys.stdout = tee.stream
+    if not status & (1 | 32):
+        cache.put(key, status, tee.getvalue())
+        cache.evict()
+    return status
+
+
 def main():
     """Script entry point. Return exit code."""
 
-    args, include_pattern, exclude_pattern = probe_args()
+    args, include_pattern, exclude_pattern, jobs = probe_args()
     if "-h" in args or "--help" in args:
         print_line(__doc__)
         return 0
     if os.getenv("RUN_PYLINT_DISABLED", "") != "":
         return 0
-    files = probe_dir(
+    files = find_files(
         os.getcwd(), re.compile(include_pattern), re.compile(exclude_pattern)
     )
     if not files:
         return 0
     show_files(files)
-    args.extend(files)
-    sys.argv[0] = "pylint"
-    return Run(args, None, False).linter.msg_status
+    return run_cached(args, files, jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,723 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 Red Hat, Inc.
+#
+r"""
+Run a linter, reusing the results cached for the unchanged files.
+
+Usage: python lint_cache.py [OPTIONS] -- COMMAND [ARGUMENTS]
+
+Run COMMAND with ARGUMENTS, the linter.  If the cache is not enabled, or the
+files checked by the linter cannot be determined, COMMAND is just run, except
+with --files-from, where the files are always checked in batches as described
+below.  Otherwise the linter is run only on the files for which no result is
+cached.
+The result of a file is the exit status and the output of the linter for the
+file, and is cached under a key made from the path and the contents of the
+file, the linter name and version, the contents of the configuration files,
+and ARGUMENTS.  Then the results of all the files are written to the standard
+output in the order of the files, and the exit status is the highest of the
+statuses.
+
+To get the result of each file while running the linter on as few processes
+as possible, the files are checked in batches, and a batch with any output is
+split in two until each file with output is checked alone.  With --jobs N,
+the batches are checked by N linter processes in parallel.
+
+As the output of each file is cached separately, summaries printed by the
+linter at the end of the output e.g. the flake8 statistics are per file.
+
+The files are:
+
+  1. with --files-from FILE, the files listed in FILE (- is the standard
+     input), separated by NUL characters, are appended to ARGUMENTS;
+  2. with --tool flake8 or --tool yamllint, the last of ARGUMENTS is the
+     directory checked by the linter, which is replaced by the files the
+     linter would check in it, according to its configuration;
+  3. with --tree, the linter checks a whole tree and may look at any file in
+     it e.g. ansible-lint, so there is just one result, cached under a key
+     made from all the files in the working directory and the installed
+     python packages.  Files and directories matching --exclude PATTERN are
+     skipped, the default is ^(\.git|\.tox|\.venv|\.tox-test|__pycache__)$.
+
+Options:
+
+  --tool NAME
+    name of the linter, used in the cache key, default is the COMMAND name;
+  --config FILE
+    configuration file of the linter, may be repeated - a missing file is
+    not an error;
+  --cache-status LIST
+    comma separated exit statuses which are results of the linter rather than
+    errors, the default is 0,1 - other results are not cached;
+  --jobs N
+    number of linter processes to run in parallel, 0 is the number of CPUs,
+    the default is 1.
+
+Environment variables:
+
+  LSR_LINT_CACHE
+    the cache is enabled if set to true;
+  LSR_LINT_CACHE_DIR
+    the cache directory - tox-default.ini sets it to
+    {toxworkdir}/lsr-lint-cache if not set;
+  LSR_LINT_CACHE_SIZE
+    the maximal size of the cache in MiB, default is 100 - when the cache is
+    bigger, the least recently used results are removed;
+  LSR_LINT_FILES_FROM
+    if set, a file listing the files which changed since the last successful
+    run, like with --files-from - if the files can be determined, only those
+    of them which are listed are checked.
+"""
+
+import fnmatch
+import hashlib
+import os
+import re
+import subprocess  # nosec B404 # runs the linter
+import sys
+import tempfile
+import threading
+
+try:
+    from ConfigParser import RawConfigParser  # python 2
+except ImportError:
+    from configparser import RawConfigParser
+
+CACHE_DIR_ENV = "LSR_LINT_CACHE_DIR"
+CACHE_SIZE_ENV = "LSR_LINT_CACHE_SIZE"
+DEFAULT_CACHE_SIZE_MB = 100
+BATCH_SIZE = 200  # files checked by one linter process at most
+TREE_EXCLUDE = r"^(\.git|\.tox|\.venv|\.tox-test|__pycache__)$"
+# flake8 defaults, see flake8 --help
+FLAKE8_EXCLUDE = ".svn,CVS,.bzr,.hg,.git,__pycache__,.tox,.nox,.eggs,*.egg"
+FLAKE8_FILENAME = "*.py"
+
+
+def is_enabled():
+    """Return True if the cache is enabled in the environment."""
+
+    return os.getenv("LSR_LINT_CACHE", "").lower() == "true"
+
+
+def get_output_stream():
+    """Return the standard output for writing bytes."""
+
+    return getattr(sys.stdout, "buffer", sys.stdout)
+
+
+def digest(*parts):
+    """Return the hex SHA-256 digest of `parts`, strings or bytes."""
+
+    sha = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = part.encode("utf-8", "surrogateescape")
+        sha.update(part)
+        sha.update(b"\0")  # ("ab", "c") and ("a", "bc") are different
+    return sha.hexdigest()
+
+
+def file_digest(path):
+    """Return the digest of the contents of `path`, or of missing file."""
+
+    sha = hashlib.sha256()
+    try:
+        with open(path, "rb") as in_f:
+            for chunk in iter(lambda: in_f.read(65536), b""):
+                sha.update(chunk)
+    except (IOError, OSError):
+        return "missing"
+    return sha.hexdigest()
+
+
+def tool_version(command):
+    """
+    Return the output of the linter `command` run with --version.
+
+    `command` is the linter command line, which may start with PYTHON -m
+    MODULE.  Return None if the linter cannot be run.
+    """
+
+    if len(command) > 2 and command[1] == "-m":
+        version_cmd = command[:3]
+    else:
+        version_cmd = command[:1]
+    try:
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            version_cmd + ["--version"],  # nosec B603 # linter, no shell
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+    except OSError:
+        return None
+    out, _ = proc.communicate()
+    if proc.returncode != 0:
+        return None
+    return out
+
+
+def installed_packages():
+    """
+    Return the names of the installed python packages.
+
+    The names of the dist-info and egg-info entries contain the versions of
+    the packages, so they change when a package is upgraded.
+    """
+
+    names = []
+    for path in sys.path:
+        if os.path.basename(path) in ("site-packages", "dist-packages"):
+            try:
+                names.extend(sorted(os.listdir(path)))
+            except OSError:
+                continue
+    return names
+
+
+def walk_files(root, exclude_re):
+    """
+    Return the files under `root`, skipping names matching `exclude_re`.
+
+    Symbolic links to directories are not followed, like in the linters.
+    """
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name for name in dirnames if not exclude_re.match(name)
+        )
+        for name in sorted(filenames):
+            if not exclude_re.match(name):
+                files.append(os.path.join(dirpath, name))
+    return files
+
+
+class LintCache(object):
+    """
+    Results of a linter cached in a directory, one file per result.
+
+    The result file starts with a line with the exit status, followed by the
+    output.  Its modification time is the time of the last use, so that the
+    least recently used results are removed when the cache is too big.
+    """
+
+    def __init__(self, path, max_size):
+        """Use the cache in `path`, of at most `max_size` bytes."""
+
+        self.path = path
+        self.max_size = max_size
+        self.added = 0
+
+    @classmethod
+    def from_env(cls):
+        """Return the cache configured in the environment, or None."""
+
+        path = os.getenv(CACHE_DIR_ENV, "")
+        if not is_enabled() or not path:
+            return None
+        size_mb = os.getenv(CACHE_SIZE_ENV, "") or str(DEFAULT_CACHE_SIZE_MB)
+        if not re.match(r"^[0-9]+$", size_mb):
+            raise ValueError(
+                "%s is not a number: %s" % (CACHE_SIZE_ENV, size_mb)
+            )
+        return cls(path, int(size_mb) * 1024 * 1024)
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key):
+        """Return the cached (status, output) for `key`, or None."""
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as in_f:
+                data = in_f.read()
+            os.utime(path, None)
+        except (IOError, OSError):
+            return None
+        status, _, output = data.partition(b"\n")
+        return int(status), output
+
+    def put(self, key, status, output):
+        """Cache the `status` and `output` for `key`."""
+
+        path = self._entry_path(key)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            # a whole entry or none, also with parallel tox runs
+            fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as out_f:
+                out_f.write(str(status).encode("ascii") + b"\n" + output)
+            os.rename(tmppath, path)
+        except (IOError, OSError):
+            return  # the cache is only an optimization
+        self.added += 1
+
+    def evict(self):
+        """Remove the least recently used results over the size limit."""
+
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def run_command(command):
+    """Run `command`, return the exit status and the standard output."""
+
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        command, stdout=subprocess.PIPE  # nosec B603 # linter, no shell
+    )
+    out, _ = proc.communicate()
+    return proc.returncode, out
+
+
+def check_batch(command, batch, results):
+    """
+    Check the files of `batch` with `command`.
+
+    Store the (status, output) of each file in `results`.  A batch which
+    fails or has any output is split until the result of each file is known.
+    """
+
+    status, output = run_command(command + batch)
+    if len(batch) == 1 or (status == 0 and not output.strip()):
+        for path in batch:
+            results[path] = (status, output)
+        return
+    half = len(batch) // 2
+    check_batch(command, batch[:half], results)
+    check_batch(command, batch[half:], results)
+
+
+def make_batches(files, jobs):
+    """
+    Split `files` into batches for `jobs` parallel linter processes.
+
+    With more than one process, there are about 4 batches per process, so
+    that a process which got slow files does not hold up the others.
+    """
+
+    size = BATCH_SIZE
+    if jobs > 1:
+        size = max(1, min(size, -(-len(files) // (jobs * 4))))
+    batches = []
+    for idx in range(0, len(files), size):
+        end = idx + size
+        batches.append(files[idx:end])
+    return batches
+
+
+def check_files(command, files, jobs):
+    """
+    Check `files` with `command`, running up to `jobs` processes.
+
+    Return a dict with the (status, output) of each file.  An error of a
+    linter process e.g. a missing linter is raised in the calling thread,
+    after the other processes finished.
+    """
+
+    results = {}
+    batches = make_batches(files, jobs)
+    if jobs <= 1 or len(batches) <= 1:
+        for batch in batches:
+            check_batch(command, batch, results)
+        return results
+    lock = threading.Lock()
+    errors = []
+
+    def worker():
+        worker_results = {}
+        while True:
+            with lock:
+                if not batches or errors:
+                    break
+                batch = batches.pop(0)
+            try:
+                check_batch(command, batch, worker_results)
+            except Exception as exc:  # pylint: disable=broad-except
+                with lock:
+                    errors.append(exc)
+                break
+        with lock:
+            results.update(worker_results)
+
+    threads = [
+        threading.Thread(target=worker) for _ in range(min(jobs, len(batches)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def run_files(
+    cache, command, files, base_key, cache_status, jobs
+):  # pylint: disable=too-many-arguments
+    """
+    Run `command` on `files`, using the results cached in `cache`.
+
+    `cache` may be None - then all the files are checked.  Return the exit
+    status.
+    """
+
+    keys = {}
+    results = {}
+    todo = []
+    for path in files:
+        entry = None
+        if cache is not None:
+            keys[path] = digest(base_key, path, file_digest(path))
+            entry = cache.get(keys[path])
+        if entry is None:
+            todo.append(path)
+        else:
+            results[path] = entry
+    for path, (status, output) in check_files(command, todo, jobs).items():
+        results[path] = (status, output)
+        if cache is not None and status in cache_status:
+            cache.put(keys[path], status, output)
+    status = 0
+    out_f = get_output_stream()
+    for path in files:
+        status = max(status, results[path][0])
+        out_f.write(results[path][1])
+    out_f.flush()
+    if cache is not None:
+        sys.stderr.write(
+            "%s: %d of %d files checked, %d results from the cache\n"
+            % (
+                os.path.basename(sys.argv[0]),
+                len(todo),
+                len(files),
+                len(files) - len(todo),
+            )
+        )
+    return status
+
+
+def tree_key(base_key, files):
+    """
+    Return the key of the result of a linter checking all the `files`.
+
+    The key depends also on the installed python packages, which the linter
+    may look at e.g. to resolve imports.
+    """
+
+    parts = [base_key] + installed_packages()
+    for path in files:
+        parts.extend([path, file_digest(path)])
+    return digest(*parts)
+
+
+def run_tree(cache, command, base_key, cache_status, exclude_re):
+    """
+    Run `command` on the working directory, or replay the cached result.
+
+    Return the exit status.
+    """
+
+    key = tree_key(base_key, walk_files(os.curdir, exclude_re))
+    out_f = get_output_stream()
+    entry = cache.get(key)
+    if entry is not None:
+        out_f.write(entry[1])
+        out_f.flush()
+        return entry[0]
+    # the output is written as it comes, a tree check may take long
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        command, stdout=subprocess.PIPE  # nosec B603 # linter, no shell
+    )
+    output = []
+    for chunk in iter(proc.stdout.readline, b""):
+        out_f.write(chunk)
+        out_f.flush()
+        output.append(chunk)
+    status = proc.wait()
+    if status in cache_status:
+        cache.put(key, status, b"".join(output))
+    return status
+
+
+def get_option(args, names):
+    """
+    Return the values of the options `names` in the linter `args`.
+
+    Both --opt VALUE and --opt=VALUE forms are recognized.
+    """
+
+    values = []
+    for idx, arg in enumerate(args):
+        for name in names:
+            if arg == name and idx + 1 < len(args):
+                values.append(args[idx + 1])
+            elif arg.startswith(name + "="):
+                values.append(arg.split("=", 1)[1])
+    return values
+
+
+def split_patterns(value, basedir):
+    """
+    Return the flake8 comma separated patterns in `value`.
+
+    Like flake8, patterns with a slash are paths relative to `basedir`.
+    """
+
+    patterns = []
+    for pattern in value.replace("\n", ",").split(","):
+        pattern = pattern.strip()
+        if "/" in pattern:
+            pattern = os.path.abspath(os.path.join(basedir, pattern))
+        if pattern:
+            patterns.append(pattern)
+    return patterns
+
+
+def flake8_files(args, root):
+    """
+    Return the files flake8 with `args` checks in `root`.
+
+    The exclude, extend-exclude and filename options are taken from the
+    configuration file given with --config and from `args`, and are matched
+    the way flake8 does.  Return None if there is no --config, because then
+    flake8 looks for the configuration files itself.
+    """
+
+    configs = get_option(args, ["--config"])
+    if not configs:
+        return None
+    parser = RawConfigParser()
+    parser.read(configs[-1])
+    basedir = os.path.dirname(os.path.abspath(configs[-1]))
+
+    def get_config(name, default):
+        for opt in (name, name.replace("-", "_")):
+            if parser.has_option("flake8", opt):
+                return parser.get("flake8", opt)
+        return default
+
+    exclude = split_patterns(
+        ",".join(get_option(args, ["--exclude"]))
+        or get_config("exclude", FLAKE8_EXCLUDE),
+        basedir,
+    )
+    exclude.extend(split_patterns(get_config("extend-exclude", ""), basedir))
+    exclude.extend(
+        split_patterns(",".join(get_option(args, ["--extend-exclude"])), ".")
+    )
+    filename = split_patterns(
+        ",".join(get_option(args, ["--filename"]))
+        or get_config("filename", FLAKE8_FILENAME),
+        basedir,
+    )
+
+    def is_excluded(path):
+        for pattern in exclude:
+            if fnmatch.fnmatch(os.path.basename(path), pattern):
+                return True
+            if fnmatch.fnmatch(os.path.abspath(path), pattern):
+                return True
+        return False
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if not is_excluded(os.path.join(dirpath, name))
+        )
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if is_excluded(path):
+                continue
+            for pattern in filename:
+                if fnmatch.fnmatch(path, pattern):
+                    files.append(path)
+                    break
+    return files
+
+
+def yamllint_files(args, root):
+    """
+    Return the files yamllint with `args` checks in `root`.
+
+    The configuration given with -c is loaded by yamllint itself, so that the
+    yaml-files and ignore settings are applied exactly.  Return None if there
+    is no -c, or if yamllint is too old to tell which files are yaml files.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    configs = get_option(args, ["-c", "--config-file"])
+    if not configs or get_option(args, ["-d", "--config-data"]):
+        return None
+    try:
+        from yamllint.config import YamlLintConfig
+    except ImportError:
+        return None
+    conf = YamlLintConfig(file=configs[-1])
+    if not hasattr(conf, "is_yaml_file"):
+        return None
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if conf.is_yaml_file(path) and not conf.is_file_ignored(path):
+                files.append(path)
+    return files
+
+
+# --tool name -> function returning the files checked in a directory
+FILE_FINDERS = {
+    "flake8": flake8_files,
+    "yamllint": yamllint_files,
+}
+
+
+def read_files(path):
+    """Return the NUL separated file names in `path`, - is stdin."""
+
+    if path == "-":
+        data = getattr(sys.stdin, "buffer", sys.stdin).read()
+    else:
+        with open(path, "rb") as in_f:
+            data = in_f.read()
+    if not isinstance(data, str):
+        data = data.decode(sys.getfilesystemencoding(), "surrogateescape")
+    return [name for name in data.split("\0") if name]
+
+
+def parse_args(argv):
+    """Return the options dict and the COMMAND list from `argv`."""
+
+    opts = {
+        "tool": None,
+        "configs": [],
+        "tree": False,
+        "files_from": None,
+        "exclude": TREE_EXCLUDE,
+        "cache_status": "0,1",
+        "jobs": "1",
+    }
+    with_value = {
+        "--tool": "tool",
+        "--files-from": "files_from",
+        "--exclude": "exclude",
+        "--cache-status": "cache_status",
+        "--jobs": "jobs",
+    }
+    i, nargs = 0, len(argv)
+    while i < nargs and argv[i] != "--":
+        arg = argv[i]
+        if arg == "--tree":
+            opts["tree"] = True
+        elif arg in with_value or arg == "--config":
+            i += 1
+            if i >= nargs:
+                raise ValueError("%s: missing value" % arg)
+            if arg == "--config":
+                opts["configs"].append(argv[i])
+            else:
+                opts[with_value[arg]] = argv[i]
+        else:
+            raise ValueError("unknown option: %s" % arg)
+        i += 1
+    command = argv[i:][1:]
+    if not command:
+        raise ValueError("missing COMMAND")
+    if not opts["tool"]:
+        opts["tool"] = os.path.basename(command[0])
+    opts["cache_status"] = [
+        int(item) for item in opts["cache_status"].split(",") if item
+    ]
+    if not re.match(r"^[0-9]+$", opts["jobs"]):
+        raise ValueError("--jobs: N is not a number: %s" % opts["jobs"])
+    opts["jobs"] = int(opts["jobs"])
+    if opts["jobs"] == 0:
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+
+        opts["jobs"] = multiprocessing.cpu_count()
+    return opts, command
+
+
+def main():
+    """Script entry point. Return exit code."""
+
+    if "-h" in sys.argv[1:2] or "--help" in sys.argv[1:2]:
+        sys.stdout.write(__doc__)
+        return 0
+    opts, command = parse_args(sys.argv[1:])
+    files = None
+    if opts["files_from"] is not None:
+        files = read_files(opts["files_from"])
+    changed = os.environ.get("LSR_LINT_FILES_FROM")
+    cache = LintCache.from_env()
+    version = None
+    if cache is not None:
+        version = tool_version(command)
+    if (version is not None or changed) and files is None and not opts["tree"]:
+        finder = FILE_FINDERS.get(opts["tool"])
+        if finder is not None and os.path.isdir(command[-1]):
+            files = finder(command[1:-1], command[-1])
+            if files is not None:
+                command = command[:-1]
+    if changed and files is not None:
+        changed = set(os.path.abspath(path) for path in read_files(changed))
+        files = [path for path in files if os.path.abspath(path) in changed]
+    if version is None and files is not None:
+        return run_files(
+            None, command, files, None, opts["cache_status"], opts["jobs"]
+        )
+    if version is None or (files is None and not opts["tree"]):
+        return subprocess.call(command)  # nosec B603 # linter, no shell
+    base_key = digest(
+        opts["tool"],
+        version,
+        *([file_digest(path) for path in opts["configs"]] + command[1:])
+    )
+    if opts["tree"]:
+        status = run_tree(
+            cache,
+            command,
+            base_key,
+            opts["cache_status"],
+            re.compile(opts["exclude"]),
+        )
+    else:
+        status = run_files(
+            cache,
+            command,
+            files,
+            base_key,
+            opts["cache_status"],
+            opts["jobs"],
+        )
+    if cache.added:
+        cache.evict()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
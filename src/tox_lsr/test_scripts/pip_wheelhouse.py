@@ -0,0 +1,241 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 Red Hat, Inc.
+#
+"""
+Install python packages using a local wheelhouse.
+
+Usage: python pip_wheelhouse.py [OPTIONS] WHEELHOUSE -- PIP_INSTALL_COMMAND
+
+PIP_INSTALL_COMMAND is a pip install command line e.g. the install_command of
+a tox env, python -m pip install OPTS PACKAGES.  First, PIP_INSTALL_COMMAND is
+run with --no-index --find-links WHEELHOUSE, so that PACKAGES and their
+dependencies are installed from the wheels in WHEELHOUSE, without looking up
+the package index.  If WHEELHOUSE does not have all of them, the missing
+wheels are downloaded or built with pip wheel into WHEELHOUSE, where the wheels
+already there are reused, and PIP_INSTALL_COMMAND is run again the same way.
+If pip wheel fails, the packages are just installed, with the package index.
+
+The wheelhouse is locked while the wheels are added, so that the wheelhouse
+may be shared by parallel tox runs.
+
+Options:
+
+  --no-index
+    nothing is downloaded - the wheels are not added, and the packages are
+    installed only from WHEELHOUSE;
+  --build-only
+    the missing wheels are added, but nothing is installed;
+  --refresh
+    the package index is always looked up, and the wheels of the newest
+    versions are downloaded or built even if the wheels of older versions are
+    in WHEELHOUSE - the packages are then installed from WHEELHOUSE, which
+    has the newest versions.
+"""
+
+import os
+import subprocess  # nosec B404 # runs pip
+import sys
+
+try:
+    import fcntl
+except ImportError:  # not on Linux - no locking
+    fcntl = None
+
+LOCK_NAME = ".lock"
+# pip install options which pip wheel does not know, with the number of
+# their arguments
+INSTALL_ONLY_OPTIONS = {
+    "-U": 0,
+    "--upgrade": 0,
+    "--upgrade-strategy": 1,
+    "--force-reinstall": 0,
+    "-I": 0,
+    "--ignore-installed": 0,
+    "--user": 0,
+    "--root": 1,
+    "--prefix": 1,
+    "-t": 1,
+    "--target": 1,
+    "--no-warn-script-location": 0,
+    "--no-warn-conflicts": 0,
+    "--compile": 0,
+    "--no-compile": 0,
+}
+
+
+def split_install_command(command):
+    """
+    Return the pip command and the pip install arguments of `command`.
+
+    The pip command is what comes before install e.g. python -m pip.
+    Return None for the pip command if `command` is not a pip install.
+    """
+
+    if "install" not in command:
+        return None, command
+    idx = command.index("install")
+    return command[:idx], command[idx:][1:]
+
+
+def get_wheel_args(install_args):
+    """Return the pip wheel arguments for the pip install `install_args`."""
+
+    wheel_args = []
+    skip = 0
+    for arg in install_args:
+        if skip:
+            skip -= 1
+            continue
+        name = arg.split("=", 1)[0]
+        if name in INSTALL_ONLY_OPTIONS:
+            if "=" not in arg:
+                skip = INSTALL_ONLY_OPTIONS[name]
+            continue
+        wheel_args.append(arg)
+    return wheel_args
+
+
+def relock(lock_f, exclusive):
+    """Change the lock of the open lock file `lock_f`."""
+
+    if fcntl is not None:
+        fcntl.flock(lock_f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def lock(wheelhouse, exclusive):
+    """Return the open lock file of `wheelhouse`, locked."""
+
+    # pylint: disable=consider-using-with
+    lock_f = open(os.path.join(wheelhouse, LOCK_NAME), "a")
+    relock(lock_f, exclusive)
+    return lock_f
+
+
+def run_local(command, wheelhouse, quiet=False):
+    """
+    Run the pip `command` with only the wheels in `wheelhouse`.
+
+    If `quiet`, the output is written only if the command succeeds, as a
+    wheelhouse which misses some packages is not an error.  Return the
+    exit status.
+    """
+
+    local_command = command + ["--no-index", "--find-links", wheelhouse]
+    if not quiet:
+        return subprocess.call(local_command)  # nosec B603 # pip, no shell
+    proc = subprocess.Popen(  # pylint: disable=consider-using-with
+        local_command,  # nosec B603 # pip, no shell
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    out, _ = proc.communicate()
+    if proc.returncode == 0:
+        getattr(sys.stdout, "buffer", sys.stdout).write(out)
+        sys.stdout.flush()
+    return proc.returncode
+
+
+def add_wheels(pip_command, install_args, wheelhouse, refresh, check):
+    """
+    Add the wheels of the packages in `install_args` to `wheelhouse`.
+
+    With `check`, nothing is done if `wheelhouse` has all the wheels.
+    With `refresh`, the wheels of the newest versions are added.
+    """
+
+    wheel_args = get_wheel_args(install_args)
+    command = pip_command + ["wheel", "--wheel-dir", wheelhouse]
+    if check and run_local(command + wheel_args, wheelhouse, True) == 0:
+        return 0
+    if not refresh:
+        command += ["--find-links", wheelhouse]
+    status = subprocess.call(  # nosec B603 # pip, no shell
+        command + wheel_args
+    )
+    if status != 0:
+        sys.stderr.write(
+            "%s: pip wheel failed with %d - the wheelhouse %s is not updated\n"
+            % (os.path.basename(sys.argv[0]), status, wheelhouse)
+        )
+    return status
+
+
+def parse_args(argv):
+    """Return the options dict, the wheelhouse and the pip command."""
+
+    opts = {"no_index": False, "build_only": False, "refresh": False}
+    args = list(argv)
+    while args and args[0].startswith("--"):
+        arg = args.pop(0)
+        if arg == "--":
+            break
+        name = arg[2:].replace("-", "_")
+        if name not in opts:
+            raise ValueError("unknown option: %s" % arg)
+        opts[name] = True
+    if len(args) < 3 or args[1] != "--":
+        raise ValueError("WHEELHOUSE -- PIP_INSTALL_COMMAND is required")
+    return opts, args[0], args[2:]
+
+
+def install(opts, wheelhouse, pip_command, install_args, lock_f):
+    """
+    Install the packages in `install_args`, adding the missing wheels.
+
+    `lock_f` is the lock file of `wheelhouse`, with a shared lock.
+    Return the exit status.
+    """
+
+    install_command = pip_command + ["install"] + install_args
+    if opts["no_index"]:
+        return (
+            0 if opts["build_only"] else run_local(install_command, wheelhouse)
+        )
+    # first, try to install without looking up the package index
+    if not (opts["build_only"] or opts["refresh"]) and (
+        run_local(install_command, wheelhouse, True) == 0
+    ):
+        return 0
+    # no other install or pip wheel while the wheels are added
+    relock(lock_f, True)
+    status = add_wheels(
+        pip_command,
+        install_args,
+        wheelhouse,
+        opts["refresh"],
+        opts["build_only"] and not opts["refresh"],
+    )
+    if opts["build_only"]:
+        return status
+    # let the other installs in, but no other pip wheel
+    relock(lock_f, False)
+    if status == 0:
+        return run_local(install_command, wheelhouse)
+    return subprocess.call(  # nosec B603 # pip, no shell
+        install_command + ["--find-links", wheelhouse]
+    )
+
+
+def main():
+    """Script entry point. Return exit code."""
+
+    if "-h" in sys.argv[1:2] or "--help" in sys.argv[1:2]:
+        sys.stdout.write(__doc__)
+        return 0
+    opts, wheelhouse, command = parse_args(sys.argv[1:])
+    pip_command, install_args = split_install_command(command)
+    if pip_command is None:
+        return subprocess.call(command)  # nosec B603 # pip, no shell
+    if not os.path.isdir(wheelhouse):
+        os.makedirs(wheelhouse)
+    lock_f = lock(wheelhouse, False)
+    try:
+        return install(opts, wheelhouse, pip_command, install_args, lock_f)
+    finally:
+        lock_f.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
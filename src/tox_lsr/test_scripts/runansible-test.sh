@@ -3,6 +3,22 @@
 
 # A shell wrapper around ansible-test.
 
+# Environment variables:
+#
+#   LSR_ANSIBLE_TEST_JOBS
+#     number of sanity tests to run in parallel, default is 1 - with more
+#     than 1, each test is run in its own copy of the collection with its own
+#     TMPDIR, and its output is captured and printed in the order of the
+#     tests, followed by a summary of the results and durations
+#
+#   LSR_ANSIBLE_TEST_FAIL_FAST
+#     if set to true, no more sanity tests are started after a test fails
+#
+#   LSR_ANSIBLE_TEST_STAGING_DIR
+#     the directory where the collection is staged for ansible-test, and kept
+#     between runs - see below for the default; if set to none, the
+#     collection is staged in a temporary directory
+
 set -euo pipefail
 
 ME=$(basename "$0")
@@ -45,21 +61,71 @@ fi
 # exclude .tox but will include files that we do not want to test.  There is no apparent
 # way to disable this "feature".
 # We assume the `collection` testenv has already run and placed the collection in
-# toxworkdir/ansible_collections - so we copy this to a tempdir in order to run
-# ansible-test against it
-dest_coll_dir=$(mktemp -d -t tox-XXXXXXXX)
+# toxworkdir/ansible_collections - so we sync this to a staging directory outside of
+# any git checkout in order to run ansible-test against it.  The staging directory is
+# kept, so that the next run only has to update the files which changed, using reflinks
+# or hardlinks where possible.  It is toxworkdir/ansible-test-staging, unless toxworkdir
+# is in a git checkout, as usual - then it is in ~/.cache/tox-lsr.
+
+# in_git_tree DIR
+#
+# Return 0 if DIR or any of its parent directories has a .git.
+in_git_tree() {
+  local dir
+  dir=$(readlink -m "$1")
+  while [ "$dir" != / ]; do
+    if [ -e "$dir/.git" ]; then
+      return 0
+    fi
+    dir=$(dirname "$dir")
+  done
+  return 1
+}
+
+# get_staging_dir
+#
+# Print the staging directory for the collection.  Return 1 if there is none.
+get_staging_dir() {
+  local dir="${LSR_ANSIBLE_TEST_STAGING_DIR:-}"
+  local sum
+  if [ "$dir" = none ]; then
+    return 1
+  elif [ -z "$dir" ] && in_git_tree "$TOX_WORK_DIR"; then
+    sum=$(echo "$TOX_WORK_DIR" | cksum)
+    dir="${XDG_CACHE_HOME:-$HOME/.cache}/tox-lsr/ansible-test-staging-${sum%% *}"
+  elif [ -z "$dir" ]; then
+    dir="$TOX_WORK_DIR/ansible-test-staging"
+  fi
+  if in_git_tree "$dir"; then
+    lsr_info "${ME}: $dir is in a git checkout - not using it for staging" >&2
+    return 1
+  fi
+  echo "$dir"
+}
+
+# the temporary files, and the staging directory if it cannot be kept
+work_dir=$(mktemp -d -t tox-XXXXXXXX)
 # shellcheck disable=SC2064
-trap "rm -rf $dest_coll_dir" 0
-cp -a "$src_ac_dir" "$dest_coll_dir"
+trap "rm -rf $work_dir" 0
+if dest_coll_dir=$(get_staging_dir) && mkdir -p "$dest_coll_dir" && \
+    exec 9> "$dest_coll_dir.lock" && { ! type -p flock > /dev/null || flock -n 9; }; then
+  lsr_info "${ME}: Staging the collection in $dest_coll_dir"
+else
+  # another run is using the staging directory, or there is none
+  dest_coll_dir="$work_dir"
+fi
+python "$SCRIPTDIR/sync_tree.py" "$src_ac_dir" "$dest_coll_dir/ansible_collections"
 
 cd "$dest_coll_dir/ansible_collections/$LSR_ROLE2COLL_NAMESPACE/$LSR_ROLE2COLL_NAME"
 
 if [ ! -d tests/sanity ]; then
   mkdir -p tests/sanity
 fi
-# grab our ignore files
+# grab our ignore files - the staged file may be a hardlink to the collection file, so
+# replace it rather than write to it
 for file in "$TOXINIDIR"/.sanity-ansible-ignore-*.txt; do
   if [ -f "$file" ]; then
+    rm -f "tests/sanity/${file//*.sanity-ansible-}"
     cp "$file" "tests/sanity/${file//*.sanity-ansible-}"
   fi
 done
@@ -75,8 +141,36 @@ if [ -n "${VIRTUAL_ENV:-}" ] && [[ "${PATH}" == "${VIRTUAL_ENV:-}/bin:"* ]]; the
 fi
 # use tox to set up 2.7 env - otherwise on platforms like F33, there is no
 # native venv or virtualenv package - the only way to get a python 2.7
-# virtual env is to use tox which seems smart enough to create one somehow
-cat > tox-py27.ini <<EOF
+# virtual env is to use tox which seems smart enough to create one somehow.
+# The env is built only when it is missing or stale - the key of the env is
+# kept in a marker file in the envdir of this testenv, so that tox -r also
+# rebuilds the 2.7 env.
+py27_envdir="$TOXINIDIR/.tox/ansible-test-py-hack"
+py27_marker="${LSR_TOX_ENV_DIR:-$py27_envdir}/lsr-py27-bootstrap"
+
+# get_py27_key
+#
+# Print the key of the 2.7 env - the resolved python2.7 interpreter and its
+# modification time, and the virtualenv package installed in the env.
+get_py27_key() {
+  local python
+  local dist
+  local virtualenv_dist=""
+  python=$(readlink -f "$(type -p python2.7)")
+  for dist in "$py27_envdir"/lib/python2.7/site-packages/virtualenv-*-info; do
+    if [ -e "$dist" ]; then
+      virtualenv_dist=$(basename "$dist")
+    fi
+  done
+  echo "python=$python $(stat -c %Y "$python") virtualenv=$virtualenv_dist"
+}
+
+if type -p python2.7 > /dev/null && [ -f "$py27_envdir/bin/activate" ] && \
+    [ -f "$py27_marker" ] && [ "$(get_py27_key)" = "$(cat "$py27_marker")" ]; then
+  lsr_info "${ME}: Using the cached python 2.7 env $py27_envdir"
+else
+  rm -f "$py27_marker"
+  cat > "$work_dir/tox-py27.ini" <<EOF
 [tox]
 envlist = ansible-test-py-hack
 skipsdist = true
@@ -86,26 +180,141 @@ skip_missing_interpreters = true
 basepython = python2.7
 deps = virtualenv
 EOF
-TOXENV="" tox --workdir "$TOXINIDIR/.tox" -c tox-py27.ini
-. "$TOXINIDIR/.tox/ansible-test-py-hack/bin/activate"
+  TOXENV="" tox --workdir "$TOXINIDIR/.tox" -c "$work_dir/tox-py27.ini" -r
+  if type -p python2.7 > /dev/null; then
+    get_py27_key > "$py27_marker"
+  fi
+fi
+. "$py27_envdir/bin/activate"
 
 # ansible-test doesn't clean up after itself . . .
-export TMPDIR="$dest_coll_dir"
-#env
-rval=0
-LSR_ANSIBLE_TEST_TESTS="${LSR_ANSIBLE_TEST_TESTS:-$(ansible-test sanity --list-tests)}"
-for test in $LSR_ANSIBLE_TEST_TESTS; do
-  lsr_info "${ME}: Running $test ..."
-  v_arg="$default_v_arg"
+export TMPDIR="$work_dir"
+
+# run_sanity_test TEST
+#
+# Run the sanity test TEST in the current directory.
+run_sanity_test() {
+  local test="$1"
+  local v_arg="$default_v_arg"
   if [ "$test" = ansible-doc ]; then
     v_arg="${LSR_ANSIBLE_DOC_DEBUG:-}"
   fi
   # https://github.com/koalaman/shellcheck/wiki/SC2086
   # shellcheck disable=SC2086
-  if ! "$ansible_test" sanity ${truncate_flag:-} ${truncate_val:-} $v_arg --requirements --test "$test" \
-          --color no --venv 2>&1 | ansible_test_filter ; then
+  "$ansible_test" sanity ${truncate_flag:-} ${truncate_val:-} $v_arg --requirements --test "$test" \
+      --color no --venv 2>&1 | ansible_test_filter
+}
+
+# run_sanity_job TEST JOBDIR
+#
+# Run the sanity test TEST in a copy of the collection in JOBDIR, with
+# JOBDIR/tmp as TMPDIR.  The output goes to JOBDIR/output, and the exit
+# status and the duration in seconds to JOBDIR/result.
+run_sanity_job() {
+  local test="$1"
+  local jobdir="$2"
+  local start=$SECONDS
+  local rc=0
+  mkdir -p "$jobdir/tmp"
+  python "$SCRIPTDIR/sync_tree.py" "$dest_coll_dir/ansible_collections" \
+    "$jobdir/ansible_collections"
+  (
+    cd "$jobdir/ansible_collections/$LSR_ROLE2COLL_NAMESPACE/$LSR_ROLE2COLL_NAME" || exit 1
+    export TMPDIR="$jobdir/tmp"
+    run_sanity_test "$test"
+  ) > "$jobdir/output" 2>&1 || rc=1
+  echo "$rc $(( SECONDS - start ))" > "$jobdir/result"
+  return "$rc"
+}
+
+# run_sanity_tests_parallel JOBS TEST...
+#
+# Run the sanity tests, JOBS at a time, then print their output in the
+# order of the tests, and a summary.  Return 1 if any test failed.
+run_sanity_tests_parallel() {
+  local jobs="$1"
+  shift
+  local jobsdir="$work_dir/jobs"
+  local running=0
+  local failed=0
+  local idx=0
+  local test rc duration status
+  for test in "$@"; do
+    while [ "$running" -ge "$jobs" ]; do
+      if ! wait -n; then
+        failed=1
+      fi
+      running=$(( running - 1 ))
+    done
+    if [ "$failed" = 1 ] && [ "${LSR_ANSIBLE_TEST_FAIL_FAST:-false}" = true ]; then
+      break
+    fi
+    lsr_info "${ME}: Starting $test ..."
+    run_sanity_job "$test" "$jobsdir/$idx" &
+    running=$(( running + 1 ))
+    idx=$(( idx + 1 ))
+  done
+  while [ "$running" -gt 0 ]; do
+    if ! wait -n; then
+      failed=1
+    fi
+    running=$(( running - 1 ))
+  done
+  idx=0
+  for test in "$@"; do
+    if [ -f "$jobsdir/$idx/output" ]; then
+      lsr_info "${ME}: Output of $test ..."
+      cat "$jobsdir/$idx/output"
+    fi
+    idx=$(( idx + 1 ))
+  done
+  lsr_banner "ansible-test sanity summary"
+  printf '%-32s %-8s %s\n' TEST RESULT SECONDS
+  idx=0
+  for test in "$@"; do
+    if [ -f "$jobsdir/$idx/result" ]; then
+      read -r rc duration < "$jobsdir/$idx/result"
+      if [ "$rc" = 0 ]; then status=passed; else status=FAILED; fi
+    elif [ -d "$jobsdir/$idx" ]; then
+      # the job died before it could record its result
+      status=FAILED
+      duration=-
+      failed=1
+    else
+      status=skipped
+      duration=-
+    fi
+    printf '%-32s %-8s %s\n' "$test" "$status" "$duration"
+    idx=$(( idx + 1 ))
+  done
+  return "$failed"
+}
+
+rval=0
+LSR_ANSIBLE_TEST_TESTS="${LSR_ANSIBLE_TEST_TESTS:-$(ansible-test sanity --list-tests)}"
+jobs="${LSR_ANSIBLE_TEST_JOBS:-1}"
+if [[ ! "$jobs" =~ ^[0-9]+$ ]]; then
+  lsr_error "${ME}: LSR_ANSIBLE_TEST_JOBS is not a number: $jobs"
+fi
+if [ "$jobs" -gt 1 ] && (( BASH_VERSINFO[0] * 100 + BASH_VERSINFO[1] < 403 )); then
+  lsr_info "${ME}: bash 4.3 or later is required to run tests in parallel"
+  jobs=1
+fi
+if [ "$jobs" -gt 1 ]; then
+  # shellcheck disable=SC2086
+  if ! run_sanity_tests_parallel "$jobs" $LSR_ANSIBLE_TEST_TESTS; then
     rval=1
   fi
-done
+else
+  for test in $LSR_ANSIBLE_TEST_TESTS; do
+    lsr_info "${ME}: Running $test ..."
+    if ! run_sanity_test "$test"; then
+      rval=1
+      if [ "${LSR_ANSIBLE_TEST_FAIL_FAST:-false}" = true ]; then
+        break
+      fi
+    fi
+  done
+fi
 deactivate
 exit "$rval"
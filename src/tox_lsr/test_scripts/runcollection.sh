@@ -1,6 +1,29 @@
 #!/bin/bash
 # SPDX-License-Identifier: MIT
 
+# Environment variables:
+#
+#   LSR_CACHE_DIR
+#     the directory where the files downloaded from the auto-maintenance repo
+#     are cached, default is toxworkdir/lsr-artifact-cache - a file is cached
+#     as LSR_CACHE_DIR/auto-maintenance/REF/NAME, where REF is the
+#     LSR_ROLE2COLL_VERSION, and may be put there by hand e.g. for offline use
+#
+#   LSR_CACHE_TTL
+#     the time in seconds after which the cached files of a branch e.g.
+#     master are downloaded again, default is 3600 - the files of a version
+#     tag or a commit hash never change, so they are never downloaded again
+#
+#   LSR_OFFLINE
+#     if set to true, nothing is downloaded - the cached files are used, and
+#     it is an error if they are not in the cache
+#
+#   LSR_ROLE2COLL_INCREMENTAL
+#     if set to true, the conversion and the tests are skipped if nothing
+#     changed since the last successful run, and otherwise only the converted
+#     files which changed since the last successful run are updated and
+#     checked by the tests - see below
+
 # Do not exit on an error to continue ansible-doc and ansible-test.
 set -euo pipefail
 
@@ -19,12 +42,103 @@ testlist="yamllint,flake8,shellcheck"
 #testlist="${testlist},py38"
 
 automaintenancerepo=https://raw.githubusercontent.com/linux-system-roles/auto-maintenance/
-curl -s -L -o "$LSR_TOX_ENV_DIR/tmp/lsr_role2collection.py" "${automaintenancerepo}${STABLE_TAG}"/lsr_role2collection.py
+cache_dir="${LSR_CACHE_DIR:-$TOX_WORK_DIR/lsr-artifact-cache}/auto-maintenance/$STABLE_TAG"
+
+# is_immutable_ref REF
+#
+# Return 0 if REF is a version tag or a commit hash, which always refer to the
+# same files, unlike branches.
+is_immutable_ref() {
+  [[ "$1" =~ ^v?[0-9]+(\.[0-9]+)+$ ]] || [[ "$1" =~ ^[0-9a-f]{40}$ ]]
+}
+
+# fetch_artifact NAME
+#
+# Print the path of the cached copy of the file NAME of the auto-maintenance
+# repo at STABLE_TAG, downloading it first if it is not cached, or if it is
+# the cached file of a branch older than LSR_CACHE_TTL.
+fetch_artifact() {
+  local name="$1"
+  local path="$cache_dir/$name"
+  local age
+  if [ -f "$path" ]; then
+    if [ "${LSR_OFFLINE:-false}" = true ] || is_immutable_ref "$STABLE_TAG"; then
+      echo "$path"
+      return 0
+    fi
+    age=$(( $(date +%s) - $(stat -c %Y "$path") ))
+    if [ "$age" -lt "${LSR_CACHE_TTL:-3600}" ]; then
+      echo "$path"
+      return 0
+    fi
+  elif [ "${LSR_OFFLINE:-false}" = true ]; then
+    lsr_error "${ME}: LSR_OFFLINE is true, and $name $STABLE_TAG is not cached in $path"
+  fi
+  mkdir -p "$cache_dir"
+  if curl -s -f -L -o "$path.$$" "${automaintenancerepo}${STABLE_TAG}/$name"; then
+    mv "$path.$$" "$path"
+  elif [ -f "$path" ]; then
+    rm -f "$path.$$"
+    lsr_info "${ME}: could not download $name $STABLE_TAG - using the cached file" >&2
+  else
+    rm -f "$path.$$"
+    lsr_error "${ME}: could not download $name $STABLE_TAG"
+  fi
+  echo "$path"
+}
+
+# get both files first, so that a missing file fails before the conversion
+role2collection=$(fetch_artifact lsr_role2collection.py)
+galaxy_yml=$(fetch_artifact galaxy.yml)
+
+coll_dir="$TOX_WORK_DIR/ansible_collections"
+state_dir="$TOX_WORK_DIR/lsr-collection-state"
+if [ "${LSR_ROLE2COLL_INCREMENTAL:-false}" = true ]; then
+  # The key of the inputs of the conversion and of the tests - the role files,
+  # the conversion script, the tox-lsr scripts and configs, and the RUN_*
+  # settings of the tests.  It is stored after a successful run.
+  inputs_key=$(
+    {
+      echo "$role $LSR_ROLE2COLL_NAMESPACE $LSR_ROLE2COLL_NAME"
+      env | grep '^RUN_' | sort || :
+      find "$TOPDIR" \( -path "$TOX_WORK_DIR" -o -name .tox -o -name .git \) -prune -o \
+        -type f -print0 | sort -z | xargs -0 -r sha256sum
+      cat "$role2collection" "$galaxy_yml" | sha256sum
+      find "$SCRIPTDIR" "$LSR_CONFIGDIR" -type f -print0 | sort -z | xargs -0 -r sha256sum
+    } | sha256sum | cut -d " " -f 1
+  )
+  if [ -f "$state_dir/inputs_key" ] && [ "$(cat "$state_dir/inputs_key")" = "$inputs_key" ] && \
+      [ -d "$coll_dir/$LSR_ROLE2COLL_NAMESPACE/$LSR_ROLE2COLL_NAME" ]; then
+    lsr_info "${ME}: nothing changed since the last successful run - skipping"
+    exit 0
+  fi
+fi
 
-rm -rf "$TOX_WORK_DIR/ansible_collections"
-python "$LSR_TOX_ENV_DIR/tmp/lsr_role2collection.py" --src-path "$TOPDIR/.." --dest-path "$TOX_WORK_DIR" \
-  --role "$role" --namespace "${LSR_ROLE2COLL_NAMESPACE}" --collection "${LSR_ROLE2COLL_NAME}" \
-  2>&1 | tee "$TOX_ENV_DIR/collection.out"
+# With LSR_ROLE2COLL_INCREMENTAL, after a successful run, the role is converted to a
+# new directory, and only the converted files which differ from the result of the
+# last successful run are updated in the collection.  The list of these files is
+# passed to the linters with LSR_LINT_FILES_FROM, so that they check only the
+# changed files - the others were checked by the last successful run.
+if [ "${LSR_ROLE2COLL_INCREMENTAL:-false}" = true ] && [ -f "$state_dir/inputs_key" ] && \
+    [ -d "$coll_dir" ]; then
+  # the last successful run is this one only if the tests pass
+  rm -f "$state_dir/inputs_key"
+  new_coll_parent="$TOX_WORK_DIR/lsr-collection-new"
+  rm -rf "$new_coll_parent"
+  python "$role2collection" --src-path "$TOPDIR/.." --dest-path "$new_coll_parent" \
+    --role "$role" --namespace "${LSR_ROLE2COLL_NAMESPACE}" --collection "${LSR_ROLE2COLL_NAME}" \
+    2>&1 | tee "$TOX_ENV_DIR/collection.out"
+  python "$SCRIPTDIR/sync_tree.py" --checksum --changed "$state_dir/changed" \
+    "$new_coll_parent/ansible_collections" "$coll_dir"
+  rm -rf "$new_coll_parent"
+  export LSR_LINT_FILES_FROM="$state_dir/changed"
+else
+  rm -f "$state_dir/inputs_key"
+  rm -rf "$coll_dir"
+  python "$role2collection" --src-path "$TOPDIR/.." --dest-path "$TOX_WORK_DIR" \
+    --role "$role" --namespace "${LSR_ROLE2COLL_NAMESPACE}" --collection "${LSR_ROLE2COLL_NAME}" \
+    2>&1 | tee "$TOX_ENV_DIR/collection.out"
+fi
 
 # create the collection in this dir to share with other testenvs
 cd "$TOX_WORK_DIR/ansible_collections/$LSR_ROLE2COLL_NAMESPACE/$LSR_ROLE2COLL_NAME"
@@ -32,16 +146,94 @@ cd "$TOX_WORK_DIR/ansible_collections/$LSR_ROLE2COLL_NAMESPACE/$LSR_ROLE2COLL_NA
 # unit testing not working yet - will need these and more
 #export RUN_PYTEST_UNIT_DIR="$role/unit"
 #export PYTHONPATH="$MY_LSR_TOX_ENV_DIR/ansible_collections/"${LSR_ROLE2COLL_NAME}"/"${LSR_ROLE2COLL_NAME}"/plugins/modules:$MY_LSR_TOX_ENV_DIR/ansible_collections/"${LSR_ROLE2COLL_NAME}"/"${LSR_ROLE2COLL_NAME}"/plugins/module_utils"
-RUN_YAMLLINT_CONFIG_FILE="$LSR_CONFIGDIR/collection_yamllint.yml" \
-TOXENV="" tox --workdir "$TOXINIDIR/.tox" -e "$testlist" 2>&1 | tee "$TOX_ENV_DIR/collection.tox.out" || :
+export RUN_YAMLLINT_CONFIG_FILE="$LSR_CONFIGDIR/collection_yamllint.yml"
+
+# get_envdir_groups ENV...
+#
+# Print the envs in groups, one group per line, where the envs of a group use
+# the same env dir, so they must not be run at the same time.  If the env dirs
+# cannot be determined, print all the envs as one group.
+get_envdir_groups() {
+  local envlist
+  local groups
+  envlist=$(IFS=,; echo "$*")
+  if groups=$(TOXENV="" tox --workdir "$TOXINIDIR/.tox" --showconfig -e "$envlist" 2> /dev/null | \
+      awk '/^\[testenv:.*\]$/ { env = substr($0, 10, length($0) - 10) }
+           /^envdir = / && env != "" {
+             dir = substr($0, 10)
+             if (!(dir in group)) { order[n++] = dir }
+             group[dir] = group[dir] " " env
+             env = ""
+           }
+           END { for (i = 0; i < n; i++) { print substr(group[order[i]], 2) } }') && \
+      [ "$(wc -w <<< "$groups")" = "$#" ]; then
+    echo "$groups"
+  else
+    echo "$*"
+  fi
+}
+
+# run_collection_tests_job JOBSDIR ENV...
+#
+# Run the envs one after the other.  The output of each env goes to
+# JOBSDIR/ENV.out, and its exit status to JOBSDIR/ENV.rc.
+run_collection_tests_job() {
+  local jobsdir="$1"
+  local env
+  local rc
+  shift
+  for env in "$@"; do
+    rc=0
+    TOXENV="" tox --workdir "$TOXINIDIR/.tox" -e "$env" > "$jobsdir/$env.out" 2>&1 || rc=$?
+    echo "$rc" > "$jobsdir/$env.rc"
+  done
+}
 
-if grep "^ERROR: .*failed" "$TOX_ENV_DIR/collection.tox.out"; then
+# The envs are independent, so they are run in parallel, except the envs which
+# share an env dir.  The output of each env is printed when all are done, so
+# that the outputs are not mixed, and a failed env is found by its exit status.
+jobsdir="$TOX_ENV_DIR/collection-tests"
+rm -rf "$jobsdir"
+mkdir -p "$jobsdir"
+pids=()
+while read -r group; do
+  # shellcheck disable=SC2086
+  run_collection_tests_job "$jobsdir" $group &
+  pids+=("$!")
+done <<< "$(get_envdir_groups ${testlist//,/ })"
+for pid in "${pids[@]}"; do
+  wait "$pid" || :
+done
+failed=""
+: > "$TOX_ENV_DIR/collection.tox.out"
+for env in ${testlist//,/ }; do
+  lsr_info "${ME}: Output of $env ..."
+  if [ -f "$jobsdir/$env.out" ]; then
+    tee -a "$TOX_ENV_DIR/collection.tox.out" < "$jobsdir/$env.out"
+  fi
+done
+lsr_banner "collection tests summary"
+for env in ${testlist//,/ }; do
+  if [ -f "$jobsdir/$env.rc" ] && [ "$(cat "$jobsdir/$env.rc")" = 0 ]; then
+    printf '%-32s %s\n' "$env" passed
+  else
+    printf '%-32s %s\n' "$env" FAILED
+    failed="$failed $env"
+  fi
+done
+
+if [ -n "$failed" ]; then
   lsr_error "${ME}: Some tests failed when run against the converted collection.
   This usually indicates either a problem with the collection conversion,
   or additional error suppressions are needed."
 fi
 
 # ansible-test needs meta data
-curl -s -L -o galaxy.yml "${automaintenancerepo}${STABLE_TAG}/galaxy.yml"
+cp "$galaxy_yml" galaxy.yml
+
+if [ "${LSR_ROLE2COLL_INCREMENTAL:-false}" = true ]; then
+  mkdir -p "$state_dir"
+  echo "$inputs_key" > "$state_dir/inputs_key"
+fi
 
 exit 0
@@ -0,0 +1,59 @@
+#!/bin/bash
+# SPDX-License-Identifier: MIT
+
+# Combines the coverage data of the unit tests run with LSR_COVERAGE_PARALLEL,
+# where each unit test env writes its own .coverage.ENVNAME data file instead
+# of its own reports, and renders the reports of the combined data once.
+
+# The given command line arguments are the reports to render, instead of
+# LSR_COVERAGE_REPORTS.
+
+# Environment variables:
+#
+#   LSR_COVERAGE_REPORTS
+#     space separated list of the reports to render - term (report printed to
+#     stdout), html (htmlcov directory), xml (coverage.xml); the default is
+#     "term html"
+#   LSR_TESTSDIR
+#     a path to directory where tests and tests artifacts are located; if unset
+#     or empty, this variable is set to ${TOPDIR}/tests
+
+set -euo pipefail
+
+ME=$(basename "$0")
+SCRIPTDIR=$(readlink -f "$(dirname "$0")")
+
+. "${SCRIPTDIR}/utils.sh"
+
+LSR_TESTSDIR=${LSR_TESTSDIR:-"${TOPDIR}/tests"}
+cd "${LSR_TESTSDIR}"
+
+COVERAGEFILE='.coverage'
+COVERAGERCFILE='.coveragerc'
+if [ "$#" -gt 0 ]; then
+  REPORTS="$*"
+else
+  REPORTS=${LSR_COVERAGE_REPORTS:-"term html"}
+fi
+
+# Combine the data files of the unit test envs which ran since the last
+# combine - coverage combine removes them.  Otherwise report the data
+# combined last time, if any.
+lsr_write_coverage_rc "${COVERAGERCFILE}"
+if [ -n "$(find . -maxdepth 1 -name "${COVERAGEFILE}.*" -size +0)" ]; then
+  python -m coverage combine
+elif [ ! -s "${COVERAGEFILE}" ]; then
+  lsr_info "${ME}: no coverage data in ${LSR_TESTSDIR}, nothing to report."
+  exit 0
+fi
+
+for report in ${REPORTS}; do
+  case "${report}" in
+    term) python -m coverage report ;;
+    html) python -m coverage html -d htmlcov
+          lsr_info "${ME}: HTML report in ${LSR_TESTSDIR}/htmlcov" ;;
+    xml) python -m coverage xml -o coverage.xml
+         lsr_info "${ME}: XML report in ${LSR_TESTSDIR}/coverage.xml" ;;
+    *) lsr_error "${ME}: unknown report ${report} - use term, html, or xml" ;;
+  esac
+done
@@ -49,13 +49,15 @@ LSR_TESTSDIR=${LSR_TESTSDIR:-"${TOPDIR}/tests"}
 cd "${LSR_TESTSDIR}"
 
 # For simplicity, we suppose that coverage core data file has name .coverage
-# and it is situated in $LSR_TESTSDIR. Similarly for .coveragerc.
+# and it is situated in $LSR_TESTSDIR. Similarly for .coveragerc.  With
+# LSR_COVERAGE_PARALLEL, each unit test env writes .coverage.ENVNAME instead.
 COVERAGEFILE='.coverage'
 COVERAGERCFILE='.coveragerc'
+PARALLEL_FILES=$(find . -maxdepth 1 -name "${COVERAGEFILE}.*" -size +0)
 
 # In case there is no $COVERAGEFILE, there is nothing to report. If we are
 # running in strict mode, treat this situation as error.
-if [[ ! -s "${COVERAGEFILE}" ]]; then
+if [[ ! -s "${COVERAGEFILE}" ]] && [[ -z "${PARALLEL_FILES}" ]]; then
   NO_COVERAGEFILE_MSG="${COVERAGEFILE} is missing or empty"
   if [[ "${LSR_PUBLISH_COVERAGE}" == "strict" ]]; then
     lsr_error "${ME} (strict mode): ${NO_COVERAGEFILE_MSG}!"
@@ -64,25 +66,16 @@ if [[ ! -s "${COVERAGEFILE}" ]]; then
   exit 0
 fi
 
-# Create $COVERAGERCFILE file with a [paths] section. From the official docs:
-#
-#   The first value must be an actual file path on the machine where the
-#   reporting will happen, so that source code can be found. The other values
-#   can be file patterns to match against the paths of collected data, or they
-#   can be absolute or relative file paths on the current machine.
-#
-# So in our $COVERAGERCFILE file we make both locations to point to the
-# project's top directory.
-cat > "${COVERAGERCFILE}" <<EOF
-[paths]
-source =
-    ..
-    $(readlink -f ..)
-EOF
+# Create $COVERAGERCFILE file with a [paths] section, see
+# lsr_write_coverage_rc.
+lsr_write_coverage_rc "${COVERAGERCFILE}"
 
 # Rename $COVERAGEFILE to ${COVERAGEFILE}.merge. With this trick, coverage
-# combine applies configuration in $COVERAGERCFILE also to $COVERAGEFILE.
-mv "${COVERAGEFILE}" "${COVERAGEFILE}.merge"
+# combine applies configuration in $COVERAGERCFILE also to $COVERAGEFILE, and
+# combines it with the parallel data files, if any.
+if [[ -s "${COVERAGEFILE}" ]]; then
+  mv "${COVERAGEFILE}" "${COVERAGEFILE}.merge"
+fi
 python -m coverage combine --append
 
 # shellcheck disable=SC2034
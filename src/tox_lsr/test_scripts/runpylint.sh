@@ -21,5 +21,7 @@ SCRIPTDIR=$(readlink -f "$(dirname "$0")")
 export RUN_PYLINT_DISABLED
 export RUN_PYLINT_EXCLUDE
 export RUN_PYLINT_INCLUDE
+export RUN_PYLINT_JOBS
+export RUN_PYLINT_USE_GIT
 set -x
 python "${SCRIPTDIR}/custom_pylint.py" "$@"
@@ -15,6 +15,18 @@
 #
 #   RUN_SHELLCHECK_EXTRA_ARGS
 #     any extra command line arguments to provide e.g. --include=some,errs
+#
+#   RUN_SHELLCHECK_JOBS
+#     number of shellcheck processes to run in parallel, 0 (the default) is
+#     the number of CPUs
+#
+#   LSR_LINT_CACHE
+#     if set to true, the results of shellcheck are cached per file, see
+#     lint_cache.py
+
+# The files are checked in batches by lint_cache.py, and the messages are
+# printed grouped per file, in the order of the file names.  The exit status
+# is the highest exit status of shellcheck, so that any issue fails the test.
 
 set -euo pipefail
 
@@ -39,5 +51,7 @@ set -x
 # see https://github.com/koalaman/shellcheck/wiki/SC1090
 # https://github.com/koalaman/shellcheck/wiki/SC2086
 # shellcheck disable=SC2086
-find \( -name .tox -prune \) -o \( -name .venv -prune \) -o -name \*.sh -exec \
-  shellcheck ${RUN_SHELLCHECK_EXTRA_ARGS:-} -e SC1090 '{}' \;
+find \( -name .tox -prune \) -o \( -name .venv -prune \) -o -name \*.sh -print0 | \
+  sort -z | \
+  python "$SCRIPTDIR/lint_cache.py" --jobs "${RUN_SHELLCHECK_JOBS:-0}" \
+    --config .shellcheckrc --files-from - -- shellcheck ${RUN_SHELLCHECK_EXTRA_ARGS:-} -e SC1090
@@ -0,0 +1,173 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 Red Hat, Inc.
+#
+"""
+Link the module_utils files of a role into the ansible module_utils dir.
+
+Usage: python setup_module_utils.py SRC_MODULE_UTILS_DIR DEST_MODULE_UTILS_DIR
+
+Make each file of DEST_MODULE_UTILS_DIR, the module_utils dir of the role,
+except __init__.py, *.pyc and __pycache__, available as a symbolic link in
+SRC_MODULE_UTILS_DIR, the ansible/module_utils dir installed in the venv, and
+remove the links to the files of DEST_MODULE_UTILS_DIR which no longer exist.
+
+In a tox env, the links are recorded in a manifest in the env dir
+LSR_TOX_ENV_DIR, with the modification times of both dirs.  If the dirs were
+not modified and all the links exist, nothing is done.  Otherwise, and outside
+of a tox env, only the missing links are created, and the stale links removed.
+"""
+
+import json
+import os
+import sys
+
+MANIFEST_NAME = "lsr-module-utils-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def is_module_util(name):
+    """Return True if the file `name` of the role module_utils is linked."""
+
+    return not (
+        name.startswith(".")
+        or name.endswith("__pycache__")
+        or name.endswith(".pyc")
+        or name.endswith("__init__.py")
+    )
+
+
+def get_mtime(path):
+    """Return the modification time of `path`, as precise as possible."""
+
+    path_st = os.stat(path)
+    return getattr(path_st, "st_mtime_ns", path_st.st_mtime)
+
+
+def get_manifest_path():
+    """Return the path of the manifest, None if not in a tox env."""
+
+    env_dir = os.environ.get("LSR_TOX_ENV_DIR")
+    if env_dir and os.path.isdir(env_dir):
+        return os.path.join(env_dir, MANIFEST_NAME)
+    return None
+
+
+def read_manifest(path):
+    """Return the manifest in `path`, or None if it cannot be read."""
+
+    try:
+        with open(path) as manifest_f:
+            manifest = json.load(manifest_f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """Write `manifest` to `path` - errors are ignored."""
+
+    tmp_path = "%s.%d" % (path, os.getpid())
+    try:
+        with open(tmp_path, "w") as manifest_f:
+            json.dump(manifest, manifest_f, indent=1, sort_keys=True)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def is_up_to_date(manifest, srcdir, destdir):
+    """Return True if the links in `manifest` are still valid."""
+
+    if manifest is None:
+        return False
+    if manifest.get("src") != srcdir or manifest.get("dest") != destdir:
+        return False
+    if manifest.get("src_mtime") != get_mtime(srcdir):
+        return False
+    if manifest.get("dest_mtime") != get_mtime(destdir):
+        return False
+    for name in manifest.get("links", []):
+        if not os.path.islink(os.path.join(srcdir, name)):
+            return False
+    return True
+
+
+def sync_links(srcdir, destdir):
+    """
+    Make the links in `srcdir` match the module_utils files in `destdir`.
+
+    Return the sorted names of the links.
+    """
+
+    wanted = set(name for name in os.listdir(destdir) if is_module_util(name))
+    for name in os.listdir(srcdir):
+        path = os.path.join(srcdir, name)
+        if not os.path.islink(path):
+            continue
+        target = os.readlink(path)
+        if os.path.dirname(target) != destdir:
+            continue
+        if name in wanted and target == os.path.join(destdir, name):
+            wanted.discard(name)
+            continue
+        os.unlink(path)
+    for name in sorted(wanted):
+        os.symlink(os.path.join(destdir, name), os.path.join(srcdir, name))
+    return sorted(
+        name
+        for name in os.listdir(destdir)
+        if is_module_util(name) and os.path.islink(os.path.join(srcdir, name))
+    )
+
+
+def main():
+    """Script entry point. Return exit code."""
+
+    if len(sys.argv) != 3 or sys.argv[1] in ("-h", "--help"):
+        sys.stdout.write(__doc__)
+        return 0 if sys.argv[1:2] in (["-h"], ["--help"]) else 2
+    srcdir, destdir = sys.argv[1:]
+    if not srcdir or not os.path.isdir(srcdir):
+        sys.stdout.write(
+            "Either ansible is not installed, or there is no ansible/"
+            "module_utils\nin %s - Skipping\n" % srcdir
+        )
+        return 0
+    if not destdir or not os.path.isdir(destdir):
+        sys.stdout.write("Role has no module_utils - Skipping\n")
+        return 0
+    # we need absolute paths for the links
+    srcdir = os.path.realpath(srcdir)
+    destdir = os.path.realpath(destdir)
+    manifest_path = get_manifest_path()
+    if manifest_path is None:
+        sync_links(srcdir, destdir)
+        return 0
+    if is_up_to_date(read_manifest(manifest_path), srcdir, destdir):
+        return 0
+    links = sync_links(srcdir, destdir)
+    write_manifest(
+        manifest_path,
+        {
+            "version": MANIFEST_VERSION,
+            "src": srcdir,
+            "dest": destdir,
+            "src_mtime": get_mtime(srcdir),
+            "dest_mtime": get_mtime(destdir),
+            "links": links,
+        },
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
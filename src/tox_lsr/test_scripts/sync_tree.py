@@ -0,0 +1,229 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2021 Red Hat, Inc.
+#
+"""
+Make a directory tree a mirror of another one, updating only what changed.
+
+Usage: python sync_tree.py [--checksum] [--mode MODE] [--changed FILE] SRC DEST
+
+Make DEST a mirror of SRC like cp -a would, but keep the files of DEST which
+are the same as in SRC, and remove the files which are not in SRC.  A file is
+the same if it has the same size and modification time, or with --checksum,
+the same size and contents.  Symbolic links are copied as links.
+
+The changed files are put in DEST using the first of these which works:
+
+  reflink
+    the file is a copy which shares the data blocks with the file in SRC
+    until one of them is written, where the filesystem supports it e.g.
+    btrfs and xfs;
+  link
+    the file is a hard link to the file in SRC - so SRC and DEST must be on
+    the same filesystem, and the files must not be written in DEST;
+  copy
+    the file is copied.
+
+MODE is one of these, or auto for all of them in this order, the default.
+
+With --changed, the absolute paths of the files and links updated in DEST are
+written to FILE, separated by NUL characters.
+"""
+
+import errno
+import filecmp
+import os
+import shutil
+import stat
+import sys
+
+try:
+    import fcntl
+except ImportError:  # not on Linux - no reflinks
+    fcntl = None
+
+FICLONE = 0x40049409  # from linux/fs.h
+METHODS = ("reflink", "link", "copy")
+
+
+def remove(path):
+    """Remove `path`, a directory tree or any other file."""
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.unlink(path)
+
+
+def reflink(src, dest):
+    """Create `dest` as a reflink copy of `src`."""
+
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported", dest)
+    with open(src, "rb") as src_f:
+        with open(dest, "wb") as dest_f:
+            try:
+                fcntl.ioctl(dest_f.fileno(), FICLONE, src_f.fileno())
+            except (IOError, OSError):
+                dest_f.close()
+                os.unlink(dest)
+                raise
+    shutil.copystat(src, dest)
+
+
+def copy(src, dest):
+    """Create `dest` as a copy of `src`."""
+
+    shutil.copy2(src, dest)
+
+
+class TreeSync(object):
+    """
+    Mirror a tree into another one.
+
+    The methods used to put the files are tried in order, and a method which
+    fails is not tried again for the next files.  The counts of the updated,
+    unchanged and removed files are kept for the summary, and the paths of
+    the updated files in `changed`.
+    """
+
+    def __init__(self, methods, checksum=False):
+        """Put the files with `methods`, comparing checksums if `checksum`."""
+
+        self.methods = list(methods)
+        self.checksum = checksum
+        self.counts = {"updated": 0, "unchanged": 0, "removed": 0}
+        self.used = set()
+        self.changed = []
+
+    def is_same(self, src_st, src, dest):
+        """Return True if the file `dest` is the same as `src`."""
+
+        try:
+            dest_st = os.lstat(dest)
+        except OSError:
+            return False
+        if not stat.S_ISREG(dest_st.st_mode):
+            return False
+        if (src_st.st_dev, src_st.st_ino) == (dest_st.st_dev, dest_st.st_ino):
+            return True  # hard link
+        if src_st.st_size != dest_st.st_size:
+            return False
+        if self.checksum:
+            return filecmp.cmp(src, dest, shallow=False)
+        return getattr(src_st, "st_mtime_ns", src_st.st_mtime) == getattr(
+            dest_st, "st_mtime_ns", dest_st.st_mtime
+        )
+
+    def put_file(self, src, dest):
+        """Put the file `src` as `dest` with the first method which works."""
+
+        funcs = {"reflink": reflink, "link": os.link, "copy": copy}
+        while self.methods:
+            method = self.methods[0]
+            try:
+                funcs[method](src, dest)
+            except (IOError, OSError) as exc:
+                if method == "copy" or exc.errno not in (
+                    errno.EXDEV,
+                    errno.EOPNOTSUPP,
+                    errno.ENOTTY,
+                    errno.EINVAL,
+                    errno.EPERM,
+                    errno.EMLINK,
+                ):
+                    raise
+                self.methods.pop(0)
+                continue
+            self.used.add(method)
+            return
+        raise OSError(errno.EOPNOTSUPP, "no method to put the file", dest)
+
+    def sync(self, src, dest):
+        """Make the directory `dest` a mirror of the directory `src`."""
+
+        if not os.path.isdir(dest) or os.path.islink(dest):
+            if os.path.lexists(dest):
+                remove(dest)
+            os.makedirs(dest)
+        src_names = os.listdir(src)
+        for name in sorted(set(os.listdir(dest)) - set(src_names)):
+            remove(os.path.join(dest, name))
+            self.counts["removed"] += 1
+        for name in sorted(src_names):
+            src_path = os.path.join(src, name)
+            dest_path = os.path.join(dest, name)
+            src_st = os.lstat(src_path)
+            if stat.S_ISDIR(src_st.st_mode):
+                self.sync(src_path, dest_path)
+            elif stat.S_ISLNK(src_st.st_mode):
+                target = os.readlink(src_path)
+                if (
+                    os.path.islink(dest_path)
+                    and os.readlink(dest_path) == target
+                ):
+                    self.counts["unchanged"] += 1
+                    continue
+                if os.path.lexists(dest_path):
+                    remove(dest_path)
+                os.symlink(target, dest_path)
+                self.counts["updated"] += 1
+                self.changed.append(os.path.abspath(dest_path))
+            elif stat.S_ISREG(src_st.st_mode):
+                if self.is_same(src_st, src_path, dest_path):
+                    self.counts["unchanged"] += 1
+                    continue
+                if os.path.lexists(dest_path):
+                    remove(dest_path)
+                self.put_file(src_path, dest_path)
+                self.counts["updated"] += 1
+                self.changed.append(os.path.abspath(dest_path))
+        shutil.copystat(src, dest)
+
+
+def main():
+    """Script entry point. Return exit code."""
+
+    args = sys.argv[1:]
+    if "-h" in args or "--help" in args:
+        sys.stdout.write(__doc__)
+        return 0
+    checksum = False
+    mode = "auto"
+    changed_file = None
+    while args and args[0].startswith("--"):
+        arg = args.pop(0)
+        if arg == "--checksum":
+            checksum = True
+        elif arg == "--mode" and args:
+            mode = args.pop(0)
+        elif arg == "--changed" and args:
+            changed_file = args.pop(0)
+        else:
+            raise ValueError("unknown option: %s" % arg)
+    if mode != "auto" and mode not in METHODS:
+        raise ValueError("--mode: unknown MODE: %s" % mode)
+    if len(args) != 2:
+        raise ValueError("SRC and DEST are required")
+    methods = METHODS if mode == "auto" else (mode,)
+    tree_sync = TreeSync(methods, checksum)
+    tree_sync.sync(args[0], args[1])
+    if changed_file:
+        with open(changed_file, "w") as changed_f:
+            changed_f.write("".join(path + "\0" for path in tree_sync.changed))
+    sys.stderr.write(
+        "%s: %d updated (%s), %d unchanged, %d removed\n"
+        % (
+            os.path.basename(sys.argv[0]),
+            tree_sync.counts["updated"],
+            ", ".join(sorted(tree_sync.used)) or "-",
+            tree_sync.counts["unchanged"],
+            tree_sync.counts["removed"],
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
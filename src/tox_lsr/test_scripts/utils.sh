@@ -16,6 +16,9 @@ import sys
 sys.stdout.write("%s.%s\n" % sys.version_info[:2])
 '
 
+# Directory of the cache of the Python versions, see lsr_get_python_version.
+__lsr_probe_cache_dir="${LSR_PROBE_CACHE_DIR:-${XDG_CACHE_HOME:-$HOME/.cache}/tox-lsr/probe}"
+
 # Colors for lsr_banner, lsr_info, and lsr_error.
 __lsr_color_reset='\e[0m'
 __lsr_color_red='\e[31m'
@@ -77,11 +80,38 @@ function lsr_error() {
 #
 #   $1 - command or full path to Python interpreter
 #
-# If $1 is installed, return its version.
+# If $1 is installed, return its version.  The version is cached in
+# LSR_PROBE_CACHE_DIR (default: ~/.cache/tox-lsr/probe) under the resolved path
+# of the interpreter, and is valid as long as the interpreter is not modified.
 function lsr_get_python_version() {
-  if command -v "$1" >/dev/null 2>&1; then
+  local python
+  local key
+  local cache_file
+  local cached_key
+  local version
+
+  if ! python=$(command -v "$1" 2>/dev/null); then
+    return 0
+  fi
+  python=$(readlink -f "$python") || python=""
+  if [[ ! -f "$python" ]]; then
     "$1" -c "${__lsr_get_python_version_py}"
+    return
   fi
+  key="$python $(stat -c %Y "$python")"
+  cache_file="${__lsr_probe_cache_dir}/python-$(cksum <<< "$python" | cut -d " " -f 1)"
+  if [[ -f "$cache_file" ]] && { read -r cached_key; read -r version; } < "$cache_file" && \
+      [[ "$cached_key" == "$key" ]] && [[ -n "$version" ]]; then
+    echo "$version"
+    return 0
+  fi
+  version=$("$1" -c "${__lsr_get_python_version_py}") || return
+  # the cache is only an optimization - ignore the errors
+  if mkdir -p "${__lsr_probe_cache_dir}" 2>/dev/null && \
+      printf '%s\n%s\n' "$key" "$version" > "$cache_file.$$" 2>/dev/null; then
+    mv -f "$cache_file.$$" "$cache_file" 2>/dev/null || rm -f "$cache_file.$$"
+  fi
+  echo "$version"
 }
 
 ##
@@ -214,6 +244,29 @@ function lsr_setup_module_utils() {
   fi
 }
 
+##
+# lsr_write_coverage_rc $1
+#
+#   $1 - path to the coverage config file to write
+#
+# Write a coverage config file with a [paths] section for the coverage data
+# files in the current directory, the tests directory.  From the official docs:
+#
+#   The first value must be an actual file path on the machine where the
+#   reporting will happen, so that source code can be found. The other values
+#   can be file patterns to match against the paths of collected data, or they
+#   can be absolute or relative file paths on the current machine.
+#
+# So both locations point to the project's top directory.
+function lsr_write_coverage_rc() {
+  cat > "$1" <<EOF
+[paths]
+source =
+    ..
+    $(readlink -f ..)
+EOF
+}
+
 # set TOPDIR
 # shellcheck disable=SC2034
 ME=${ME:-"$(basename "$0")"}
@@ -0,0 +1,147 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""
+Local wheelhouse shared by the tox-lsr testenvs.
+
+With LSR_WHEELHOUSE=true, the install_command of the selected testenvs
+is wrapped with the pip_wheelhouse.py test script, which installs the
+packages from the wheelhouse, adding their wheels to the wheelhouse
+first if they are not there yet.  This module is also the
+tox-lsr-wheelhouse command, which adds the wheels of the deps of the
+testenvs to the wheelhouse ahead of time e.g. when building a CI image.
+"""
+
+import os
+import subprocess  # nosec B404 # runs pip_wheelhouse.py
+import sys
+
+from .paths import get_lsr_scriptdir
+
+MYPY = False
+if MYPY:  # typing is only for the type comments - not in python 2.6
+    from typing import List, Optional, Set
+
+    from tox.config import Config
+
+LSR_WHEELHOUSE_DIR_ENV = "LSR_WHEELHOUSE_DIR"
+LSR_WHEELHOUSE_NO_INDEX_ENV = "LSR_WHEELHOUSE_NO_INDEX"
+WRAPPER_SCRIPT = "pip_wheelhouse.py"  # in the test scripts dir
+
+USAGE = """Usage: tox-lsr-wheelhouse [--refresh] [TOX_ARGUMENTS]
+
+Add the wheels of the deps of the testenvs selected by TOX_ARGUMENTS
+e.g. -e pylint,ansible-lint, or of the envlist, to the wheelhouse
+LSR_WHEELHOUSE_DIR, default ~/.cache/tox-lsr/wheelhouse, if they are
+not there yet.  The wheels of each testenv are built with its python
+interpreter.  With --refresh, the package index is looked up, and the
+wheels of the newest versions are added even if the wheels of older
+versions are in the wheelhouse - the testenvs then install the newest
+versions.
+"""
+
+
+def get_wheelhouse_dir():
+    # type: () -> str
+    """Return the wheelhouse dir."""
+
+    wheelhouse = os.environ.get(LSR_WHEELHOUSE_DIR_ENV)
+    if not wheelhouse:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        wheelhouse = os.path.join(cache_home, "tox-lsr", "wheelhouse")
+    return os.path.abspath(wheelhouse)
+
+
+def wrap_install_command(install_command, wrapper, wheelhouse, options):
+    # type: (List[str], str, str, List[str]) -> List[str]
+    """Return install_command run with the wheelhouse wrapper script."""
+
+    if wrapper in install_command:  # already wrapped
+        return install_command
+    return (
+        ["python", wrapper]
+        + options
+        + [wheelhouse, "--"]
+        + list(install_command)
+    )
+
+
+def set_install_commands(config, selected, lsr_scriptdir):
+    # type: (Config, Optional[Set[str]], str) -> None
+    """
+    Use the wheelhouse in the install_command of the testenvs.
+
+    Only the testenvs in selected are changed, so that the deferred
+    testenvs are not built, or all of them if selected is None.
+    """
+
+    wrapper = os.path.join(lsr_scriptdir, WRAPPER_SCRIPT)
+    wheelhouse = get_wheelhouse_dir()
+    options = []
+    if os.environ.get(LSR_WHEELHOUSE_NO_INDEX_ENV) == "true":
+        options.append("--no-index")
+    names = list(config.envconfigs) if selected is None else selected
+    for name in names:
+        if name not in config.envconfigs:
+            continue
+        envconf = config.envconfigs[name]
+        envconf.install_command = wrap_install_command(
+            envconf.install_command, wrapper, wheelhouse, options
+        )
+
+
+def main(argv=None):
+    # type: (Optional[List[str]]) -> int
+    """Entry point of tox-lsr-wheelhouse. Return exit code."""
+
+    # pylint: disable=import-outside-toplevel,no-member
+    from tox.config import parseconfig
+
+    args = sys.argv[1:] if argv is None else list(argv)
+    if "-h" in args or "--help" in args:
+        sys.stdout.write(USAGE)
+        return 0
+    options = ["--build-only"]
+    if "--refresh" in args:
+        args.remove("--refresh")
+        options.append("--refresh")
+    config = parseconfig(args)
+    wrapper = os.path.join(get_lsr_scriptdir(), WRAPPER_SCRIPT)
+    wheelhouse = get_wheelhouse_dir()
+    status = 0
+    for name in config.envlist:
+        envconf = config.envconfigs[name]
+        deps = [str(dep) for dep in envconf.deps]
+        if not deps:
+            continue
+        executable = config.interpreters.get_executable(envconf)
+        if not executable:
+            sys.stderr.write(
+                "{name}: skipped - {python} not found\n".format(
+                    name=name, python=envconf.basepython
+                )
+            )
+            continue
+        sys.stderr.write(
+            "{name}: adding the wheels of {deps}\n".format(
+                name=name, deps=" ".join(deps)
+            )
+        )
+        command = (
+            [executable, wrapper]
+            + options
+            + [wheelhouse, "--", executable, "-m", "pip", "install"]
+            + deps
+        )
+        env_status = subprocess.call(
+            command,  # nosec B603 # no shell
+            cwd=str(config.toxinidir),
+        )
+        status = max(status, env_status)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,9 @@ class Config(object):  # noqa: H238
     envconfigs: Mapping[str, TestenvConfig]
     toxworkdir: str
 
+class VenvAttribute(object):
+    name: str
+
 class ParseIni(object):
     _cfg: iniconfig.IniConfig
     config: Config
@@ -34,3 +37,5 @@ class parseini(ParseIni):
 
 class Parser(object):
     _testenv_attr: List[str]
+
+def parseconfig(args: List[str]) -> Config: ...
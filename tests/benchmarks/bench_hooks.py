@@ -0,0 +1,332 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""
+Benchmark the tox-lsr configuration hooks.
+
+Usage: python tests/benchmarks/bench_hooks.py [options]
+
+For each scenario, a synthetic user tox.ini is written (see
+generators.py) and parsed by tox with the plugin disabled, then
+tox_lsr.hooks.tox_configure is run on the config with the plugin
+enabled.  The merged ini cache is bypassed so that every round does
+the full merge and parse, unless --cache is given - then all the rounds
+but the first read the merged ini from the cache.  The best time of
+each phase of the hook (get_merged_ini, merge_ini which it calls when
+the cache is bypassed or missed, parse_ini_data, merge_config, and
+merge_envconf which is part of merge_config) and of the whole
+tox_configure is reported,
+along with the peak memory allocated by tox_configure (python 3.4 and
+later).
+
+With --baseline PATH, the results are compared with those stored in
+PATH, and the exit status is 1 if any time or the peak memory grew by
+more than --threshold.  With --update-baseline, the results are stored
+in PATH instead.  A missing baseline, or one for another tox version,
+or one stored with or without --cache unlike this run, is reported
+and the exit status is 1 - run with --update-baseline to store it.
+
+The bench-tox20 and bench-tox30 testenvs compare with the baselines
+committed in this directory.  Those were recorded on another machine,
+and timings vary by up to 2x between runs on the same machine, so the
+testenvs use --threshold 1.5 which only catches gross regressions.  To
+compare closely, store a baseline on your machine or a persistent CI
+path, and pass it after -- e.g.
+
+    tox -e bench-tox30 -- --baseline ~/bench.json --update-baseline
+    (make changes)
+    tox -e bench-tox30 -- --baseline ~/bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import tox
+from generators import SCENARIOS
+from tox.config import parseconfig
+
+import tox_lsr.hooks
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+# functions of tox_lsr.hooks timed separately - merge_ini is called by
+# get_merged_ini, merge_envconf by merge_config
+PHASES = (
+    "get_merged_ini",
+    "merge_ini",
+    "parse_ini_data",
+    "merge_config",
+    "merge_envconf",
+)
+TOTAL = "tox_configure"
+MIN_TIME_DELTA_MS = 1.0  # ignore smaller regressions - timer noise
+MIN_PEAK_DELTA_KIB = 64
+
+
+class PhaseTimer(object):
+    """Time the calls to the PHASES functions of tox_lsr.hooks."""
+
+    def __init__(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.orig_funcs = {}
+
+    def _wrap(self, name, func):
+        def timed(*args, **kwargs):
+            start = timeit.default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.times[name] += timeit.default_timer() - start
+
+        return timed
+
+    def __enter__(self):
+        for name in PHASES:
+            func = getattr(tox_lsr.hooks, name)
+            self.orig_funcs[name] = func
+            setattr(tox_lsr.hooks, name, self._wrap(name, func))
+        return self
+
+    def __exit__(self, *args):
+        for name, func in self.orig_funcs.items():
+            setattr(tox_lsr.hooks, name, func)
+
+
+def make_config(toxinipath, cache):
+    """Return a tox config for toxinipath with the plugin disabled."""
+
+    args = ["-c", toxinipath]
+    if not cache:
+        args.append("--lsr-no-cache")
+    os.environ["LSR_ENABLE"] = "false"
+    try:
+        config = parseconfig(args)
+    finally:
+        del os.environ["LSR_ENABLE"]
+    config.option.lsr_enable = True
+    return config
+
+
+def run_scenario(toxinipath, rounds, cache):
+    """Return the best phase times in ms, and the peak memory in KiB."""
+
+    samples = dict((name, []) for name in PHASES + (TOTAL,))
+    for _ in range(rounds):
+        config = make_config(toxinipath, cache)
+        with PhaseTimer() as phase_timer:
+            start = timeit.default_timer()
+            tox_lsr.hooks.tox_configure(config)
+            samples[TOTAL].append(timeit.default_timer() - start)
+        for name in PHASES:
+            samples[name].append(phase_timer.times[name])
+    times_ms = dict(
+        (name, round(min(values) * 1000, 3))
+        for name, values in samples.items()
+    )
+    peak_kib = None
+    if tracemalloc is not None:
+        # separate round - tracing slows down everything
+        config = make_config(toxinipath, cache)
+        tracemalloc.start()
+        try:
+            tox_lsr.hooks.tox_configure(config)
+            peak_kib = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+    return times_ms, peak_kib
+
+
+def run_benchmarks(scenarios, rounds, cache):
+    """Run the scenarios, and return the results."""
+
+    results = {
+        "tox_version": tox.__version__,
+        "python_version": "{0}.{1}".format(*sys.version_info[:2]),
+        "rounds": rounds,
+        "cache": cache,
+        "scenarios": {},
+    }
+    roledir = tempfile.mkdtemp()
+    try:
+        toxinipath = os.path.join(roledir, "tox.ini")
+        for name in scenarios:
+            with open(toxinipath, "w") as ini_f:
+                ini_f.write(SCENARIOS[name]())
+            times_ms, peak_kib = run_scenario(toxinipath, rounds, cache)
+            results["scenarios"][name] = {
+                "times_ms": times_ms,
+                "peak_kib": peak_kib,
+            }
+    finally:
+        shutil.rmtree(roledir)
+    return results
+
+
+def print_results(results):
+    """Print the results as a table."""
+
+    columns = PHASES + (TOTAL,)
+    print(
+        "tox {tox_version}, python {python_version}, "
+        "best of {rounds} rounds, times in ms".format(**results)
+        + (", merged ini cache used" if results["cache"] else "")
+    )
+    print(
+        "{0:<16}".format("scenario")
+        + "".join("{0:>16}".format(col) for col in columns)
+        + "{0:>12}".format("peak KiB")
+    )
+    for name, res in sorted(results["scenarios"].items()):
+        print(
+            "{0:<16}".format(name)
+            + "".join(
+                "{0:>16.2f}".format(res["times_ms"][col]) for col in columns
+            )
+            + "{0:>12}".format(res["peak_kib"])
+        )
+
+
+def is_regression(value, base_value, threshold, min_delta):
+    """See if value grew by more than threshold from base_value."""
+
+    if value is None or base_value is None:
+        return False
+    return (
+        value > base_value * (1 + threshold) and value - base_value > min_delta
+    )
+
+
+def find_regressions(results, baseline, threshold):
+    """Return a list of messages for the regressions from baseline."""
+
+    regressions = []
+    for name, res in sorted(results["scenarios"].items()):
+        base = baseline["scenarios"].get(name)
+        if not base:
+            continue
+        for phase, value in sorted(res["times_ms"].items()):
+            base_value = base["times_ms"].get(phase)
+            if is_regression(value, base_value, threshold, MIN_TIME_DELTA_MS):
+                regressions.append(
+                    "{name} {phase}: {value:.2f} ms, baseline "
+                    "{base_value:.2f} ms".format(
+                        name=name,
+                        phase=phase,
+                        value=value,
+                        base_value=base_value,
+                    )
+                )
+        if is_regression(
+            res["peak_kib"], base["peak_kib"], threshold, MIN_PEAK_DELTA_KIB
+        ):
+            regressions.append(
+                "{name} peak memory: {value} KiB, baseline "
+                "{base_value} KiB".format(
+                    name=name,
+                    value=res["peak_kib"],
+                    base_value=base["peak_kib"],
+                )
+            )
+    return regressions
+
+
+def write_results(results, path):
+    """Write the results as JSON to path."""
+
+    with open(path, "w") as out_f:
+        json.dump(results, out_f, indent=2, sort_keys=True)
+        out_f.write("\n")
+
+
+def main():
+    """Run the benchmarks, return 1 if there are regressions."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--rounds", type=int, default=10, help="Rounds per scenario"
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run - may be repeated - default is all",
+    )
+    parser.add_argument(
+        "--baseline", help="JSON file with the baseline results"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed growth from the baseline e.g. 0.25 is 25%%",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Use the merged ini cache, bypassed by default",
+    )
+    parser.add_argument("--output", help="Write the results as JSON here")
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.scenario or sorted(SCENARIOS), args.rounds, args.cache
+    )
+    print_results(results)
+    if args.output:
+        write_results(results, args.output)
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        write_results(results, args.baseline)
+        print("Stored baseline in " + args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        sys.stderr.write(
+            "NOTICE: baseline {0} does not exist - not comparing, run with "
+            "--update-baseline to store it\n".format(args.baseline)
+        )
+        return 1
+    with open(args.baseline) as base_f:
+        baseline = json.load(base_f)
+    if baseline.get("tox_version") != results["tox_version"]:
+        sys.stderr.write(
+            "NOTICE: baseline {0} is for tox {1}, not {2} - not comparing, "
+            "run with --update-baseline to replace it\n".format(
+                args.baseline,
+                baseline.get("tox_version"),
+                results["tox_version"],
+            )
+        )
+        return 1
+    if bool(baseline.get("cache")) != args.cache:
+        sys.stderr.write(
+            "NOTICE: baseline {0} was stored {1} --cache - not comparing, "
+            "run with --update-baseline to replace it\n".format(
+                args.baseline, "with" if baseline.get("cache") else "without"
+            )
+        )
+        return 1
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print("REGRESSION: " + regression)
+    if regressions:
+        return 1
+    print("No regressions from baseline " + args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Generators of synthetic user tox.ini files for the benchmarks."""
+
+LSR_ENABLE_SECTION = """
+[lsr_config]
+lsr_enable = true
+"""
+
+
+def role_ini():
+    """Return a tox.ini like the one in most roles."""
+
+    return LSR_ENABLE_SECTION + """
+[testenv]
+setenv =
+    TEST_SRC_DIR = {toxinidir}/tests
+"""
+
+
+def many_sections_ini(count=200):
+    """Return a tox.ini with count custom testenv sections."""
+
+    lines = [LSR_ENABLE_SECTION]
+    for idx in range(count):
+        lines.append("""
+[testenv:custom{idx}]
+deps =
+    pkg{idx}
+    common
+setenv =
+    CUSTOM_VAR = {idx}
+commands =
+    python -c 'print({idx})'
+""".format(idx=idx))
+    return "".join(lines)
+
+
+def factor_envs_ini(pythons=8, ansibles=6, extras=4):
+    """Return a tox.ini with a factor-expanded envlist."""
+
+    pyfactors = ",".join(str(36 + idx) for idx in range(pythons))
+    ansfactors = ",".join(str(28 + idx) for idx in range(ansibles))
+    extfactors = ",".join("x{idx}".format(idx=idx) for idx in range(extras))
+    lines = [
+        LSR_ENABLE_SECTION,
+        """
+[tox]
+envlist =
+    py{{{pyfactors}}}-ansible{{{ansfactors}}}-{{{extfactors}}}
+    flake8, pylint, black
+
+[testenv]
+deps =
+""".format(pyfactors=pyfactors, ansfactors=ansfactors, extfactors=extfactors),
+    ]
+    for idx in range(ansibles):
+        lines.append(
+            "    ansible{num}: ansible=={major}.{minor}.*\n".format(
+                num=28 + idx, major=2, minor=8 + idx
+            )
+        )
+    for idx in range(extras):
+        lines.append("    x{idx}: extra{idx}\n".format(idx=idx))
+    lines.append("setenv =\n")
+    for idx in range(extras):
+        lines.append("    x{idx}: EXTRA = {idx}\n".format(idx=idx))
+    return "".join(lines)
+
+
+def long_lists_ini(count=300):
+    """Return a tox.ini with long deps, setenv and passenv lists."""
+
+    deps = "".join(
+        "    pkg{idx}>={idx}.0\n".format(idx=idx) for idx in range(count)
+    )
+    setenv = "".join(
+        "    VAR{idx} = {{toxinidir}}/value{idx}\n".format(idx=idx)
+        for idx in range(count)
+    )
+    passenv = "".join(
+        "    PASS{idx}\n".format(idx=idx) for idx in range(count)
+    )
+    return (
+        LSR_ENABLE_SECTION
+        + "\n[testenv]\ndeps =\n"
+        + deps
+        + "setenv =\n"
+        + setenv
+        + "passenv =\n"
+        + passenv
+    )
+
+
+def deep_refs_ini(depth=30):
+    """Return a tox.ini with a chain of depth {[section]key} references."""
+
+    lines = [LSR_ENABLE_SECTION, "\n[base0]\ndeps = pkg0\n"]
+    for idx in range(1, depth):
+        lines.append(
+            "\n[base{idx}]\ndeps =\n    {{[base{prev}]deps}}\n"
+            "    pkg{idx}\n".format(idx=idx, prev=idx - 1)
+        )
+    lines.append(
+        "\n[testenv]\ndeps =\n    {{[base{last}]deps}}\n".format(
+            last=depth - 1
+        )
+    )
+    return "".join(lines)
+
+
+# name -> function returning the tox.ini contents
+SCENARIOS = {
+    "role": role_ini,
+    "many_sections": many_sections_ini,
+    "factor_envs": factor_envs_ini,
+    "long_lists": long_lists_ini,
+    "deep_refs": deep_refs_ini,
+}
@@ -0,0 +1,93 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Tests for tox_lsr cache."""
+
+import os
+import shutil
+import tempfile
+
+import unittest2
+
+from tox_lsr.cache import (
+    CACHE_SUBDIR,
+    config_cache_key,
+    get_cache_dir,
+    read_cached_config,
+    write_cached_config,
+)
+
+
+class CacheTestCase(unittest2.TestCase):
+    def setUp(self):
+        self.toxworkdir = tempfile.mkdtemp()
+        self.cache_dir = get_cache_dir(self.toxworkdir)
+        self.toxinipath = os.path.join(self.toxworkdir, "tox.ini")
+        with open(self.toxinipath, "wb") as ini_f:
+            ini_f.write(b"[lsr_config]\nlsr_enable = true\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.toxworkdir)
+
+    def test_get_cache_dir(self):
+        """Test get_cache_dir."""
+
+        self.assertEqual(
+            os.path.join(self.toxworkdir, CACHE_SUBDIR),
+            get_cache_dir(self.toxworkdir),
+        )
+
+    def test_config_cache_key(self):
+        """Test that the key changes with each of its inputs."""
+
+        args = [self.toxinipath, "[tox]\n", "/scriptdir", "/configdir"]
+        key = config_cache_key(*args)
+        self.assertEqual(key, config_cache_key(*args))
+        for idx in range(1, len(args)):
+            changed = list(args)
+            changed[idx] += "x"
+            self.assertNotEqual(key, config_cache_key(*changed))
+        with open(self.toxinipath, "ab") as ini_f:
+            ini_f.write(b"[testenv]\n")
+        self.assertNotEqual(key, config_cache_key(*args))
+        args[0] = os.path.join(self.toxworkdir, "nosuchfile")
+        self.assertIsNone(config_cache_key(*args))
+
+    def test_read_write_cached_config(self):
+        """Test reading and writing the cached config."""
+
+        self.assertIsNone(
+            read_cached_config(self.cache_dir, self.toxinipath, "key")
+        )
+        write_cached_config(self.cache_dir, self.toxinipath, "key", "data\n")
+        self.assertEqual(
+            "data\n",
+            read_cached_config(self.cache_dir, self.toxinipath, "key"),
+        )
+        self.assertIsNone(
+            read_cached_config(self.cache_dir, self.toxinipath, "other")
+        )
+        write_cached_config(self.cache_dir, self.toxinipath, "other", "new")
+        self.assertEqual(
+            "new", read_cached_config(self.cache_dir, self.toxinipath, "other")
+        )
+        self.assertIsNone(
+            read_cached_config(self.cache_dir, self.toxinipath, "key")
+        )
+        # each tox.ini has its own slot
+        write_cached_config(self.cache_dir, "/other/tox.ini", "key", "data")
+        self.assertEqual(
+            "new", read_cached_config(self.cache_dir, self.toxinipath, "other")
+        )
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_write_cached_config_error(self):
+        """Test that errors writing the cache are ignored."""
+
+        # cache dir cannot be created because a file is in the way
+        with open(self.cache_dir, "wb") as cache_f:
+            cache_f.write(b"")
+        write_cached_config(self.cache_dir, self.toxinipath, "key", "data")
+        self.assertIsNone(
+            read_cached_config(self.cache_dir, self.toxinipath, "key")
+        )
@@ -3,21 +3,23 @@
 #
 """Tests for tox_lsr hooks."""
 
+import io
+import json
 import os
 import shutil
+import subprocess  # nosec B404 # for the import time test
+import sys
 import tempfile
 
 try:
     from unittest import mock as unittest_mock
-    from unittest.mock import MagicMock, Mock, patch
+    from unittest.mock import Mock, patch
 except ImportError:
     import mock as unittest_mock
-    from mock import MagicMock, Mock, patch
+    from mock import Mock, patch
 
 from copy import deepcopy
 
-import pkg_resources
-
 # I have no idea why pylint complains about this.  This works:
 # command = python -c 'import py; print(dir(py.iniconfig))'
 # bug in pylint?  anyway, just ignore it
@@ -26,25 +28,43 @@ import pkg_resources
 # pylint: disable=no-member,no-name-in-module,import-error
 import py.iniconfig
 import unittest2
+from tox.config import parseconfig
 
 from tox_lsr.hooks import (
     CONFIG_FILES_SUBDIR,
     LSR_CONFIG_SECTION,
     LSR_ENABLE,
     LSR_ENABLE_ENV,
-    SCRIPT_NAME,
+    LSR_NO_CACHE,
+    LSR_NO_CACHE_ENV,
+    LSR_PLAN,
+    LSR_PROFILE,
+    LSR_PROFILE_ENV,
+    LSR_SHARE_ENVDIRS,
+    LSR_SHARE_ENVDIRS_ENV,
+    SHARED_ENVDIR_PREFIX,
     TOX_DEFAULT_INI,
-    _LSRPath,
+    _InMemoryIniConfig,
+    _LazyEnvconfig,
+    _LazyEnvconfigs,
+    get_merged_ini,
+    get_molecule_envkey,
+    get_package_file,
+    get_selected_envs,
+    is_lsr_cache_enabled,
     is_lsr_enabled,
+    is_lsr_profile_enabled,
+    is_lsr_share_envdirs_enabled,
     merge_config,
     merge_envconf,
     merge_ini,
-    merge_prop_values,
-    prop_is_set,
+    parse_ini_data,
     set_prop_values_ini,
+    share_envdirs,
     tox_addoption,
     tox_configure,
 )
+from tox_lsr.profiling import PROFILE_FILE
 
 from .utils import MockConfig
 
@@ -53,16 +73,25 @@ from .utils import MockConfig
 
 
 class HooksTestCase(unittest2.TestCase):
+    # pylint: disable=too-many-public-methods
     def setUp(self):
         self.toxworkdir = tempfile.mkdtemp()
-        patch(
-            "pkg_resources.resource_filename",
-            return_value=self.toxworkdir + "/" + SCRIPT_NAME,
-        ).start()
-        self.default_tox_ini_b = pkg_resources.resource_string(
-            "tox_lsr", CONFIG_FILES_SUBDIR + "/" + TOX_DEFAULT_INI
+        default_tox_ini = get_package_file(
+            CONFIG_FILES_SUBDIR, TOX_DEFAULT_INI
         )
+        with open(default_tox_ini, "rb") as ini_f:
+            self.default_tox_ini_b = ini_f.read()
         self.default_tox_ini_raw = self.default_tox_ini_b.decode()
+
+        def mock_get_package_file(_subdir, name):
+            if name == TOX_DEFAULT_INI:
+                return default_tox_ini
+            return self.toxworkdir + "/" + name
+
+        self.mock_gpf = patch(
+            "tox_lsr.hooks.get_package_file",
+            side_effect=mock_get_package_file,
+        ).start()
         # e.g. __file__ is tests/unit/something.py -
         # fixture_path is tests/fixtures
         self.tests_path = os.path.dirname(
@@ -81,7 +110,7 @@ class HooksTestCase(unittest2.TestCase):
 
         parser = Mock(add_argument=Mock())
         tox_addoption(parser)
-        self.assertEqual(1, parser.add_argument.call_count)
+        self.assertEqual(5, parser.add_argument.call_count)
 
     def test_tox_configure(self):
         """Test tox_configure."""
@@ -94,31 +123,94 @@ class HooksTestCase(unittest2.TestCase):
             self.assertEqual(1, mock_ile.call_count)
 
         setattr(config.option, LSR_ENABLE, True)
+        setattr(config.option, LSR_PROFILE, False)
+        setattr(config.option, LSR_PLAN, None)
+        config.envlist_explicit = False
         default_config = MockConfig(toxworkdir=self.toxworkdir)
 
-        with patch(
-            "pkg_resources.resource_string",
-            return_value=self.default_tox_ini_b,
-        ) as mock_rs:
-            with patch("tox_lsr.hooks.merge_config") as mock_mc:
+        with patch("tox_lsr.hooks.merge_config") as mock_mc:
+            with patch(
+                "tox_lsr.hooks.merge_ini",
+                return_value=self.default_tox_ini_raw,
+            ) as mock_mi:
                 with patch(
-                    "tox_lsr.hooks.merge_ini",
-                    return_value=self.default_tox_ini_raw,
-                ) as mock_mi:
+                    "tox_lsr.hooks.Config",
+                    side_effect=[TypeError(), default_config],
+                ) as mock_cfg:
                     with patch(
-                        "tox_lsr.hooks.Config",
-                        side_effect=[TypeError(), default_config],
-                    ) as mock_cfg:
-                        with patch(
-                            "tox_lsr.hooks.ParseIni",
-                            side_effect=[TypeError(), None],
-                        ) as mock_pi:
-                            tox_configure(config)
-                            self.assertEqual(1, mock_rs.call_count)
-                            self.assertEqual(2, mock_pi.call_count)
-                            self.assertEqual(1, mock_mc.call_count)
-                            self.assertEqual(1, mock_mi.call_count)
-                            self.assertEqual(2, mock_cfg.call_count)
+                        "tox_lsr.hooks.ParseIni",
+                        side_effect=[TypeError(), None],
+                    ) as mock_pi:
+                        tox_configure(config)
+                        self.assertEqual(3, self.mock_gpf.call_count)
+                        self.assertEqual(2, mock_pi.call_count)
+                        self.assertEqual(1, mock_mc.call_count)
+                        self.assertEqual(1, mock_mi.call_count)
+                        self.assertEqual(2, mock_cfg.call_count)
+
+    def test_tox_configure_profile(self):
+        """Test that tox_configure writes the profile when enabled."""
+
+        config = MockConfig(toxworkdir=self.toxworkdir)
+        setattr(config.option, LSR_ENABLE, True)
+        setattr(config.option, LSR_PROFILE, None)
+        setattr(config.option, LSR_SHARE_ENVDIRS, None)
+        setattr(config.option, LSR_PLAN, None)
+        config.envlist_explicit = False
+        config.envconfigs = {"a": Mock(), "b": Mock()}
+        default_config = MockConfig(toxworkdir=self.toxworkdir)
+        profile_path = os.path.join(self.toxworkdir, PROFILE_FILE)
+        with patch("tox_lsr.hooks.merge_config"):
+            with patch(
+                "tox_lsr.hooks.merge_ini",
+                return_value=self.default_tox_ini_raw,
+            ):
+                with patch(
+                    "tox_lsr.hooks.Config", return_value=default_config
+                ):
+                    with patch("tox_lsr.hooks.ParseIni"):
+                        with patch("sys.stderr") as mock_stderr:
+                            with patch.dict(
+                                os.environ, {LSR_PROFILE_ENV: "false"}
+                            ):
+                                tox_configure(config)
+                            self.assertFalse(os.path.exists(profile_path))
+                            self.assertFalse(mock_stderr.write.called)
+                            with patch.dict(
+                                os.environ, {LSR_PROFILE_ENV: "true"}
+                            ):
+                                tox_configure(config)
+        summary = mock_stderr.write.call_args[0][0]
+        self.assertTrue(summary.startswith("tox-lsr profile: "))
+        self.assertTrue(summary.endswith(profile_path + "\n"))
+        with io.open(profile_path, encoding="utf-8") as prof_f:
+            profile = json.load(prof_f)
+        self.assertEqual(
+            ["resources", "merge_ini", "parse_ini", "merge_config"],
+            [phase["name"] for phase in profile["phases"]],
+        )
+        self.assertEqual(
+            {
+                "envs": 2,
+                "envs_merged": 0,
+                "envs_deferred": 0,
+                "props_merged": 0,
+            },
+            profile["counts"],
+        )
+
+    def test_is_lsr_profile_enabled(self):
+        """Test is_lsr_profile_enabled."""
+
+        config = MockConfig(toxworkdir=self.toxworkdir)
+        setattr(config.option, LSR_PROFILE, None)
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(is_lsr_profile_enabled(config))
+        with patch.dict(os.environ, {LSR_PROFILE_ENV: "true"}):
+            self.assertTrue(is_lsr_profile_enabled(config))
+        setattr(config.option, LSR_PROFILE, True)
+        with patch.dict(os.environ, {LSR_PROFILE_ENV: "false"}):
+            self.assertTrue(is_lsr_profile_enabled(config))
 
     def test_tox_merge_ini(self):
         """Test that given config is merged with default config ini."""
@@ -130,179 +222,181 @@ class HooksTestCase(unittest2.TestCase):
         # check the result
         if os.environ.get("UPDATE_RESULT_INI"):
             with open(
-                os.path.join(self.fixture_path, "result.ini"), "w"
+                os.path.join(self.fixture_path, "result.ini"), "wb"
             ) as out_f:
-                out_f.write(result)
+                out_f.write(result.encode("utf-8"))
         expected_file = os.path.join(self.fixture_path, "result.ini")
         expected_ini = py.iniconfig.IniConfig(expected_file)
         result_ini = py.iniconfig.IniConfig("", result)
 
         self.assertDictEqual(expected_ini.sections, result_ini.sections)
 
-    def test_tox_prop_is_set(self):
-        """Test prop_is_set."""
-
-        tec = Mock(envname="prop")
-        tec._reader = Mock()
-        tec._reader._cfg = Mock()
-        cfgdict = {
-            "empty_str_prop": "",
-            "str_prop": "str_prop",
-            "int_prop": 0,
-            "bool_prop": False,
-            "float_prop": 0.0,
-            "list_prop": [1, 2, 3],
-            "empty_list_prop": [],
-            "dict_prop": {"a": "a"},
-            "empty_dict_prop": {},
-            "obj_prop": object(),
-            "none_prop": None,
-        }
-        tec._reader._cfg.sections = deepcopy({"testenv": cfgdict})
-        for prop in cfgdict:
-            self.assertTrue(prop_is_set(tec, prop))
-        tec._reader._cfg.sections["testenv:prop"] = deepcopy(cfgdict)
-        for prop in cfgdict:
-            self.assertTrue(prop_is_set(tec, prop))
-        del tec._reader._cfg.sections["testenv"]
-        del tec._reader._cfg.sections["testenv:prop"]
-        tec.configure_mock(**deepcopy(cfgdict))
-        for prop in cfgdict:
-            self.assertFalse(prop_is_set(tec, prop))
-
-    def test_tox_merge_prop_values(self):
-        """Test merge_prop_values."""
-
-        # assert that code ignores properties it does not handle
-        tec = MagicMock()
-        def_tec = MagicMock()
-        merge_prop_values("nosuchprop", tec, def_tec)
-        self.assertFalse(tec.mock_calls)
-        self.assertFalse(def_tec.mock_calls)
-        # test empty tec
-        tec = MagicMock()
-        def_tec = MagicMock()
-        propnames = ["setenv", "deps", "passenv", "whitelist_externals"]
-        empty_attrs = {
-            "setenv": {},
-            "deps": [],
-            "passenv": set(),
-            "whitelist_externals": [],
-        }
-        tec.configure_mock(**deepcopy(empty_attrs))
-        full_attrs = {
-            "setenv": {"a": "a", "b": "b"},
-            "deps": ["a", "b"],
-            "passenv": set(["a", "b"]),
-            "whitelist_externals": ["a", "b"],
-        }
-        def_tec.configure_mock(**deepcopy(full_attrs))
-        for prop in propnames:
-            merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = full_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
-        # test empty def_tec
-        tec = MagicMock()
-        def_tec = MagicMock()
-        tec.configure_mock(**deepcopy(full_attrs))
-        def_tec.configure_mock(**deepcopy(empty_attrs))
-        for prop in propnames:
-            merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = full_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
-        # test merging
-        more_attrs = {
-            "setenv": {"a": "a", "c": "c"},
-            "deps": ["a", "c"],
-            "passenv": set(["a", "c"]),
-            "whitelist_externals": ["a", "c"],
-        }
-        result_attrs = {
-            "setenv": {"a": "a", "b": "b", "c": "c"},
-            "deps": ["a", "b", "c"],
-            "passenv": set(["a", "b", "c"]),
-            "whitelist_externals": ["a", "b", "c"],
-        }
-        tec = MagicMock()
-        def_tec = MagicMock()
-        tec.configure_mock(**deepcopy(full_attrs))
-        def_tec.configure_mock(**deepcopy(more_attrs))
-        for prop in propnames:
-            merge_prop_values(prop, tec, def_tec)
-        for prop in propnames:
-            val = getattr(tec, prop)
-            exp_val = result_attrs[prop]
-            if isinstance(val, list):
-                self.assertEqual(set(exp_val), set(val))
-            else:
-                self.assertEqual(exp_val, val)
-
-    def test_tox_merge_envconf(self):
-        """Test the merge_envconf method."""
+    def test_get_merged_ini(self):
+        """Test that the merged ini is cached."""
 
-        # test exception handling
-        prop = "unsettable"
-
-        def mock_unsettable_is_set(envconf, propname):
-            if propname != prop:
-                return False
-            if envconf == def_tec:
-                return True
-            return False
-
-        def_tec = Mock(unsettable="unsettable")
-        tec = Mock()
+        config = MockConfig(toxworkdir=self.toxworkdir)
+        config.toxinipath = os.path.join(self.toxworkdir, "tox.ini")
+        with open(config.toxinipath, "wb") as ini_f:
+            ini_f.write(b"[testenv]\ncommands = {lsr_scriptdir}/x\n")
+        config._cfg = py.iniconfig.IniConfig(config.toxinipath)
+        config.option = Mock(lsr_no_cache=None)
         with patch(
-            "tox_lsr.hooks.prop_is_set", side_effect=mock_unsettable_is_set
+            "tox_lsr.hooks.merge_ini", side_effect=merge_ini
+        ) as mock_mi:
+            result = get_merged_ini(config, "", "/sdir", "/cdir")
+            self.assertEqual(1, mock_mi.call_count)
+            self.assertIn("commands = /sdir/x", result)
+            self.assertEqual(
+                result, get_merged_ini(config, "", "/sdir", "/cdir")
+            )
+            self.assertEqual(1, mock_mi.call_count)
+            # cache miss when an input changes
+            self.assertNotEqual(
+                result, get_merged_ini(config, "", "/sdir2", "/cdir")
+            )
+            self.assertEqual(2, mock_mi.call_count)
+            config.option.lsr_no_cache = True
+            get_merged_ini(config, "", "/sdir2", "/cdir")
+            self.assertEqual(3, mock_mi.call_count)
+
+    def test_get_molecule_envkey(self):
+        """Test get_molecule_envkey."""
+
+        with patch.dict(os.environ, {}, clear=True):
+            default_key = get_molecule_envkey()
+        with patch.dict(
+            os.environ,
+            {"LSR_ANSIBLE_DEP": "ansible", "LSR_MOLECULE_DRIVER": "docker"},
+            clear=True,
+        ):
+            self.assertEqual(default_key, get_molecule_envkey())
+        with patch.dict(
+            os.environ, {"LSR_ANSIBLE_DEP": "ansible==2.9.*"}, clear=True
         ):
-            with patch("tox_lsr.hooks.setattr", side_effect=AttributeError()):
-                merge_envconf(tec, def_tec)
-                self.assertNotEqual(tec.unsettable, "unsettable")
+            ansible29_key = get_molecule_envkey()
+            self.assertNotEqual(default_key, ansible29_key)
+            self.assertEqual(ansible29_key, get_molecule_envkey())
+        with patch.dict(
+            os.environ,
+            {
+                "LSR_ANSIBLE_DEP": "ansible==2.9.*",
+                "LSR_MOLECULE_DRIVER": "podman",
+            },
+            clear=True,
+        ):
+            self.assertNotEqual(ansible29_key, get_molecule_envkey())
 
-        # test setting an unset property
-        prop = "propa"
+    def test_is_lsr_share_envdirs_enabled(self):
+        """Test is_lsr_share_envdirs_enabled."""
 
-        def mock_prop_is_set(envconf, propname):
-            if propname != prop:
-                return False
-            if envconf == def_tec:
-                return True
-            return False
+        config = MockConfig()
+        setattr(config.option, LSR_SHARE_ENVDIRS, None)
+        config._cfg = py.iniconfig.IniConfig("", "[tox]\n")
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(is_lsr_share_envdirs_enabled(config))
+            config._cfg = py.iniconfig.IniConfig(
+                "",
+                "["
+                + LSR_CONFIG_SECTION
+                + "]\n"
+                + LSR_SHARE_ENVDIRS
+                + " = true\n",
+            )
+            self.assertTrue(is_lsr_share_envdirs_enabled(config))
+        with patch.dict(os.environ, {LSR_SHARE_ENVDIRS_ENV: "false"}):
+            self.assertFalse(is_lsr_share_envdirs_enabled(config))
+            setattr(config.option, LSR_SHARE_ENVDIRS, True)
+            self.assertTrue(is_lsr_share_envdirs_enabled(config))
+
+    def test_share_envdirs(self):
+        """Test that share_envdirs shares the envdirs of the same envs."""
+
+        toxini = os.path.join(self.toxworkdir, "tox.ini")
+        with open(toxini, "wb") as ini_f:
+            ini_f.write(
+                b"[tox]\nenvlist = a, b, c, d, e\nskipsdist = true\n"
+                b"[testenv]\ndeps = pytest\nsetenv =\n"
+                b"    MYDIR = {envdir}\n"
+                b"[testenv:c]\ndeps = flake8\n"
+                b"[testenv:d]\nlsr_share_envdir = false\n"
+                b"[testenv:e]\nenvdir = {toxworkdir}/env-e\n"
+            )
+        config = parseconfig(["-c", toxini])
+        workdir = config.toxworkdir
+        shared = share_envdirs(config, set(["a", "b", "c", "d", "e", "f"]))
+        self.assertEqual([["a", "b"], ["c"]], sorted(shared.values()))
+        envconfs = config.envconfigs
+        self.assertEqual(envconfs["a"].envdir, envconfs["b"].envdir)
+        self.assertNotEqual(envconfs["a"].envdir, envconfs["c"].envdir)
+        for name in ("a", "c"):
+            envdir = envconfs[name].envdir
+            self.assertEqual(workdir, envdir.dirpath())
+            self.assertTrue(envdir.basename.startswith(SHARED_ENVDIR_PREFIX))
+            self.assertEqual(envdir.join("log"), envconfs[name].envlogdir)
+            self.assertEqual(str(envdir), envconfs[name].setenv["MYDIR"])
+        self.assertEqual(workdir.join("d"), envconfs["d"].envdir)
+        self.assertEqual(workdir.join("env-e"), envconfs["e"].envdir)
+        # the same envdirs in the next run, even if only one is selected
+        config = parseconfig(["-c", toxini])
+        share_envdirs(config, set(["b"]))
+        self.assertEqual(envconfs["b"].envdir, config.envconfigs["b"].envdir)
+        self.assertEqual(workdir.join("a"), config.envconfigs["a"].envdir)
+
+    def test_is_lsr_cache_enabled(self):
+        """Test is_lsr_cache_enabled."""
 
-        unittest_mock.FILTER_DIR = (
-            False  # for handling attributes that start with underscore
-        )
-        def_tec = Mock(spec=[prop], propa=prop, _ignoreme="ignoreme")
-        tec = Mock(spec=[prop])
-        with patch("tox_lsr.hooks.prop_is_set", side_effect=mock_prop_is_set):
+        config = MockConfig()
+        setattr(config.option, LSR_NO_CACHE, None)
+        self.assertTrue(is_lsr_cache_enabled(config))
+        with patch.dict(os.environ, {LSR_NO_CACHE_ENV: "true"}):
+            self.assertFalse(is_lsr_cache_enabled(config))
+        with patch.dict(os.environ, {LSR_NO_CACHE_ENV: "false"}):
+            self.assertTrue(is_lsr_cache_enabled(config))
+        setattr(config.option, LSR_NO_CACHE, True)
+        self.assertFalse(is_lsr_cache_enabled(config))
+
+    def test_tox_merge_envconf(self):
+        """Test that merge_envconf merges with the given or a new merger."""
+
+        tec = Mock()
+        def_tec = Mock()
+        merger = Mock()
+        merge_envconf(tec, def_tec, merger)
+        merger.merge_envconf.assert_called_once_with(tec, def_tec)
+        def_tec.config._testenv_attr = []
+        with patch("tox_lsr.merge.EnvconfMerger") as mock_tm:
             merge_envconf(tec, def_tec)
-        unittest_mock.FILTER_DIR = True  # reset to default
-        self.assertEqual(prop, tec.propa)
-        # test that it tries to merge if both props are set
-
-        # pylint: disable=unused-argument
-        def mock_prop_is_set2(envconf, propname):
-            if propname != prop:
-                return False
-            return True
-
-        def_tec = Mock(spec=[prop], propa=prop)
-        tec = Mock(spec=[prop], propa="someothervalue")
-        with patch("tox_lsr.hooks.prop_is_set", side_effect=mock_prop_is_set2):
-            with patch("tox_lsr.hooks.merge_prop_values") as mock_mpv:
-                merge_envconf(tec, def_tec)
-                self.assertEqual(1, mock_mpv.call_count)
-        self.assertEqual("someothervalue", tec.propa)
+            mock_tm.assert_called_once_with([])
+            mock_tm.return_value.merge_envconf.assert_called_once_with(
+                tec, def_tec
+            )
+        # the real merger, with the envconfigs of real tox configs
+        configs = []
+        passenv = {"USER_VAR": "user", "DEF_VAR": "def"}
+        for name, data in (
+            (
+                "tox.ini",
+                b"[testenv:a]\nsetenv =\n    A = user\n"
+                b"deps =\n    c\n    a\npassenv = USER_VAR\n",
+            ),
+            (
+                "default.ini",
+                b"[testenv:a]\nsetenv =\n    A = def\n    B = def\n"
+                b"deps =\n    a\n    b\npassenv = DEF_VAR\n",
+            ),
+        ):
+            toxini = os.path.join(self.toxworkdir, name)
+            with open(toxini, "wb") as ini_f:
+                ini_f.write(data)
+            with patch.dict(os.environ, passenv):
+                configs.append(parseconfig(["-c", toxini]))
+        tec = configs[0].envconfigs["a"]
+        merge_envconf(tec, configs[1].envconfigs["a"])
+        self.assertEqual("user", tec.setenv["A"])
+        self.assertEqual("def", tec.setenv["B"])
+        self.assertEqual(["a", "b", "c"], [str(dep) for dep in tec.deps])
+        self.assertIn("USER_VAR", tec.passenv)
+        self.assertIn("DEF_VAR", tec.passenv)
 
     def test_tox_merge_config(self):
         """Test the merge_config method."""
@@ -332,20 +426,123 @@ class HooksTestCase(unittest2.TestCase):
         def_tec.envlist = ["b", "c"]
         def_tec.envlist_default = ["b", "c"]
         envc = {}
-        def_tec.envconfigs = {"b": {}, "c": envc}
+        def_envb = {}
+        def_tec.envconfigs = {"b": def_envb, "c": envc}
+        def_tec._testenv_attr = []
         with patch("tox_lsr.hooks.merge_envconf") as mock_me:
             merge_config(tec, def_tec)
             self.assertEqual(1, mock_me.call_count)
+            self.assertEqual((envb, def_envb), mock_me.call_args[0][:2])
         self.assertIs(enva, tec.envconfigs["a"])
         self.assertIs(envb, tec.envconfigs["b"])
         self.assertIs(envc, tec.envconfigs["c"])
         self.assertEqual("a", tec.a)
         self.assertEqual("b", tec.b)
         self.assertEqual("d", tec.c)
-        self.assertEqual(set(["a", "b", "c"]), set(tec.envlist))
-        self.assertEqual(set(["a", "b", "c"]), set(tec.envlist_default))
+        # the order of the envlist is kept
+        self.assertEqual(["a", "b", "c"], tec.envlist)
+        self.assertEqual(["a", "b", "c"], tec.envlist_default)
         unittest_mock.FILTER_DIR = True  # reset
 
+    def test_tox_merge_config_lazy(self):
+        """Test that merge_config defers the merge of lazy envconfigs."""
+
+        tec = Mock()
+        tec._cfg = Mock()
+        tec._cfg.sections = {"tox": {}}
+        tec.envlist_explicit = True
+        enva = Mock()
+        tec.envconfigs = {"a": enva}
+        def_tec = Mock()
+        def_tec._cfg = Mock()
+        def_tec._cfg.sections = {"tox": {}}
+        lazya = _LazyEnvconfig(None, ("a",), {})
+        lazyb = _LazyEnvconfig(None, ("b",), {})
+        envc = Mock()
+        def_tec.envconfigs = {"a": lazya, "b": lazyb, "c": envc}
+        def_tec._testenv_attr = []
+        with patch("tox_lsr.hooks.merge_envconf") as mock_me:
+            merge_config(tec, def_tec)
+            self.assertEqual(0, mock_me.call_count)
+            self.assertIsNotNone(lazya.merger)
+            self.assertIsInstance(tec.envconfigs, _LazyEnvconfigs)
+            self.assertIs(enva, lazya.envconf)
+            self.assertIsNone(lazyb.envconf)
+            self.assertIs(envc, tec.envconfigs["c"])
+            def_enva = Mock()
+            def_envb = Mock()
+            with patch(
+                "tox_lsr.hooks.ParseIni.make_envconfig",
+                side_effect=[def_enva, def_envb],
+            ) as mock_mec:
+                self.assertIs(enva, tec.envconfigs["a"])
+                mock_me.assert_called_once_with(enva, def_enva, lazya.merger)
+                self.assertIs(def_envb, tec.envconfigs.get("b"))
+                self.assertIsNone(tec.envconfigs.get("d"))
+                self.assertEqual(2, mock_mec.call_count)
+                # materialized only once - the envconfigs are a plain
+                # dict, unordered on python 2
+                self.assertCountEqual(
+                    [("a", enva), ("b", def_envb), ("c", envc)],
+                    list(tec.envconfigs.items()),
+                )
+                self.assertCountEqual(
+                    [enva, def_envb, envc], list(tec.envconfigs.values())
+                )
+                self.assertEqual(2, mock_mec.call_count)
+                self.assertEqual(1, mock_me.call_count)
+
+    def test_selective_parse_ini(self):
+        """Test that parse_ini_data defers the unselected testenvs."""
+
+        class MockParseIni(object):
+            # pylint: disable=too-few-public-methods,unused-argument
+            def __init__(self, config, ini_path, ini_data):
+                self.config = config
+                for name in ["a", "b", ".package"]:
+                    config.envconfigs[name] = self.make_envconfig(
+                        name, "testenv:" + name, {}, config
+                    )
+
+            # pylint: disable=unused-argument,no-self-use
+            def make_envconfig(self, name, section, subs, config):
+                return name
+
+        config = MockConfig()
+        with patch("tox_lsr.hooks.ParseIni", MockParseIni):
+            parse_ini_data(config, "/tox.ini", "", None)
+            self.assertEqual(
+                {"a": "a", "b": "b", ".package": ".package"},
+                config.envconfigs,
+            )
+            config = MockConfig()
+            parse_ini_data(config, "/tox.ini", "", set(["a"]))
+            self.assertEqual("a", config.envconfigs["a"])
+            self.assertEqual(".package", config.envconfigs[".package"])
+            lazy = config.envconfigs["b"]
+            self.assertIsInstance(lazy, _LazyEnvconfig)
+            self.assertEqual("b", lazy.materialize())
+
+    def test_get_selected_envs(self):
+        """Test get_selected_envs."""
+
+        config = Mock(envlist=["a", "b"], envlist_explicit=False)
+        self.assertIsNone(get_selected_envs(config))
+        config.envlist_explicit = True
+        self.assertEqual(set(["a", "b"]), get_selected_envs(config))
+        config.envlist = ["ALL"]
+        self.assertIsNone(get_selected_envs(config))
+        # tox 2.x has no envlist_explicit
+        config = Mock(spec=["envlist", "option"], envlist=["a"])
+        config.option.env = None
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(get_selected_envs(config))
+            config.option.env = ["a"]
+            self.assertEqual(set(["a"]), get_selected_envs(config))
+            config.option.env = None
+            os.environ["TOXENV"] = "a"
+            self.assertEqual(set(["a"]), get_selected_envs(config))
+
     def test_tox_set_set_prop_values_ini(self):
         """Test set_prop_values_ini."""
 
@@ -381,20 +578,86 @@ class HooksTestCase(unittest2.TestCase):
         self.assertEqual(
             "bash\nmycmd\nmyothercmd", def_conf["whitelist_externals"]
         )
+        # duplicates are removed, the order is kept
+        set_prop_values_ini("deps", def_conf, {"deps": "a\nc"})
+        self.assertEqual("b\na\nc", def_conf["deps"])
 
-    def test_lsr_path(self):
-        """Test the _LSRPath class."""
+    def test_parse_ini_data(self):
+        """Test that parse_ini_data parses from memory."""
 
         real = "/no/such/path/to/realfile"
-        temp = "/no/such/path/to/temp"
-        stack_plain = (("myfile", 1, "myfunc", "text"),)
-        stack_iniconfig = (("/path/to/iniconfig.py", 1, "__init__", "text"),)
-        with patch("traceback.extract_stack", return_value=stack_plain):
-            lsr = _LSRPath(real, temp)
-            self.assertEqual(real, str(lsr))
-        with patch("traceback.extract_stack", return_value=stack_iniconfig):
-            lsr = _LSRPath(real, temp)
-            self.assertEqual(temp, str(lsr))
+        ini_data = "[tox]\nenvlist = a\n"
+        results = []
+
+        def mock_parse_ini(config, ini_path, *args):
+            # the old tox versions take only the ini path and read the
+            # ini data from it
+            if args:
+                raise TypeError()
+            results.append((config, ini_path))
+            results.append(py.iniconfig.IniConfig(ini_path).sections)
+
+        with patch("tox_lsr.hooks.ParseIni", side_effect=[None]) as mock_pi:
+            parse_ini_data("config", real, ini_data)
+            mock_pi.assert_called_once_with("config", real, ini_data)
+        orig_iniconfig = py.iniconfig.IniConfig
+        with patch("tox_lsr.hooks.ParseIni", side_effect=mock_parse_ini):
+            parse_ini_data("config", real, ini_data)
+        self.assertEqual(("config", real), results[0])
+        self.assertEqual({"tox": {"envlist": "a"}}, results[1])
+        self.assertIs(orig_iniconfig, py.iniconfig.IniConfig)
+        # other paths are still read from the filesystem
+        other = os.path.join(self.toxworkdir, "other.ini")
+        with open(other, "wb") as ini_f:
+            ini_f.write(b"[other]\n")
+        with patch("tox_lsr.hooks.ParseIni", side_effect=TypeError()):
+            with self.assertRaises(TypeError):
+                parse_ini_data("config", real, ini_data)
+        with _InMemoryIniConfig(real, ini_data):
+            self.assertEqual(
+                {"other": {}}, py.iniconfig.IniConfig(other).sections
+            )
+            self.assertEqual(
+                {"x": {}}, py.iniconfig.IniConfig(real, "[x]\n").sections
+            )
+        self.assertIs(orig_iniconfig, py.iniconfig.IniConfig)
+
+    @unittest2.skipIf(
+        sys.version_info < (3, 7), "-X importtime requires python 3.7"
+    )
+    def test_import_time(self):
+        """Test that loading the disabled plugin imports nothing else."""
+
+        # tox has already imported tox.config when it loads the plugin
+        code = (
+            "import sys, tox.config\n"
+            "import tox_lsr.hooks\n"
+            "class Option(object):\n"
+            "    lsr_enable = False\n"
+            "class Config(object):\n"
+            "    option = Option()\n"
+            "before = set(sys.modules)\n"
+            "tox_lsr.hooks.tox_configure(Config())\n"
+            "sys.stdout.write(' '.join(sorted(set(sys.modules) - before)))\n"
+        )
+        with subprocess.Popen(  # nosec B603 # runs the test python
+            [sys.executable, "-X", "importtime", "-c", code],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        ) as proc:
+            out, err = proc.communicate()
+        self.assertEqual(0, proc.returncode, err)
+        # modules imported by tox_configure when the plugin is disabled
+        self.assertEqual("", out)
+        # modules imported by tox_lsr.hooks - the import time lines
+        # look like "import time:  self |  cumulative | name"
+        names = [line.split("|")[-1] for line in err.splitlines()]
+        del names[: names.index(" tox.config") + 1]
+        imported = [name.strip() for name in names]
+        self.assertEqual(
+            ["tox_lsr.version", "tox_lsr", "tox_lsr.hooks"], imported
+        )
 
     def test_is_lsr_enabled(self):
         """Test is_lsr_enabled."""
@@ -0,0 +1,293 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Tests for tox_lsr merge."""
+
+try:
+    from unittest.mock import MagicMock, Mock
+except ImportError:
+    from mock import MagicMock, Mock
+
+from copy import deepcopy
+
+import unittest2
+
+from tox_lsr.merge import (
+    APPEND,
+    DICT_MERGE,
+    REPLACE,
+    UNION,
+    EnvconfMerger,
+    get_set_props,
+    get_strategy,
+    merge_ini_values,
+    merge_prop_values,
+    merge_values,
+    prop_is_set,
+    unique,
+)
+
+# code uses some protected members such as _cfg, _reader
+# pylint: disable=protected-access
+
+
+def make_envconf(envname, sections, **attrs):
+    """Return a mock TestenvConfig read from the ini sections."""
+
+    envconf = Mock(spec=["envname", "_reader"] + list(attrs), **attrs)
+    envconf.envname = envname
+    envconf._reader = Mock()
+    envconf._reader._cfg = Mock()
+    envconf._reader._cfg.sections = sections
+    return envconf
+
+
+class MergeTestCase(unittest2.TestCase):
+    def test_get_strategy(self):
+        """Test get_strategy."""
+
+        self.assertEqual(DICT_MERGE, get_strategy("setenv"))
+        self.assertEqual(APPEND, get_strategy("deps"))
+        self.assertEqual(UNION, get_strategy("passenv"))
+        self.assertEqual(APPEND, get_strategy("whitelist_externals"))
+        self.assertEqual(APPEND, get_strategy("allowlist_externals"))
+        self.assertEqual(REPLACE, get_strategy("commands"))
+
+    def test_unique(self):
+        """Test unique."""
+
+        class Dep(object):
+            # pylint: disable=too-few-public-methods
+            def __init__(self, name):
+                self.name = name
+
+            def __repr__(self):
+                return self.name
+
+        self.assertEqual([], unique([]))
+        self.assertEqual(["b", "a", "c"], unique(["b", "a", "b", "c", "a"]))
+        deps = [Dep("b"), Dep("a"), Dep("b")]
+        self.assertEqual(deps[:2], unique(deps))
+        self.assertEqual(
+            [" a", "b"], unique([" a", "a ", "b"], key=lambda x: x.strip())
+        )
+
+    def test_get_set_props(self):
+        """Test get_set_props."""
+
+        tec = make_envconf(
+            "prop", {"testenv": {"a": "", "b": ""}, "testenv:prop": {"c": ""}}
+        )
+        self.assertEqual(set(["a", "b", "c"]), get_set_props(tec))
+        tec = make_envconf("other", {"testenv:prop": {"c": ""}})
+        self.assertEqual(set(), get_set_props(tec))
+
+    def test_prop_is_set(self):
+        """Test prop_is_set."""
+
+        tec = Mock(envname="prop")
+        tec._reader = Mock()
+        tec._reader._cfg = Mock()
+        cfgdict = {
+            "empty_str_prop": "",
+            "str_prop": "str_prop",
+            "int_prop": 0,
+            "bool_prop": False,
+            "float_prop": 0.0,
+            "list_prop": [1, 2, 3],
+            "empty_list_prop": [],
+            "dict_prop": {"a": "a"},
+            "empty_dict_prop": {},
+            "obj_prop": object(),
+            "none_prop": None,
+        }
+        tec._reader._cfg.sections = deepcopy({"testenv": cfgdict})
+        for prop in cfgdict:
+            self.assertTrue(prop_is_set(tec, prop))
+        tec._reader._cfg.sections["testenv:prop"] = deepcopy(cfgdict)
+        for prop in cfgdict:
+            self.assertTrue(prop_is_set(tec, prop))
+        del tec._reader._cfg.sections["testenv"]
+        del tec._reader._cfg.sections["testenv:prop"]
+        tec.configure_mock(**deepcopy(cfgdict))
+        for prop in cfgdict:
+            self.assertFalse(prop_is_set(tec, prop))
+
+    def test_merge_prop_values(self):
+        """Test merge_prop_values."""
+
+        # assert that code ignores properties it does not handle
+        tec = MagicMock()
+        def_tec = MagicMock()
+        merge_prop_values("nosuchprop", tec, def_tec)
+        self.assertFalse(tec.mock_calls)
+        self.assertFalse(def_tec.mock_calls)
+        # test empty tec
+        tec = MagicMock()
+        def_tec = MagicMock()
+        propnames = ["setenv", "deps", "passenv", "whitelist_externals"]
+        empty_attrs = {
+            "setenv": {},
+            "deps": [],
+            "passenv": set(),
+            "whitelist_externals": [],
+        }
+        tec.configure_mock(**deepcopy(empty_attrs))
+        full_attrs = {
+            "setenv": {"a": "a", "b": "b"},
+            "deps": ["a", "b"],
+            "passenv": set(["a", "b"]),
+            "whitelist_externals": ["a", "b"],
+        }
+        def_tec.configure_mock(**deepcopy(full_attrs))
+        for prop in propnames:
+            merge_prop_values(prop, tec, def_tec)
+        for prop in propnames:
+            self.assertEqual(full_attrs[prop], getattr(tec, prop))
+        # test empty def_tec
+        tec = MagicMock()
+        def_tec = MagicMock()
+        tec.configure_mock(**deepcopy(full_attrs))
+        def_tec.configure_mock(**deepcopy(empty_attrs))
+        for prop in propnames:
+            merge_prop_values(prop, tec, def_tec)
+        for prop in propnames:
+            self.assertEqual(full_attrs[prop], getattr(tec, prop))
+        # test merging - the order of the values is kept
+        more_attrs = {
+            "setenv": {"a": "a", "c": "c"},
+            "deps": ["a", "c"],
+            "passenv": set(["a", "c"]),
+            "whitelist_externals": ["a", "c"],
+        }
+        result_attrs = {
+            "setenv": {"a": "a", "b": "b", "c": "c"},
+            "deps": ["a", "c", "b"],
+            "passenv": set(["a", "b", "c"]),
+            "whitelist_externals": ["a", "c", "b"],
+        }
+        tec = MagicMock()
+        def_tec = MagicMock()
+        tec.configure_mock(**deepcopy(full_attrs))
+        def_tec.configure_mock(**deepcopy(more_attrs))
+        for prop in propnames:
+            merge_prop_values(prop, tec, def_tec)
+        for prop in propnames:
+            self.assertEqual(result_attrs[prop], getattr(tec, prop))
+
+    def test_merge_values(self):
+        """Test merge_values with each strategy."""
+
+        self.assertEqual("a", merge_values(REPLACE, "a", "b"))
+        self.assertEqual(
+            ["a", "b", "c"], merge_values(APPEND, ["c", "a"], ["a", "b"])
+        )
+        self.assertEqual(
+            ["a", "b", "c"], merge_values(UNION, ["c", "a"], ["a", "b"])
+        )
+        self.assertEqual(
+            set(["a", "b", "c"]),
+            merge_values(UNION, set(["c", "a"]), set(["a", "b"])),
+        )
+        self.assertEqual(
+            {"a": "a", "b": "b"},
+            merge_values(DICT_MERGE, {"a": "a"}, {"a": "x", "b": "b"}),
+        )
+
+        class SetenvDict(object):
+            # pylint: disable=too-few-public-methods
+            def __init__(self, definitions):
+                self.definitions = definitions
+
+            def __contains__(self, name):
+                return name in self.definitions
+
+            def __getitem__(self, name):
+                raise AssertionError("value was substituted")
+
+        setenv = SetenvDict({"a": "{a}"})
+        merged = merge_values(
+            DICT_MERGE, setenv, SetenvDict({"a": "{x}", "b": "{b}"})
+        )
+        self.assertIs(setenv, merged)
+        self.assertEqual({"a": "{a}", "b": "{b}"}, setenv.definitions)
+
+    def test_merge_ini_values(self):
+        """Test merge_ini_values."""
+
+        self.assertEqual("a", merge_ini_values("commands", "b", "a"))
+        self.assertEqual("B=b\nA=a", merge_ini_values("setenv", "B=b", "A=a"))
+        self.assertEqual("b\nc\na", merge_ini_values("deps", "b\nc", "a\n c"))
+        self.assertEqual("*\nA", merge_ini_values("passenv", "*", "A\n*"))
+
+    def test_merge_order(self):
+        """Test that the ini and envconfig values merge in the same order."""
+
+        for propname in ("deps", "whitelist_externals", "passenv"):
+            strategy = get_strategy(propname)
+            self.assertEqual(
+                ["a", "b", "c"],
+                merge_ini_values(propname, "a\nb", "c\na").splitlines(),
+            )
+            self.assertEqual(
+                ["a", "b", "c"],
+                merge_values(strategy, ["c", "a"], ["a", "b"]),
+            )
+
+    def test_envconf_merger(self):
+        """Test EnvconfMerger.merge_envconf."""
+
+        names = ["deps", "commands", "unsettable", "basepython", "deps", "x"]
+        schema = []
+        for name in names:
+            attr = Mock()
+            attr.name = name
+            schema.append(attr)
+        merger = EnvconfMerger(schema)
+        self.assertEqual(
+            [
+                ("deps", APPEND),
+                ("commands", REPLACE),
+                ("unsettable", REPLACE),
+                ("basepython", REPLACE),
+                ("x", REPLACE),
+            ],
+            merger.strategies,
+        )
+
+        class Envconf(object):
+            # pylint: disable=too-few-public-methods
+            def __init__(self):
+                self.envname = "a"
+                self._reader = Mock()
+                self._reader._cfg.sections = {
+                    "testenv:a": {"deps": "", "commands": ""},
+                }
+                self.deps = ["c", "a"]
+                self.commands = ["user"]
+
+            @property
+            def unsettable(self):
+                """Property which cannot be set."""
+                return "unsettable"
+
+        def_sections = {
+            "testenv": {"deps": "", "commands": "", "unsettable": ""},
+            "testenv:a": {"basepython": "", "x": ""},
+        }
+        def_tec = make_envconf(
+            "a",
+            def_sections,
+            deps=["a", "b"],
+            commands=["def"],
+            unsettable="def",
+            basepython="python3",
+        )
+        tec = Envconf()
+        merger.merge_envconf(tec, def_tec)
+        self.assertEqual(["a", "b", "c"], tec.deps)
+        self.assertEqual(["user"], tec.commands)
+        self.assertEqual("unsettable", tec.unsettable)
+        self.assertEqual("python3", getattr(tec, "basepython"))
+        # x is set in the ini but has no attribute
+        self.assertFalse(hasattr(tec, "x"))
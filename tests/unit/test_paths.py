@@ -0,0 +1,90 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Tests for tox_lsr paths."""
+
+import os
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import unittest2
+
+from tox_lsr.paths import (
+    CONFIG_FILES_SUBDIR,
+    CONFIG_NAME,
+    LSR_CONFIGDIR_ENV,
+    LSR_SCRIPTDIR_ENV,
+    SCRIPT_NAME,
+    TEST_SCRIPTS_SUBDIR,
+    get_lsr_configdir,
+    get_lsr_scriptdir,
+    get_package_file,
+    main,
+    shell_quote,
+)
+
+
+class PathsTestCase(unittest2.TestCase):
+    def test_get_lsr_dirs(self):
+        """Test get_lsr_scriptdir and get_lsr_configdir."""
+
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertTrue(
+                os.path.isfile(os.path.join(get_lsr_scriptdir(), SCRIPT_NAME))
+            )
+            self.assertTrue(
+                os.path.isfile(os.path.join(get_lsr_configdir(), CONFIG_NAME))
+            )
+            self.assertEqual(
+                os.path.dirname(
+                    get_package_file(TEST_SCRIPTS_SUBDIR, SCRIPT_NAME)
+                ),
+                get_lsr_scriptdir(),
+            )
+            self.assertEqual(
+                os.path.dirname(
+                    get_package_file(CONFIG_FILES_SUBDIR, CONFIG_NAME)
+                ),
+                get_lsr_configdir(),
+            )
+        with patch.dict(
+            os.environ,
+            {LSR_SCRIPTDIR_ENV: "/sdir", LSR_CONFIGDIR_ENV: "/cdir"},
+        ):
+            self.assertEqual("/sdir", get_lsr_scriptdir())
+            self.assertEqual("/cdir", get_lsr_configdir())
+
+    def test_shell_quote(self):
+        """Test shell_quote."""
+
+        self.assertEqual("'/a b'", shell_quote("/a b"))
+        self.assertEqual("'/a'\"'\"'b'", shell_quote("/a'b"))
+
+    def test_main(self):
+        """Test main."""
+
+        env = {LSR_SCRIPTDIR_ENV: "/sdir", LSR_CONFIGDIR_ENV: "/c dir"}
+        with patch.dict(os.environ, env):
+            with patch("sys.stdout", new_callable=StringIO) as mock_out:
+                self.assertEqual(0, main(["--scriptdir"]))
+                self.assertEqual("/sdir\n", mock_out.getvalue())
+            with patch("sys.stdout", new_callable=StringIO) as mock_out:
+                self.assertEqual(0, main(["--configdir"]))
+                self.assertEqual("/c dir\n", mock_out.getvalue())
+            with patch("sys.stdout", new_callable=StringIO) as mock_out:
+                self.assertEqual(0, main([]))
+                self.assertEqual(
+                    "LSR_SCRIPTDIR='/sdir'\nLSR_CONFIGDIR='/c dir'\n",
+                    mock_out.getvalue(),
+                )
+            with patch("sys.stderr", new_callable=StringIO) as mock_err:
+                self.assertEqual(2, main(["--bogus"]))
+                self.assertIn("Usage:", mock_err.getvalue())
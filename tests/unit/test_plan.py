@@ -0,0 +1,127 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Tests for tox_lsr plan."""
+
+try:
+    from unittest.mock import Mock
+except ImportError:
+    from mock import Mock
+
+import unittest2
+
+from tox_lsr.plan import (
+    add_envdir_depends,
+    format_plan,
+    get_critical_path,
+    get_graph,
+    get_order,
+    get_stages,
+)
+
+from .utils import MockConfig
+
+
+def make_config(envs):
+    """Return a config with the testenvs envs - name, envdir, depends."""
+
+    config = MockConfig()
+    for name, envdir, depends in envs:
+        config.envconfigs[name] = Mock(envdir=envdir, depends=depends)
+    return config
+
+
+class PlanTestCase(unittest2.TestCase):
+    def test_get_graph(self):
+        """Test that get_graph keeps only the depends to run."""
+
+        config = make_config(
+            [
+                ("a", "/a", ()),
+                ("b", "/b", ("a", "x")),
+                ("c", "/c", ("b", "a", "b")),
+            ]
+        )
+        graph = get_graph(config, ["c", "b", "a"])
+        self.assertEqual(["c", "b", "a"], list(graph))
+        self.assertEqual({"a": [], "b": ["a"], "c": ["b", "a"]}, dict(graph))
+        self.assertEqual(["a", "b", "c"], get_order(graph))
+        self.assertEqual({"c": []}, dict(get_graph(config, ["c"])))
+        graph["a"].append("c")
+        with self.assertRaises(ValueError):
+            get_order(graph)
+
+    def test_add_envdir_depends(self):
+        """Test that the testenvs of a shared envdir are serialized."""
+
+        config = make_config(
+            [
+                ("m1", "/m", ()),
+                ("lint", "/lint", ()),
+                ("m2", "/m", ()),
+                ("m3", "/m", ("m2",)),
+                ("other", "/m", ()),
+            ]
+        )
+        shared = add_envdir_depends(config, ["m3", "m1", "lint", "m2"])
+        self.assertEqual({"/m": ["m1", "m2", "m3"]}, shared)
+        self.assertEqual((), config.envconfigs["m1"].depends)
+        self.assertEqual(("m1",), config.envconfigs["m2"].depends)
+        self.assertEqual(("m2",), config.envconfigs["m3"].depends)
+        self.assertEqual((), config.envconfigs["lint"].depends)
+        self.assertEqual((), config.envconfigs["other"].depends)
+        # tox without depends
+        config = MockConfig()
+        config.envconfigs["a"] = Mock(spec=["envdir"], envdir="/a")
+        config.envconfigs["b"] = Mock(spec=["envdir"], envdir="/a")
+        self.assertEqual({}, add_envdir_depends(config, ["a", "b"]))
+
+    def test_plan(self):
+        """Test the stages, the critical path and the plan text."""
+
+        config = make_config(
+            [
+                ("black", "/black", ()),
+                ("py38", "/py38", ()),
+                ("collection", "/collection", ()),
+                ("ansible-test", "/ansible-test", ("collection",)),
+                ("coveralls", "/coveralls", ("py38", "ansible-test")),
+            ]
+        )
+        # the envconfigs are a plain dict, unordered on python 2
+        graph = get_graph(
+            config,
+            ["black", "py38", "collection", "ansible-test", "coveralls"],
+        )
+        self.assertEqual(
+            [
+                ["black", "py38", "collection"],
+                ["ansible-test"],
+                ["coveralls"],
+            ],
+            get_stages(graph),
+        )
+        self.assertEqual(
+            ["collection", "ansible-test", "coveralls"],
+            get_critical_path(graph),
+        )
+        self.assertEqual(
+            "tox-lsr plan: 5 testenvs in 3 stages\n"
+            "stage 1: black py38 collection\n"
+            "stage 2: ansible-test\n"
+            "stage 3: coveralls\n"
+            "dependencies:\n"
+            "  ansible-test <- collection\n"
+            "  coveralls <- py38 ansible-test\n"
+            "critical path: collection -> ansible-test -> coveralls\n",
+            format_plan(graph),
+        )
+        graph = get_graph(config, ["black"])
+        self.assertEqual(
+            "tox-lsr plan: 1 testenvs in 1 stages\n"
+            "stage 1: black\n"
+            "dependencies:\n"
+            "  none\n"
+            "critical path: black\n",
+            format_plan(graph),
+        )
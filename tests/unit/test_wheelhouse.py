@@ -0,0 +1,114 @@
+#                                                         -*- coding: utf-8 -*-
+# SPDX-License-Identifier: MIT
+#
+"""Tests for tox_lsr wheelhouse."""
+
+import os
+
+try:
+    from unittest.mock import MagicMock, patch
+except ImportError:
+    from mock import MagicMock, patch
+
+import unittest2
+
+from tox_lsr.wheelhouse import (
+    LSR_WHEELHOUSE_DIR_ENV,
+    LSR_WHEELHOUSE_NO_INDEX_ENV,
+    WRAPPER_SCRIPT,
+    get_wheelhouse_dir,
+    set_install_commands,
+    wrap_install_command,
+)
+
+INSTALL_COMMAND = ["python", "-m", "pip", "install", "{opts}", "{packages}"]
+
+
+class WheelhouseTestCase(unittest2.TestCase):
+    def test_get_wheelhouse_dir(self):
+        """Test get_wheelhouse_dir."""
+
+        with patch.dict(os.environ, {"HOME": "/home/user"}, clear=True):
+            self.assertEqual(
+                "/home/user/.cache/tox-lsr/wheelhouse", get_wheelhouse_dir()
+            )
+        with patch.dict(os.environ, {"XDG_CACHE_HOME": "/cache"}, clear=True):
+            self.assertEqual("/cache/tox-lsr/wheelhouse", get_wheelhouse_dir())
+        with patch.dict(
+            os.environ,
+            {"XDG_CACHE_HOME": "/cache", LSR_WHEELHOUSE_DIR_ENV: "/wheels"},
+            clear=True,
+        ):
+            self.assertEqual("/wheels", get_wheelhouse_dir())
+
+    def test_wrap_install_command(self):
+        """Test wrap_install_command."""
+
+        wrapped = wrap_install_command(
+            INSTALL_COMMAND, "/sdir/" + WRAPPER_SCRIPT, "/wheels", []
+        )
+        self.assertEqual(
+            ["python", "/sdir/" + WRAPPER_SCRIPT, "/wheels", "--"]
+            + INSTALL_COMMAND,
+            wrapped,
+        )
+        self.assertEqual(
+            wrapped,
+            wrap_install_command(
+                wrapped, "/sdir/" + WRAPPER_SCRIPT, "/wheels", []
+            ),
+        )
+        self.assertEqual(
+            ["python", "/sdir/" + WRAPPER_SCRIPT, "--no-index", "/wheels"],
+            wrap_install_command(
+                INSTALL_COMMAND,
+                "/sdir/" + WRAPPER_SCRIPT,
+                "/wheels",
+                ["--no-index"],
+            )[:4],
+        )
+
+    def test_set_install_commands(self):
+        """Test set_install_commands."""
+
+        config = MagicMock()
+        config.envconfigs = {}
+        for name in ("py38", "pylint", "flake8"):
+            config.envconfigs[name] = MagicMock()
+            config.envconfigs[name].install_command = list(INSTALL_COMMAND)
+        with patch.dict(
+            os.environ,
+            {
+                LSR_WHEELHOUSE_DIR_ENV: "/wheels",
+                LSR_WHEELHOUSE_NO_INDEX_ENV: "true",
+            },
+            clear=True,
+        ):
+            set_install_commands(config, set(["pylint", "missing"]), "/sdir")
+        self.assertEqual(
+            [
+                "python",
+                "/sdir/" + WRAPPER_SCRIPT,
+                "--no-index",
+                "/wheels",
+                "--",
+            ]
+            + INSTALL_COMMAND,
+            config.envconfigs["pylint"].install_command,
+        )
+        self.assertEqual(
+            INSTALL_COMMAND, config.envconfigs["py38"].install_command
+        )
+        with patch.dict(
+            os.environ, {LSR_WHEELHOUSE_DIR_ENV: "/wheels"}, clear=True
+        ):
+            set_install_commands(config, None, "/sdir")
+        for name in ("py38", "flake8"):
+            self.assertEqual(
+                ["python", "/sdir/" + WRAPPER_SCRIPT, "/wheels", "--"]
+                + INSTALL_COMMAND,
+                config.envconfigs[name].install_command,
+            )
+        self.assertEqual(
+            "--no-index", config.envconfigs["pylint"].install_command[2]
+        )
@@ -66,7 +66,7 @@ class MockConfig(object):
         self._cfg.sections["tox"] = {}
         self.envlist_explicit = Mock()
         self.envconfigs = {}
-        self._testenv_attr = Mock()
+        self._testenv_attr = []
 
 
 class MockToxParseIni(object):